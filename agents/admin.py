@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import NetworkNode, Demand, AgentDecision
+from django.db import transaction
+from .models import (NetworkNode, Demand, AgentDecision, DecisionStats, InventoryMovement, Sku, Lane,
+                     ReorderPolicy, ShadowRun)
+from . import decision_stats, ledger, search
 
 @admin.register(NetworkNode)
 class NetworkNodeAdmin(admin.ModelAdmin):
@@ -7,6 +10,62 @@ class NetworkNodeAdmin(admin.ModelAdmin):
     list_filter = ['node_type', 'is_active']
     search_fields = ['code', 'name']
 
+    def save_model(self, request, obj, form, change):
+        # Saved with the committed balance (the change view runs in a
+        # transaction); an edited quantity becomes an ADJUSTMENT against it
+        target = obj.current_inventory if not change or 'current_inventory' in form.changed_data else None
+        if change:
+            obj.current_inventory = (NetworkNode.objects.select_for_update()
+                                     .values_list('current_inventory', flat=True).get(pk=obj.pk))
+        else:
+            obj.current_inventory = 0
+        super().save_model(request, obj, form, change)
+        if target is not None:
+            ledger.adjust_balances({obj.pk: target}, 'admin' if change else 'opening balance')
+            obj.refresh_from_db(fields=['current_inventory'])
+
+@admin.register(Lane)
+class LaneAdmin(admin.ModelAdmin):
+    list_display = ['source', 'destination', 'distance_miles', 'cost', 'transit_hours', 'is_active', 'updated_at']
+    list_filter = ['is_active']
+    search_fields = ['source__code', 'destination__code']
+    raw_id_fields = ['source', 'destination']
+    list_select_related = ['source', 'destination']
+
+@admin.register(ReorderPolicy)
+class ReorderPolicyAdmin(admin.ModelAdmin):
+    list_display = ['node', 'demand_mean', 'demand_std', 'lead_time_periods', 'safety_stock',
+                    'reorder_point', 'order_up_to', 'observations', 'updated_at']
+    search_fields = ['node__code', 'node__name']
+    list_select_related = ['node']
+    # Only the lead time is set by hand; the rest comes from refresh_reorder_policies
+    fields = ['node', 'lead_time_periods', 'demand_mean', 'demand_std', 'safety_stock',
+              'reorder_point', 'order_up_to', 'observations', 'demand_through']
+    readonly_fields = ['node', 'demand_mean', 'demand_std', 'safety_stock', 'reorder_point',
+                       'order_up_to', 'observations', 'demand_through']
+
+    def has_add_permission(self, request):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        # Imported here: reorder_policies pulls in NumPy, which web workers defer
+        from .reorder_policies import apply_thresholds
+        apply_thresholds(obj)
+        super().save_model(request, obj, form, change)
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ['node', 'movement_type', 'quantity', 'note', 'created_at']
+    list_filter = ['movement_type']
+    raw_id_fields = ['node']
+
+    # The ledger is append-only
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(Demand)
 class DemandAdmin(admin.ModelAdmin):
     list_display = ['node', 'quantity', 'forecast_quantity', 'period', 'timestamp']
@@ -15,8 +74,79 @@ class DemandAdmin(admin.ModelAdmin):
 
 @admin.register(AgentDecision)
 class AgentDecisionAdmin(admin.ModelAdmin):
-    list_display = ['agent_name', 'decision_type', 'urgency', 'source_node', 'destination_node','quantity', 'is_executed', 'created_at']
-    list_filter = ['agent_name', 'decision_type', 'urgency', 'is_executed']
+    list_display = ['agent_name', 'decision_type', 'urgency', 'source_node', 'destination_node','quantity', 'status', 'is_executed', 'created_at']
+    list_filter = ['agent_name', 'decision_type', 'urgency', 'status', 'is_executed']
     search_fields = ['reason']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text index instead of LIKE scans over every reason
+        return search.search_decisions(queryset, search_term), False
+
+    # Edits keep DecisionStats in step, in the same transaction
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        stats = decision_stats.Deltas()
+        if change:
+            stats.decision(AgentDecision.objects.get(pk=obj.pk), -1)
+        super().save_model(request, obj, form, change)
+        stats.decision(obj)
+        decision_stats.apply(stats)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        stats = decision_stats.Deltas()
+        stats.decision(obj, -1)
+        decision_stats.apply(stats)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        stats = decision_stats.Deltas()
+        stats.move(queryset)
+        decision_stats.apply(stats)
+        super().delete_queryset(request, queryset)
+
+@admin.register(DecisionStats)
+class DecisionStatsAdmin(admin.ModelAdmin):
+    list_display = ['node', 'day', 'decision_type', 'urgency', 'open_count', 'executed_count', 'superseded_count']
+    list_filter = ['day', 'decision_type', 'urgency']
+    search_fields = ['node__code']
+    readonly_fields = [field.name for field in DecisionStats._meta.fields]
+
+    # Maintained with every decision write; rebuild_decision_stats recomputes it
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ShadowRun)
+class ShadowRunAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'primary_engine', 'candidate_engine', 'status', 'primary_mode', 'candidate_mode',
+                    'primary_ms', 'candidate_ms']
+    list_filter = ['candidate_engine', 'status']
+    readonly_fields = [field.name for field in ShadowRun._meta.fields]
+
+    # Written by shadow runs only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Sku)
+class SkuAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'position', 'created_at']
+    search_fields = ['code', 'name']
+    # position is the SKU's column in every packed node vector
+    readonly_fields = ['position']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            # Imported here: sku_matrix pulls in NumPy, which web workers defer
+            from .sku_matrix import next_position
+            obj.position = next_position()
+        super().save_model(request, obj, form, change)
+
 # Register your models here.
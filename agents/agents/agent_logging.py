@@ -0,0 +1,137 @@
+"""
+Agent logging: per-agent levels and sampling, a queue-backed handler so
+agents never wait on log I/O, and LogSummary for per-cycle event counts.
+
+Agents log through ``agent.<name>`` loggers. ``start_async_logging()``
+gives the ``agent`` logger a QueueHandler and hands records to the
+configured handlers on a QueueListener thread, started lazily in each
+process that logs.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from collections import Counter
+from typing import Dict, List, Tuple
+
+AGENT_LOGGER = 'agent'
+
+_sample_rates: Dict[str, float] = {}
+_handler = None
+
+
+def configure(levels: Dict[str, str] = None, sample_rates: Dict[str, float] = None):
+    """
+    Set per-agent log levels ({agent name: level name}) and sample rates
+    ({agent name: fraction of decision logs kept}, 1.0 keeps all)
+    """
+    for name, level in (levels or {}).items():
+        logging.getLogger(f"{AGENT_LOGGER}.{name}").setLevel(level.upper())
+    _sample_rates.clear()
+    _sample_rates.update(sample_rates or {})
+
+
+def sampled(name: str) -> bool:
+    """Whether this decision log from the named agent should be emitted"""
+    rate = _sample_rates.get(name, 1.0)
+    return rate >= 1.0 or random.random() < rate
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records unformatted; the listener's handlers format them off the
+    agent's thread.
+
+    The listener starts on the first record a process emits, not when the
+    handler is installed: a forked worker (gunicorn --preload) inherits the
+    handler but not the parent's listener thread, so it starts its own queue
+    and listener instead of filling a queue nothing drains.
+    """
+
+    def __init__(self, handlers: List[logging.Handler]):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = handlers
+        self.listener = None
+        self.pid = None
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        # handle() holds self.lock, so only one thread starts the listener
+        if self.pid != os.getpid():
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+            self.pid = os.getpid()
+        super().emit(record)
+
+    def stop(self):
+        """Flush and stop this process's listener, if it started one"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+        self.listener = None
+        self.pid = None
+
+
+def start_async_logging(handlers: List[logging.Handler] = None):
+    """
+    Route agent log records through a queue; handlers (default: the root
+    logger's, or stderr if it has none) run on a listener thread each
+    process starts when it first logs
+    """
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    if handlers is None:
+        handlers = list(logging.getLogger().handlers) or [logging.StreamHandler()]
+
+    _handler = _RecordQueueHandler(handlers)
+    agent_logger = logging.getLogger(AGENT_LOGGER)
+    agent_logger.addHandler(_handler)
+    # Root's handlers now run on the listener, so don't also propagate to them
+    agent_logger.propagate = False
+
+    atexit.register(stop_async_logging)
+    return _handler
+
+
+def stop_async_logging():
+    """Flush queued records and restore synchronous logging"""
+    global _handler
+    if _handler is None:
+        return
+    _handler.stop()
+
+    agent_logger = logging.getLogger(AGENT_LOGGER)
+    agent_logger.removeHandler(_handler)
+    agent_logger.propagate = True
+    _handler = None
+
+
+class LogSummary:
+    """
+    Per-cycle log events counted by kind; the messages themselves are only
+    kept (and only formatted) in verbose mode
+    """
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.counts = Counter()
+        self._events = []
+
+    def add(self, kind: str, message: str, *args):
+        """Count an event; message is %-formatted with args when verbose"""
+        self.counts[kind] += 1
+        if self.verbose:
+            self._events.append((kind, message, args))
+
+    def events(self) -> List[Tuple[str, str]]:
+        """(kind, message) for every recorded event, in order"""
+        return [(kind, message % args if args else message) for kind, message, args in self._events]
+
+    def summary(self) -> Dict:
+        return {'total': sum(self.counts.values()), 'counts': dict(self.counts)}
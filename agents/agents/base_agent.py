@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any
 import logging
+import time
+
+from . import agent_logging
 
 logger = logging.getLogger(__name__)
 
@@ -25,15 +28,24 @@ class BaseAgent(ABC):
         """
         pass
     
-    def log_decision(self, decision_type: str, message: str, data: Dict = None):
-        """Log agent decision"""
+    def log_decision(self, decision_type: str, message: str, data: Dict = None, args: tuple = ()):
+        """
+        Log agent decision
+        
+        message is %-formatted with args only if the record is emitted;
+        records below the agent's level or outside its sample rate cost
+        just this check. Returns the entry, or None when skipped.
+        """
+        if not self.logger.isEnabledFor(logging.INFO) or not agent_logging.sampled(self.name):
+            return None
         log_entry = {
             'agent': self.name,
             'decision_type': decision_type,
-            'message': message,
+            'message': message % args if args else message,
             'data': data or {}
         }
-        self.logger.info(f"{self.name}: {message}", extra=log_entry)
+        # 'message' is reserved on LogRecord, so the entry goes under one key
+        self.logger.info("%s: %s", self.name, log_entry['message'], extra={'decision': log_entry})
         return log_entry
     
     def validate_state(self, state: Dict[str, Any], required_keys: List[str]) -> bool:
@@ -42,4 +54,14 @@ class BaseAgent(ABC):
         if missing:
             self.logger.error(f"Missing required state keys: {missing}")
             return False
-        return True
\ No newline at end of file
+        return True
+    
+    def deadline_reached(self, state: Dict[str, Any]) -> bool:
+        """True once the cycle's deadline (a time.perf_counter() value in state) has passed"""
+        deadline = state.get('deadline')
+        return deadline is not None and time.perf_counter() >= deadline
+    
+    def mark_unprocessed(self, state: Dict[str, Any], node_ids: List[Any]):
+        """Record nodes this agent skipped because the deadline passed"""
+        if node_ids:
+            state.setdefault('unprocessed_nodes', {}).setdefault(self.name, []).extend(node_ids)
@@ -0,0 +1,253 @@
+"""
+Multi-drop consolidation of transport decisions.
+
+Transports leaving the same source are merged into open routes
+(source -> drop -> drop ...) with the Clarke-Wright savings heuristic:
+joining the route ending at ``i`` to the route starting at ``j`` saves
+``c(source, j) - c(i, j)``, where ``c`` is the transport cost of a leg. Merges are applied best-first and every
+intermediate state is a valid plan, so the planner stops as soon as its
+time budget runs out and returns whatever it has consolidated so far.
+
+Legs are priced the way the planner priced the direct transports: over
+the lane graph when one is given (cheapest lane path; pairs with no path
+are never joined), else by great-circle miles. They are computed per
+group, only between its source and drops, so the work (and memory) grows
+with the transports being consolidated rather than with the network, and
+it counts against the time budget. Groups larger than MAX_GROUP_DROPS are
+split into sectors around the source and planned one sector at a time, and
+the budget is checked before each sector's legs are built; transports left
+when it runs out ship direct.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Urgency tiers that may share a vehicle; CRITICAL always ships direct
+CONSOLIDATION_TIERS = {'LOW': 'STANDARD', 'MEDIUM': 'STANDARD', 'HIGH': 'HIGH'}
+TIER_COST_MULTIPLIER = {'STANDARD': 1.0, 'HIGH': 1.2}
+TIER_SPEED = {'STANDARD': 50, 'HIGH': 55}
+
+# Merges between deadline checks
+CHECK_EVERY = 64
+
+# Drops planned together: larger groups are swept into chunks of this many
+# by bearing from the source, so legs and savings stay O(chunk^2)
+MAX_GROUP_DROPS = 200
+
+
+def group_key(decision: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(source id, tier) of the group a transport may be consolidated in, None if it ships direct"""
+    tier = CONSOLIDATION_TIERS.get(decision.get('urgency'))
+    if tier is None or decision.get('type', 'TRANSPORT') != 'TRANSPORT':
+        return None
+    return str(decision['from_node_id']), tier
+
+
+def haversine_matrix(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """Great-circle miles between every pair of points"""
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+
+    delta_lat = lat[None, :] - lat[:, None]
+    delta_lon = lon[None, :] - lon[:, None]
+    a = (np.sin(delta_lat / 2) ** 2 +
+         np.cos(lat[:, None]) * np.cos(lat[None, :]) *
+         np.sin(delta_lon / 2) ** 2)
+
+    return 3959 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def sweep_chunks(source: Dict, drops: List[Dict], size: int = MAX_GROUP_DROPS) -> List[List[int]]:
+    """
+    Positions of drops in chunks of at most size, neighbours by bearing
+    from the source so each chunk covers one sector of the map
+    """
+    if len(drops) <= size:
+        return [list(range(len(drops)))]
+    bearing = np.arctan2([d['latitude'] - source['latitude'] for d in drops],
+                         [d['longitude'] - source['longitude'] for d in drops])
+    order = np.argsort(bearing, kind='stable').tolist()
+    return [order[i:i + size] for i in range(0, len(order), size)]
+
+
+def group_legs(source: Dict, drops: List[Dict], cost_per_mile: float,
+               lanes=None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    (cost, miles, hours) of the leg from each point of a group to each
+    other: the source is row/column 0 and the drops 1..n
+
+    With a LaneGraph the legs follow the cheapest lane path (inf where
+    there is none); without one they are great-circle miles at
+    cost_per_mile, and hours is None.
+    """
+    points = [source] + drops
+    if lanes is None:
+        miles = haversine_matrix([p['latitude'] for p in points], [p['longitude'] for p in points])
+        return miles * cost_per_mile, miles, None
+
+    rows = np.array([lanes.index.get(p['id'], -1) for p in points])
+    on_lanes = rows >= 0
+    legs = tuple(np.full((len(points), len(points)), np.inf) for _ in range(3))
+    # Nothing travels back to the source, so column 0 stays inf
+    for column, drop in enumerate(drops, start=1):
+        tree = lanes.to_target(drop['id'])
+        for leg, along in zip(legs, tree):
+            leg[:, column] = np.where(on_lanes, along[rows], np.inf)
+    return legs
+
+
+def _savings_routes(quantities: List[int], costs: np.ndarray, vehicle_capacity: int,
+                    max_stops: int, deadline: float) -> Tuple[List[List[int]], bool]:
+    """
+    Clarke-Wright merge of one source's drops; costs come from group_legs.
+    Returns routes as drop positions.
+    """
+    n = len(quantities)
+    routes = {i: [i] for i in range(n)}
+    route_of = list(range(n))
+    load = {i: quantities[i] for i in range(n)}
+
+    # savings[i, j]: append the route starting at j after the route ending at i
+    with np.errstate(invalid='ignore'):
+        savings = costs[0, 1:][None, :] - costs[1:, 1:]
+    np.fill_diagonal(savings, -np.inf)
+    candidates = np.flatnonzero(savings > 0)
+    order = candidates[np.argsort(-savings.ravel()[candidates], kind='stable')]
+
+    for step, flat in enumerate(order):
+        if step % CHECK_EVERY == 0 and time.perf_counter() >= deadline:
+            return list(routes.values()), False
+
+        i, j = divmod(int(flat), n)
+        tail_route, head_route = route_of[i], route_of[j]
+        if tail_route == head_route:
+            continue
+
+        tail, head = routes[tail_route], routes[head_route]
+        if tail[-1] != i or head[0] != j:
+            continue
+        if len(tail) + len(head) > max_stops:
+            continue
+        if load[tail_route] + load[head_route] > vehicle_capacity:
+            continue
+
+        tail.extend(head)
+        load[tail_route] += load.pop(head_route)
+        del routes[head_route]
+        for k in head:
+            route_of[k] = tail_route
+
+    return list(routes.values()), True
+
+
+def consolidate(decisions: List[Dict[str, Any]], nodes: List[Dict], cost_per_mile: float,
+                time_budget_ms: float, vehicle_capacity: int = 20000,
+                max_stops: int = 6, lanes=None, first_route_id: int = 1) -> Dict[str, Any]:
+    """
+    Group TRANSPORT decisions by source into multi-drop routes
+
+    Decisions on a route keep one entry per drop (execution is unchanged);
+    their estimated_cost becomes their share of the route cost, split by
+    direct transport cost, and they gain a 'route' entry in metadata.
+    Pass the planner's lane graph as lanes when transports were costed on it.
+    Routes are numbered from first_route_id and record their group
+    (source_id, tier).
+
+    Returns:
+        Dictionary with the updated decisions, route summaries and whether
+        planning finished inside the budget
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget_ms / 1000.0
+    node_map = {str(n['id']): n for n in nodes}
+
+    groups = {}
+    for position, decision in enumerate(decisions):
+        key = group_key(decision)
+        if key is not None:
+            groups.setdefault(key, []).append(position)
+
+    chunks = []
+    for (source_id, tier), positions in groups.items():
+        drops = [node_map[str(decisions[p]['to_node_id'])] for p in positions]
+        for chunk in sweep_chunks(node_map[source_id], drops):
+            chunks.append(((source_id, tier), [positions[k] for k in chunk]))
+
+    routes = []
+    complete = True
+    # Largest groups first: they hold most of the available savings
+    for (source_id, tier), positions in sorted(chunks, key=lambda g: -len(g[1])):
+        if len(positions) < 2:
+            continue
+        if time.perf_counter() >= deadline:
+            complete = False
+            break
+
+        costs, miles, hours = group_legs(
+            node_map[source_id], [node_map[str(decisions[p]['to_node_id'])] for p in positions],
+            cost_per_mile, lanes
+        )
+        if time.perf_counter() >= deadline:
+            complete = False
+            break
+        quantities = [int(decisions[p].get('quantity') or 0) for p in positions]
+        planned, finished = _savings_routes(
+            quantities, costs, vehicle_capacity, max_stops, deadline
+        )
+        complete = complete and finished
+
+        for stops in planned:
+            if len(stops) < 2:
+                continue
+            route_id = first_route_id + len(routes)
+            multiplier = TIER_COST_MULTIPLIER[tier]
+            path = [0] + [k + 1 for k in stops]
+            legs = miles[path[:-1], path[1:]]
+            direct = costs[0, path[1:]]
+            direct_cost = sum(decisions[positions[k]]['estimated_cost'] for k in stops)
+            handling = sum(decisions[positions[k]]['metadata']['cost_breakdown']['handling'] for k in stops)
+            route_cost = (costs[path[:-1], path[1:]].sum() + handling) * multiplier
+
+            # Never hand back a route that costs more than shipping direct
+            if route_cost >= direct_cost:
+                continue
+
+            stop_codes = [node_map[source_id]['code']] + [decisions[positions[k]]['to_node_code'] for k in stops]
+            share = direct / direct.sum() if direct.sum() > 0 else np.full(len(stops), 1 / len(stops))
+            if hours is None:
+                arrival = np.cumsum(legs) / TIER_SPEED[tier]
+            else:
+                arrival = np.cumsum(hours[path[:-1], path[1:]])
+            for stop, k in enumerate(stops):
+                decision = decisions[positions[k]]
+                decision['metadata']['direct_cost'] = decision['estimated_cost']
+                decision['estimated_cost'] = float(route_cost * share[stop])
+                decision['metadata']['transit_time'] = int(arrival[stop])
+                decision['metadata']['route'] = {
+                    'route_id': route_id,
+                    'stop': stop + 1,
+                    'stops': len(stops),
+                }
+                decision['reason'] = (
+                    f"Consolidated route: {' → '.join(stop_codes)} (stop {stop + 1}/{len(stops)})"
+                )
+
+            routes.append({
+                'route_id': route_id,
+                'source_id': source_id,
+                'tier': tier,
+                'source_code': node_map[source_id]['code'],
+                'stops': stop_codes[1:],
+                'distance': float(legs.sum()),
+                'cost': float(route_cost),
+                'direct_cost': float(direct_cost),
+            })
+
+    return {
+        'decisions': decisions,
+        'routes': routes,
+        'savings': sum(r['direct_cost'] - r['cost'] for r in routes),
+        'complete': complete,
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+    }
@@ -1,56 +1,343 @@
 from .base_agent import BaseAgent
 from .inventory_agent import InventoryAgent
-from .transportation_agent import TransportationAgent
+from .transportation_agent import TransportationAgent, URGENCY_PRIORITY
+from .consolidation import group_key
 from .service_level_agent import ServiceLevelAgent
 from .demand_forecast_agent import DemandForecastAgent
-from typing import Dict, Any
+from .agent_logging import LogSummary
+from typing import Dict, List, Any
+import time
+import numpy as np
+
+# Time the consolidation phase may spend when the state does not set one
+DEFAULT_CONSOLIDATION_BUDGET_MS = 50
+
+# Share of a deadline forecasting may use, so transport matching always gets the rest
+FORECAST_DEADLINE_SHARE = 0.5
 
 class CoordinatorAgent(BaseAgent):
     """Orchestrates all agents"""
     
-    def __init__(self):
+    def __init__(self, history_store=None):
         super().__init__("Coordinator", priority=0)
         self.agents = {
-            'demand_forecast': DemandForecastAgent(),
+            'demand_forecast': DemandForecastAgent(history_store=history_store),
             'inventory': InventoryAgent(),
             'transportation': TransportationAgent(),
             'service_level': ServiceLevelAgent()
         }
     
-    def make_decision(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        results = {
-            'forecasts': {},
-            'inventory_decisions': [],
-            'transport_decisions': [],
-            'service_alerts': [],
-            'logs': []
-        }
+    def make_decision(self, state: Dict[str, Any], deadline_ms: float = None) -> Dict[str, Any]:
+        """
+        Run all phases; with deadline_ms, forecasting and transport matching
+        work most urgent first and stop when the budget is spent, returning
+        the plan so far and the nodes they did not get to
+        
+        results['evaluations'] holds the per-node outcomes replan() starts from.
+        If a phase raises, the plan so far comes back with results['error']
+        set; it is incomplete and must not be saved.
+        Log events are counted in results['log_summary']; the messages are
+        returned in results['logs'] only when state['verbose_logs'] is set.
+        """
+        self._start(state, deadline_ms)
+        results = self._empty_results()
         
         try:
             # Phase 1: Demand Forecasting
-            forecast_result = self.agents['demand_forecast'].make_decision(state)
-            results['forecasts'] = forecast_result.get('forecasts', {})
-            results['logs'].append({'agent': 'demand_forecast', 'message': 'Forecasts generated'})
+            results['forecasts'] = self._forecast(state)
+            state['log'].add('demand_forecast', "Forecasts generated")
             
             state['forecasts'] = results['forecasts']
             
             # Phase 2: Inventory Management
             results['inventory_decisions'] = self.agents['inventory'].make_decision(state)
-            results['logs'].append({'agent': 'inventory', 'message': f"{len(results['inventory_decisions'])} decisions"})
+            state['log'].add('inventory', "%d decisions", len(results['inventory_decisions']))
             
             state['inventory_decisions'] = results['inventory_decisions']
             
             # Phase 3: Transportation Optimization
-            results['transport_decisions'] = self.agents['transportation'].make_decision(state)
-            results['logs'].append({'agent': 'transportation', 'message': f"{len(results['transport_decisions'])} transports"})
+            planned = self.agents['transportation'].make_decision(state)
+            state['log'].add('transportation', "%d transports", len(planned))
+            
+            # Phase 3b: Shipment consolidation (bounded; 0 disables it)
+            results['transport_decisions'] = self._consolidate(state, planned, results)
             
             state['transport_decisions'] = results['transport_decisions']
             
             # Phase 4: Service Level Monitoring
             results['service_alerts'] = self.agents['service_level'].make_decision(state)
-            results['logs'].append({'agent': 'service_level', 'message': f"{len(results['service_alerts'])} alerts"})
+            state['log'].add('service_level', "%d alerts", len(results['service_alerts']))
+            
+            groups, routes = {}, {}
+            for transport in planned:
+                key = group_key(transport)
+                if key is not None:
+                    groups.setdefault(key, set()).add(transport['to_node_id'])
+            for route in results['routes']:
+                routes.setdefault((route['source_id'], route['tier']), []).append(route)
+            results['evaluations'] = {
+                'forecasts': dict(results['forecasts']),
+                'inventory': {d['node_id']: d for d in results['inventory_decisions']},
+                'transports': {t['to_node_id']: t for t in planned},
+                'consolidated': {t['to_node_id']: t for t in results['transport_decisions']},
+                'published': {t['to_node_id']: self._published(t) for t in results['transport_decisions']},
+                'groups': groups,
+                'routes': routes,
+                'next_route_id': len(results['routes']) + 1,
+                'alerts': {a['node_id']: a for a in results['service_alerts']},
+            }
             
         except Exception as e:
             self.logger.error(f"Error in coordination: {str(e)}", exc_info=True)
+            results['error'] = str(e)
+        
+        return self._finish(state, results)
+    
+    def replan(self, state: Dict[str, Any], previous: Dict[str, Any], dirty_ids,
+               deadline_ms: float = None) -> Dict[str, Any]:
+        """
+        Re-evaluate only the nodes that changed since the previous cycle
+        
+        state carries every active node and current demand; previous is the
+        last cycle's results['evaluations']; dirty_ids are nodes whose
+        inventory, capacity or demand changed (or that were removed).
+        Forecasts, inventory decisions and service alerts are recomputed for
+        dirty nodes only. Transports are repaired: reorders of dirty nodes or
+        whose source changed are routed again over all nodes, and unchanged
+        reorders only check whether a changed node is now a cheaper source.
+        Only the consolidation groups (source, tier) holding a changed
+        transport are consolidated again; other routes are kept.
+        
+        previous is updated in place and returned as results['evaluations'];
+        after a failed re-plan it is partly updated and must be discarded.
         
-        return results
\ No newline at end of file
+        Returns the full plan like make_decision, plus results['changes']:
+        the nodes whose decisions may differ and those decisions. A failed
+        re-plan sets results['error'] instead of results['changes'].
+        """
+        self._start(state, deadline_ms)
+        results = self._empty_results()
+        
+        nodes = state['nodes']
+        node_map = {n['id']: n for n in nodes}
+        dirty = set(dirty_ids)
+        dirty_nodes = [node_map[i] for i in dirty if i in node_map]
+        
+        evaluations = previous
+        for node_id in dirty:
+            for key in ('forecasts', 'inventory', 'alerts'):
+                evaluations[key].pop(node_id, None)
+        
+        try:
+            # Phase 1: forecasts for dirty nodes
+            sub_state = dict(state, nodes=dirty_nodes)
+            evaluations['forecasts'].update(self._forecast(sub_state))
+            results['forecasts'] = evaluations['forecasts']
+            
+            # Phase 2: inventory decisions for dirty nodes
+            sub_state['forecasts'] = evaluations['forecasts']
+            for decision in self.agents['inventory'].make_decision(sub_state):
+                evaluations['inventory'][decision['node_id']] = decision
+            results['inventory_decisions'] = list(evaluations['inventory'].values())
+            
+            # Phase 3: repair transports
+            transportation = self.agents['transportation']
+            transports = evaluations['transports']
+            reroute = set()
+            for dest, transport in list(transports.items()):
+                if dest in dirty or transport['from_node_id'] in dirty:
+                    del transports[dest]
+                    reroute.add(dest)
+            reroute |= dirty
+            
+            reorders = [evaluations['inventory'][d] for d in reroute
+                        if evaluations['inventory'].get(d, {}).get('type') == 'REORDER']
+            reorders.sort(key=lambda d: URGENCY_PRIORITY.get(d.get('urgency'), len(URGENCY_PRIORITY)))
+            routed = transportation.plan_routes(reorders, node_map, nodes, state)
+            
+            unchanged = [d for dest, d in evaluations['inventory'].items()
+                         if d['type'] == 'REORDER' and dest not in reroute]
+            for dest, route in transportation.plan_routes(unchanged, node_map, dirty_nodes, state).items():
+                current = transports.get(dest)
+                if current is None or route['cost'] < current['estimated_cost']:
+                    routed[dest] = route
+            
+            for dest, route in routed.items():
+                transports[dest] = transportation._transport_decision(
+                    evaluations['inventory'][dest], node_map[dest], route
+                )
+            state['log'].add('transportation', "%d transports re-planned", len(routed))
+            
+            # Phase 3b: consolidate again only the groups a changed transport leaves or joins
+            consolidated = evaluations['consolidated']
+            members = evaluations['groups']
+            moved = reroute | set(routed)
+            groups = set()
+            for dest in moved:
+                old = consolidated.pop(dest, None)
+                key = group_key(old) if old is not None else None
+                if key is not None:
+                    members[key].discard(dest)
+                    groups.add(key)
+                key = group_key(transports[dest]) if dest in transports else None
+                if key is not None:
+                    members.setdefault(key, set()).add(dest)
+                    groups.add(key)
+            regroup = {dest for dest in moved if dest in transports}
+            for key in groups:
+                regroup |= members[key]
+                if not members[key]:
+                    del members[key]
+                evaluations['routes'].pop(key, None)
+            regroup = [transports[dest] for dest in regroup]
+            
+            for transport in self._consolidate(state, regroup, results,
+                                               first_route_id=evaluations['next_route_id']):
+                consolidated[transport['to_node_id']] = transport
+            for route in results['routes']:
+                evaluations['routes'].setdefault((route['source_id'], route['tier']), []).append(route)
+            evaluations['next_route_id'] += len(results['routes'])
+            results['transport_decisions'] = list(consolidated.values())
+            results['routes'] = [route for routes in evaluations['routes'].values() for route in routes]
+            
+            changed = set()
+            for transport in regroup:
+                dest = transport['to_node_id']
+                published = self._published(consolidated[dest])
+                if evaluations['published'].get(dest) != published:
+                    evaluations['published'][dest] = published
+                    changed.add(dest)
+            for dest in moved - set(transports):
+                if evaluations['published'].pop(dest, None) is not None:
+                    changed.add(dest)
+            
+            # Phase 4: service alerts where inventory, demand or inbound transport changed
+            affected = dirty | reroute | changed
+            incoming = [consolidated[i] for i in affected if i in consolidated]
+            for node_id in affected:
+                evaluations['alerts'].pop(node_id, None)
+            alerts = self.agents['service_level'].make_decision(dict(
+                state, nodes=[node_map[i] for i in affected if i in node_map], transport_decisions=incoming
+            ))
+            for alert in alerts:
+                evaluations['alerts'][alert['node_id']] = alert
+            results['service_alerts'] = list(evaluations['alerts'].values())
+            
+            results['evaluations'] = evaluations
+            results['changes'] = {
+                'nodes': affected,
+                'inventory_decisions': [evaluations['inventory'][i] for i in affected if i in evaluations['inventory']],
+                'transport_decisions': incoming,
+                'service_alerts': alerts,
+            }
+            state['log'].add('coordinator', "Re-planned %d of %d nodes, %d with changed decisions",
+                             len(dirty_nodes), len(nodes), len(affected))
+            
+        except Exception as e:
+            self.logger.error(f"Error in coordination: {str(e)}", exc_info=True)
+            results['error'] = str(e)
+        
+        return self._finish(state, results)
+    
+    def _empty_results(self) -> Dict[str, Any]:
+        return {
+            'forecasts': {},
+            'inventory_decisions': [],
+            'transport_decisions': [],
+            'routes': [],
+            'service_alerts': [],
+            'deadline_exceeded': False,
+            'unprocessed_nodes': {}
+        }
+    
+    def _start(self, state: Dict[str, Any], deadline_ms: float = None):
+        if deadline_ms is not None:
+            state['deadline'] = time.perf_counter() + deadline_ms / 1000.0
+        state['unprocessed_nodes'] = {}
+        state['log'] = LogSummary(verbose=state.get('verbose_logs', False))
+    
+    def _forecast(self, state: Dict[str, Any]) -> Dict[Any, int]:
+        """Forecast phase, limited to its share of any deadline"""
+        deadline = state.get('deadline')
+        if deadline is not None:
+            state['deadline'] = time.perf_counter() + (deadline - time.perf_counter()) * FORECAST_DEADLINE_SHARE
+        try:
+            return self.agents['demand_forecast'].make_decision(state).get('forecasts', {})
+        finally:
+            state['deadline'] = deadline
+    
+    def _consolidate(self, state: Dict[str, Any], planned: List[Dict], results: Dict[str, Any],
+                     first_route_id: int = 1) -> List[Dict]:
+        """Consolidate copies of the planned transports so the originals stay reusable"""
+        transports = [dict(t, metadata=dict(t['metadata'])) for t in planned]
+        
+        budget_ms = state.get('consolidation_budget_ms', DEFAULT_CONSOLIDATION_BUDGET_MS)
+        if state.get('deadline') is not None:
+            budget_ms = min(budget_ms, (state['deadline'] - time.perf_counter()) * 1000)
+        if budget_ms > 0 and transports:
+            consolidated = self.agents['transportation'].consolidate(
+                transports, state['nodes'], budget_ms, lanes=state.get('lanes'),
+                first_route_id=first_route_id
+            )
+            results['routes'] = consolidated['routes']
+            state['log'].add('transportation', "%d consolidated routes, $%.2f saved in %.0f ms%s",
+                             len(results['routes']), consolidated['savings'], consolidated['elapsed_ms'],
+                             '' if consolidated['complete'] else ' (budget reached)')
+        
+        return transports
+    
+    def _published(self, transport: Dict) -> tuple:
+        return (transport['from_node_id'], transport['quantity'], transport['estimated_cost'], transport['reason'])
+    
+    def _finish(self, state: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+        results['unprocessed_nodes'] = state['unprocessed_nodes']
+        results['deadline_exceeded'] = bool(results['unprocessed_nodes']) or self.deadline_reached(state)
+        if results['deadline_exceeded']:
+            skipped = sum(len(ids) for ids in results['unprocessed_nodes'].values())
+            state['log'].add('coordinator', "Deadline reached, %d node evaluations skipped", skipped)
+        
+        log = state.pop('log')
+        results['log_summary'] = log.summary()
+        if log.verbose:
+            results['logs'] = [{'agent': agent, 'message': message} for agent, message in log.events()]
+        
+        return results
+    
+    def plan_sku_matrix(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run forecast, inventory and transport phases over a node x SKU matrix
+        
+        state holds numpy arrays: history (periods, nodes, skus), on_hand and
+        capacity (nodes, skus), latitude/longitude (nodes,), and optionally
+        active (nodes,), node_types and demand (nodes, skus; defaults to the
+        latest history period, like the scalar path's current demand).
+        """
+        active = state.get('active')
+        history = state['history']
+        
+        forecasts = self.agents['demand_forecast'].forecast_matrix(
+            history, state.get('node_types')
+        )
+        demand = state.get('demand')
+        if demand is None:
+            demand = history[-1] if len(history) else np.zeros_like(state['on_hand'])
+        inventory = self.agents['inventory'].make_matrix_decision(
+            state['on_hand'], state['capacity'], demand, active
+        )
+        transport = self.agents['transportation'].make_matrix_decision(
+            state['on_hand'], inventory['order_quantity'], inventory['reorder'],
+            inventory['urgency'], state['latitude'], state['longitude'], active,
+            distances=state.get('distances')
+        )
+        
+        return {
+            'forecasts': forecasts,
+            'inventory': inventory,
+            'transport': transport,
+            'summary': {
+                'reorders': int(inventory['reorder'].sum()),
+                'redistributions': int(inventory['redistribute'].sum()),
+                'routed': int((transport['source'] >= 0).sum()),
+                'transport_cost': float(transport['estimated_cost'].sum(dtype=np.float64)),
+            }
+        }
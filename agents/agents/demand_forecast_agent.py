@@ -3,11 +3,21 @@ from typing import Dict, List, Any
 from collections import defaultdict, deque
 import numpy as np
 
+NODE_TYPE_MULTIPLIER = {
+    'STORE': 1.1,
+    'DC': 1.05,
+    'WH': 1.0,
+    'SUPPLIER': 0.95
+}
+
 class DemandForecastAgent(BaseAgent):
     """Agent responsible for demand forecasting"""
     
-    def __init__(self):
+    def __init__(self, history_store=None):
         super().__init__("DemandForecaster", priority=1)
+        # Optional RingBufferStore shared by all workers; falls back to
+        # per-instance history when not configured
+        self.history_store = history_store
         self.historical_data = defaultdict(lambda: deque(maxlen=30))
     
     def make_decision(self, state: Dict[str, Any]) -> Dict[str, Any]:
@@ -18,26 +28,50 @@ class DemandForecastAgent(BaseAgent):
         nodes = state['nodes']
         current_demands = state['demands']
         
+        if self.history_store is not None:
+            self.history_store.append({
+                node['id']: current_demands.get(node['id'], 0) for node in nodes
+            })
+        
+        if state.get('deadline') is not None:
+            # Nodes closest to running out first, so a cut-off drops the least urgent
+            nodes = sorted(nodes, key=lambda n: self._days_of_cover(n, current_demands))
+        
+        unprocessed = []
         for node in nodes:
             node_id = node['id']
-            current_demand = current_demands.get(node_id, 0)
             
-            self.historical_data[node_id].append(current_demand)
-            forecast = self._generate_forecast(node_id, node)
+            if self.history_store is None:
+                self.historical_data[node_id].append(current_demands.get(node_id, 0))
+            
+            if self.deadline_reached(state):
+                unprocessed.append(node_id)
+                continue
+            
+            if self.history_store is not None:
+                history = self.history_store.get(node_id)
+            else:
+                history = list(self.historical_data[node_id])
+            
+            forecast = self._generate_forecast(history, node)
             forecasts[node_id] = forecast
         
+        self.mark_unprocessed(state, unprocessed)
+        
         return {
             'type': 'FORECAST',
             'agent': self.name,
             'forecasts': forecasts
         }
     
-    def _generate_forecast(self, node_id: str, node: Dict) -> int:
+    def _days_of_cover(self, node: Dict, demands: Dict) -> float:
+        demand = demands.get(node['id'], 0)
+        return node['current_inventory'] / demand if demand > 0 else float('inf')
+    
+    def _generate_forecast(self, history, node: Dict) -> int:
         """Generate demand forecast"""
-        history = list(self.historical_data[node_id])
-        
         if len(history) < 3:
-            return int(np.mean(history)) if history else 0
+            return int(np.mean(history)) if len(history) else 0
         
         ma_forecast = np.mean(history[-7:]) if len(history) >= 7 else np.mean(history)
         
@@ -54,13 +88,62 @@ class DemandForecastAgent(BaseAgent):
         base_forecast = (ma_forecast * 0.4 + wma_forecast * 0.6)
         trend_adjustment = trend * 3
         
-        node_type_multiplier = {
-            'STORE': 1.1,
-            'DC': 1.05,
-            'WH': 1.0,
-            'SUPPLIER': 0.95
-        }.get(node.get('node_type', 'WH'), 1.0)
+        node_type_multiplier = NODE_TYPE_MULTIPLIER.get(node.get('node_type', 'WH'), 1.0)
         
         final_forecast = (base_forecast + trend_adjustment) * node_type_multiplier
         
-        return max(0, int(final_forecast))
\ No newline at end of file
+        return max(0, int(final_forecast))
+    
+    def forecast_matrix(self, history: np.ndarray, node_types: List[str] = None,
+                        block_size: int = 256) -> np.ndarray:
+        """
+        Vectorized _generate_forecast over a node x SKU matrix
+        
+        Args:
+            history: (periods, nodes, skus) demand, oldest period first
+            node_types: node type per row for the type multiplier
+            block_size: rows per block, bounds temporaries on large matrices
+            
+        Returns:
+            (nodes, skus) int32 forecasts
+        """
+        history = np.asarray(history, dtype=np.float32)
+        periods, n_nodes, n_skus = history.shape
+        forecasts = np.zeros((n_nodes, n_skus), dtype=np.int32)
+        if periods == 0:
+            return forecasts
+        
+        if periods < 3:
+            return history.mean(axis=0).astype(np.int32)
+        
+        multiplier = np.array(
+            [NODE_TYPE_MULTIPLIER.get(t, 1.0) for t in node_types] if node_types else [1.0] * n_nodes,
+            dtype=np.float32
+        )
+        
+        if periods >= 7:
+            weights = np.exp(np.linspace(-1, 0, 7)).astype(np.float32)
+            weights /= weights.sum()
+            # Least-squares slope, same as np.polyfit(x, y, 1)[0] per cell
+            x = np.arange(periods, dtype=np.float32)
+            x -= x.mean()
+            x /= (x ** 2).sum()
+        
+        for start in range(0, n_nodes, block_size):
+            block = history[:, start:start + block_size]
+            
+            if periods >= 7:
+                recent = block[-7:]
+                ma_forecast = recent.mean(axis=0)
+                wma_forecast = np.tensordot(weights, recent, axes=1)
+                trend = np.tensordot(x, block, axes=1)
+            else:
+                ma_forecast = block.mean(axis=0)
+                wma_forecast = ma_forecast
+                trend = 0
+            
+            base_forecast = ma_forecast * 0.4 + wma_forecast * 0.6
+            final_forecast = (base_forecast + trend * 3) * multiplier[start:start + block_size, None]
+            forecasts[start:start + block_size] = np.maximum(final_forecast, 0).astype(np.int32)
+        
+        return forecasts
@@ -0,0 +1,172 @@
+"""
+Memory-mapped ring buffer of per-node demand history.
+
+File layout (little-endian, fixed):
+    header  int64[4]                    magic, version, capacity, window
+    counts  int64[capacity]             values ever appended to each slot
+    values  float32[capacity, window]   ring of the latest ``window`` values
+
+Node ids map to slots through ``index.json`` next to the data file. Every
+worker maps the same file, so they share one copy in the page cache instead
+of each rebuilding history from the database. Only one process writes at a
+time; the agent cycle already runs under the cycle lock.
+"""
+import json
+import os
+
+import numpy as np
+
+MAGIC = 0x48495354
+VERSION = 1
+HEADER_FIELDS = 4
+
+
+class RingBufferStore:
+    """Fixed-layout nodes x window float32 history shared through mmap"""
+
+    def __init__(self, path: str, window: int = 30, capacity: int = 1024):
+        self.path = path
+        self.data_path = os.path.join(path, 'history.f32')
+        self.index_path = os.path.join(path, 'index.json')
+        self.created = False
+
+        os.makedirs(path, exist_ok=True)
+        if not os.path.exists(self.data_path):
+            self._write_file(capacity, window)
+            self._write_index({})
+            self.created = True
+
+        self._data_stamp = None
+        self._index_stamp = None
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # File handling
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _file_size(capacity: int, window: int) -> int:
+        return 8 * (HEADER_FIELDS + capacity) + 4 * capacity * window
+
+    def _write_file(self, capacity: int, window: int, copy_from=None):
+        """Create (or grow into) a new data file and swap it in atomically"""
+        tmp = f"{self.data_path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(np.array([MAGIC, VERSION, capacity, window], dtype='<i8').tobytes())
+            f.truncate(self._file_size(capacity, window))
+
+        if copy_from is not None:
+            counts, values = copy_from
+            mm, new_counts, new_values = self._map_file(tmp)
+            new_counts[:len(counts)] = counts
+            new_values[:len(values)] = values
+            mm.flush()
+            del mm, new_counts, new_values
+
+        os.replace(tmp, self.data_path)
+
+    @staticmethod
+    def _map_file(path):
+        mm = np.memmap(path, dtype=np.uint8, mode='r+')
+        magic, version, capacity, window = np.frombuffer(mm, dtype='<i8', count=HEADER_FIELDS)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a forecast history file")
+
+        counts = np.ndarray((capacity,), dtype='<i8', buffer=mm, offset=8 * HEADER_FIELDS)
+        values = np.ndarray((capacity, window), dtype='<f4', buffer=mm,
+                            offset=8 * (HEADER_FIELDS + capacity))
+        return mm, counts, values
+
+    def _write_index(self, index):
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self.index_path)
+
+    def _refresh(self):
+        """Remap / reload when another process grew the file or added nodes"""
+        data_stat = os.stat(self.data_path)
+        data_stamp = (data_stat.st_ino, data_stat.st_size)
+        if data_stamp != self._data_stamp:
+            self._mm, self.counts, self.values = self._map_file(self.data_path)
+            self._data_stamp = data_stamp
+
+        index_stat = os.stat(self.index_path)
+        index_stamp = (index_stat.st_ino, index_stat.st_mtime_ns, index_stat.st_size)
+        if index_stamp != self._index_stamp:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+            self._index_stamp = index_stamp
+
+    @property
+    def capacity(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def window(self) -> int:
+        return self.values.shape[1]
+
+    def _assign_slots(self, node_ids):
+        needed = len(self.index) + len(node_ids)
+        if needed > self.capacity:
+            capacity = max(needed, self.capacity * 2)
+            self._write_file(capacity, self.window, copy_from=(self.counts, self.values))
+
+        index = dict(self.index)
+        for node_id in node_ids:
+            index[node_id] = len(index)
+        self._write_index(index)
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # Reads and writes
+    # ------------------------------------------------------------------
+    def append(self, values: dict):
+        """Append one value per node id (the writer's per-cycle demand)"""
+        if not values:
+            return
+        self._refresh()
+
+        new_ids = [node_id for node_id in values if node_id not in self.index]
+        if new_ids:
+            self._assign_slots(new_ids)
+
+        slots = np.fromiter((self.index[node_id] for node_id in values), dtype=np.int64, count=len(values))
+        new_values = np.fromiter(values.values(), dtype=np.float32, count=len(values))
+
+        positions = self.counts[slots] % self.window
+        self.values[slots, positions] = new_values
+        self.counts[slots] += 1
+        self._mm.flush()
+
+    def load(self, histories: dict):
+        """Replace each node's window with the given oldest-to-newest values"""
+        if not histories:
+            return
+        self._refresh()
+
+        new_ids = [node_id for node_id in histories if node_id not in self.index]
+        if new_ids:
+            self._assign_slots(new_ids)
+
+        for node_id, history in histories.items():
+            history = np.asarray(history, dtype=np.float32)[-self.window:]
+            slot = self.index[node_id]
+            self.values[slot, :len(history)] = history
+            self.counts[slot] = len(history)
+        self._mm.flush()
+
+    def get(self, node_id: str) -> np.ndarray:
+        """History of one node, oldest first; a view into the map when not wrapped"""
+        self._refresh()
+
+        slot = self.index.get(node_id)
+        if slot is None:
+            return np.empty(0, dtype=np.float32)
+
+        count = int(self.counts[slot])
+        row = self.values[slot]
+        if count <= self.window:
+            return row[:count]
+
+        start = count % self.window
+        return np.concatenate((row[start:], row[:start]))
@@ -1,5 +1,9 @@
 from .base_agent import BaseAgent
 from typing import Dict, List, Any
+import numpy as np
+
+# Index of each urgency level in the matrix API's urgency codes
+URGENCY_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
 
 class InventoryAgent(BaseAgent):
     """Agent responsible for inventory level management"""
@@ -11,6 +15,14 @@ class InventoryAgent(BaseAgent):
         self.safety_stock = 0.15   # 15% safety stock
     
     def make_decision(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Reorder / redistribute decisions per node
+        
+        Nodes with an entry in state['reorder_policies'] (reorder point,
+        order-up-to level and safety stock in units, precomputed from their
+        demand history) are compared against those; the others use the
+        fixed capacity ratios.
+        """
         if not self.validate_state(state, ['nodes', 'demands']):
             return []
         
@@ -18,6 +30,7 @@ class InventoryAgent(BaseAgent):
         nodes = state['nodes']
         demands = state.get('demands', {})
         forecasts = state.get('forecasts', {})
+        policies = state.get('reorder_policies') or {}
         
         for node in nodes:
             if not node.get('is_active', True):
@@ -35,13 +48,27 @@ class InventoryAgent(BaseAgent):
             # Calculate days of supply
             days_of_supply = inventory / current_demand if current_demand > 0 else float('inf')
             
+            policy = policies.get(node_id)
+            if policy is not None:
+                target_inventory = min(policy['order_up_to'], capacity)
+                needs_reorder = inventory <= min(policy['reorder_point'], capacity)
+            else:
+                target_inventory = int(self.target_level * capacity)
+                needs_reorder = inventory_ratio < self.reorder_point or days_of_supply < 7
+            
             # Reorder decision
-            if inventory_ratio < self.reorder_point or days_of_supply < 7:
-                order_quantity = int((self.target_level * capacity) - inventory)
-                safety_qty = int(self.safety_stock * capacity)
-                order_quantity += safety_qty
+            if needs_reorder:
+                if policy is not None:
+                    # Safety stock is already part of the order-up-to level
+                    order_quantity = max(1, target_inventory - inventory)
+                else:
+                    order_quantity = int((self.target_level * capacity) - inventory)
+                    safety_qty = int(self.safety_stock * capacity)
+                    order_quantity += safety_qty
                 
                 urgency = self._calculate_urgency(inventory_ratio, days_of_supply)
+                if policy is not None and inventory < policy['safety_stock'] and urgency in ('LOW', 'MEDIUM'):
+                    urgency = 'HIGH'
                 
                 decisions.append({
                     'type': 'REORDER',
@@ -53,19 +80,21 @@ class InventoryAgent(BaseAgent):
                     'reason': f"Inventory at {inventory_ratio*100:.1f}% ({days_of_supply:.1f} days supply)",
                     'metadata': {
                         'current_inventory': inventory,
-                        'target_inventory': int(self.target_level * capacity),
+                        'target_inventory': target_inventory,
                         'forecast_demand': forecast_demand,
-                        'days_of_supply': days_of_supply
+                        'days_of_supply': days_of_supply,
+                        'reorder_point': policy['reorder_point'] if policy is not None else None
                     }
                 })
                 
                 self.log_decision('REORDER', 
-                                f"Reorder triggered for {node['code']}: {order_quantity} units",
-                                {'urgency': urgency})
+                                "Reorder triggered for %s: %s units",
+                                {'urgency': urgency},
+                                args=(node['code'], order_quantity))
             
             # Excess inventory redistribution
-            elif inventory_ratio > 0.90:
-                excess_quantity = int(inventory - (self.target_level * capacity))
+            elif inventory_ratio > 0.90 and inventory > target_inventory:
+                excess_quantity = int(inventory - target_inventory)
                 
                 decisions.append({
                     'type': 'REDISTRIBUTE',
@@ -90,4 +119,58 @@ class InventoryAgent(BaseAgent):
             return 'HIGH'
         elif inventory_ratio < 0.30 or days_of_supply < 7:
             return 'MEDIUM'
-        return 'LOW'
\ No newline at end of file
+        return 'LOW'
+    
+    def make_matrix_decision(self, on_hand: np.ndarray, capacity: np.ndarray,
+                             demand: np.ndarray, active: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        Vectorized make_decision over a node x SKU matrix
+        
+        Args:
+            on_hand, capacity, demand: (nodes, skus) arrays
+            active: optional (nodes,) mask; inactive rows never trigger
+            
+        Returns:
+            Dictionary of (nodes, skus) arrays: reorder/redistribute masks,
+            order/excess quantities and urgency codes (see URGENCY_LEVELS)
+        """
+        on_hand = np.asarray(on_hand, dtype=np.float64)
+        capacity = np.asarray(capacity, dtype=np.float64)
+        demand = np.asarray(demand, dtype=np.float64)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inventory_ratio = np.where(capacity > 0, on_hand / capacity, 0.0)
+            days_of_supply = np.where(demand > 0, on_hand / demand, np.inf)
+        
+        reorder = (inventory_ratio < self.reorder_point) | (days_of_supply < 7)
+        redistribute = ~reorder & (inventory_ratio > 0.90)
+        if active is not None:
+            active = np.asarray(active, dtype=bool)[:, None]
+            reorder &= active
+            redistribute &= active
+        
+        target = self.target_level * capacity
+        order_quantity = np.where(
+            reorder,
+            (target - on_hand).astype(np.int32) + (self.safety_stock * capacity).astype(np.int32),
+            0
+        ).astype(np.int32)
+        excess_quantity = np.where(redistribute, (on_hand - target).astype(np.int32), 0).astype(np.int32)
+        
+        urgency = np.select(
+            [
+                (inventory_ratio < 0.10) | (days_of_supply < 3),
+                (inventory_ratio < 0.20) | (days_of_supply < 5),
+                (inventory_ratio < 0.30) | (days_of_supply < 7),
+            ],
+            [3, 2, 1],
+            default=0
+        ).astype(np.int8)
+        
+        return {
+            'reorder': reorder,
+            'order_quantity': order_quantity,
+            'urgency': urgency,
+            'redistribute': redistribute,
+            'excess_quantity': excess_quantity,
+        }
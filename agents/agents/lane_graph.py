@@ -0,0 +1,98 @@
+"""
+Lane graph: shortest transport paths over defined lanes.
+
+Lanes are directed edges (source -> destination) with a cost, distance and
+transit time. The planners ask "what does it cost to bring goods from any
+source to this destination", so paths are computed per destination with
+Dijkstra over the reversed graph, stored as CSR arrays (indptr / indices /
+edge columns). Each destination's tree is computed on first use and kept,
+so route cost, miles and hours for any (source, destination) pair are then
+array lookups.
+"""
+import heapq
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+class LaneGraph:
+    """Shortest paths by lane cost, with the distance and transit time along them"""
+
+    def __init__(self, node_ids: List[Any], lanes: List[Tuple[Any, Any, float, float, float]]):
+        """
+        Args:
+            node_ids: every node the lanes may reference
+            lanes: (source id, destination id, cost, miles, hours) per lane
+        """
+        self.node_ids = list(node_ids)
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        n = len(self.node_ids)
+
+        edges = [(self.index[dst], self.index[src], cost, miles, hours)
+                 for src, dst, cost, miles, hours in lanes
+                 if src in self.index and dst in self.index and src != dst]
+        self.n_lanes = len(edges)
+
+        # Reversed graph in CSR form: row = lane destination, columns = lane sources
+        edges.sort(key=lambda e: e[0])
+        heads = np.array([e[0] for e in edges], dtype=np.int64)
+        self.indptr = np.searchsorted(heads, np.arange(n + 1)).tolist()
+        self.indices = [e[1] for e in edges]
+        self.cost = [float(e[2]) for e in edges]
+        self.miles = [float(e[3]) for e in edges]
+        self.hours = [float(e[4]) for e in edges]
+
+        self._trees: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def __len__(self):
+        return self.n_lanes
+
+    def to_target(self, node_id: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (cost, miles, hours) arrays indexed like node_ids: the cheapest path
+        from every node to node_id (inf where no path exists)
+        """
+        target = self.index.get(node_id)
+        if target is None:
+            empty = np.full(len(self.node_ids), np.inf)
+            return empty, empty, empty
+        tree = self._trees.get(target)
+        if tree is None:
+            tree = self._trees[target] = self._dijkstra(target)
+        return tree
+
+    def route(self, source_id: Any, dest_id: Any) -> Tuple[float, float, float]:
+        """(cost, miles, hours) of the cheapest lane path, inf when unreachable"""
+        source = self.index.get(source_id)
+        if source is None:
+            return np.inf, np.inf, np.inf
+        cost, miles, hours = self.to_target(dest_id)
+        return float(cost[source]), float(miles[source]), float(hours[source])
+
+    def _dijkstra(self, target: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(self.node_ids)
+        indptr, indices = self.indptr, self.indices
+        edge_cost, edge_miles, edge_hours = self.cost, self.miles, self.hours
+
+        cost = [float('inf')] * n
+        miles = [float('inf')] * n
+        hours = [float('inf')] * n
+        cost[target] = miles[target] = hours[target] = 0.0
+        done = [False] * n
+        heap = [(0.0, target)]
+
+        while heap:
+            node_cost, node = heapq.heappop(heap)
+            if done[node]:
+                continue
+            done[node] = True
+            for edge in range(indptr[node], indptr[node + 1]):
+                nxt = indices[edge]
+                candidate = node_cost + edge_cost[edge]
+                if candidate < cost[nxt]:
+                    cost[nxt] = candidate
+                    miles[nxt] = miles[node] + edge_miles[edge]
+                    hours[nxt] = hours[node] + edge_hours[edge]
+                    heapq.heappush(heap, (candidate, nxt))
+
+        return np.array(cost), np.array(miles), np.array(hours)
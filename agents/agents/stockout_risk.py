@@ -0,0 +1,91 @@
+"""
+Monte Carlo stockout risk.
+
+Demand paths are drawn for many nodes at once as one (nodes, horizon, paths)
+array of per-period demand, normal with each node's mean and standard
+deviation and floored at zero. Paths are the innermost axis, so summing
+over the horizon adds contiguous rows. Demand never goes negative, so a
+node runs out within the horizon exactly when a path's total demand exceeds
+its stock; the shortfall is the part of that total the stock cannot cover.
+
+With common_paths, one block of standard normal paths is drawn and scaled
+by every node's mean and deviation (common random numbers). A node's result
+then depends only on its own inputs and the seed, so repeated runs with the
+same seed change a node's risk only when its stock or demand changes.
+
+Nodes are processed in chunks sized so one chunk's draws and per-path
+totals stay under max_bytes, which makes peak memory independent of the
+node count. With the default budget, 50k nodes x 1k paths x 2 periods
+peaks at about 50 MB.
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def stockout_risk(on_hand, demand_mean, demand_std, horizon: int = 1, paths: int = 1000,
+                  quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+                  max_bytes: int = DEFAULT_MAX_BYTES, rng=None,
+                  common_paths: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Stockout probability and shortfall distribution per node
+
+    Args:
+        on_hand, demand_mean, demand_std: (nodes,) arrays; demand is per period
+        horizon: number of periods simulated
+        paths: simulated demand paths per node
+        quantiles: shortfall quantiles to report
+        max_bytes: memory budget for one chunk of nodes
+        rng: numpy Generator or seed
+        common_paths: use the same standard normal paths for every node
+
+    Returns:
+        Dictionary of 'probability' and 'expected_shortfall' (nodes,) arrays
+        and 'shortfall_quantiles' (nodes, len(quantiles))
+    """
+    on_hand = np.asarray(on_hand, dtype=np.float64)
+    demand_mean = np.asarray(demand_mean, dtype=np.float64)
+    demand_std = np.asarray(demand_std, dtype=np.float64)
+    rng = np.random.default_rng(rng)
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+
+    n = len(on_hand)
+    probability = np.zeros(n)
+    expected_shortfall = np.zeros(n)
+    shortfall_quantiles = np.zeros((n, len(quantiles)))
+
+    # float32 draws, then float64 totals, shortfall and a sorted copy for the quantiles
+    bytes_per_node = paths * (horizon * 4 + 3 * 8)
+    chunk = max(1, int(max_bytes // bytes_per_node))
+    common = rng.standard_normal((horizon, paths), dtype=np.float32) if common_paths else None
+
+    for start in range(0, n, chunk):
+        rows = slice(start, min(n, start + chunk))
+        if common is None:
+            draws = rng.standard_normal((rows.stop - rows.start, horizon, paths), dtype=np.float32)
+            draws *= demand_std[rows, None, None]
+        else:
+            draws = common * demand_std[rows, None, None].astype(np.float32)
+        draws += demand_mean[rows, None, None]
+        np.maximum(draws, 0, out=draws)
+
+        shortfall = draws.sum(axis=1, dtype=np.float64)
+        del draws
+        shortfall -= on_hand[rows, None]
+        np.maximum(shortfall, 0, out=shortfall)
+
+        short_paths = np.count_nonzero(shortfall, axis=1)
+        probability[rows] = short_paths / paths
+        expected_shortfall[rows] = shortfall.mean(axis=1)
+        # Nodes that never run short have all-zero quantiles
+        at_risk = np.flatnonzero(short_paths)
+        if len(at_risk):
+            shortfall_quantiles[rows.start + at_risk] = np.quantile(shortfall[at_risk], quantiles, axis=1).T
+
+    return {
+        'probability': probability,
+        'expected_shortfall': expected_shortfall,
+        'shortfall_quantiles': shortfall_quantiles,
+    }
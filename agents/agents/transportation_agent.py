@@ -1,6 +1,13 @@
 from .base_agent import BaseAgent
 from typing import Dict, List, Any
 import math
+import numpy as np
+from .consolidation import consolidate, haversine_matrix
+
+# Cost multiplier and transit speed (mph) per urgency code (LOW, MEDIUM, HIGH, CRITICAL)
+URGENCY_COST_MULTIPLIER = np.array([1.0, 1.0, 1.2, 1.5])
+URGENCY_SPEED = np.array([50, 50, 55, 65])
+URGENCY_PRIORITY = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
 
 class TransportationAgent(BaseAgent):
     """Agent responsible for transportation optimization"""
@@ -9,6 +16,8 @@ class TransportationAgent(BaseAgent):
         super().__init__("TransportationOptimizer", priority=2)
         self.cost_per_mile = 2.5
         self.cost_per_unit = 0.5
+        self.vehicle_capacity = 20000
+        self.max_stops = 6
     
     def make_decision(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
         if not self.validate_state(state, ['nodes', 'inventory_decisions']):
@@ -20,9 +29,18 @@ class TransportationAgent(BaseAgent):
         
         # Process reorder decisions
         reorder_decisions = [d for d in inventory_decisions if d['type'] == 'REORDER']
+        if state.get('deadline') is not None:
+            # Most urgent first, so a cut-off drops the least urgent reorders
+            reorder_decisions.sort(key=lambda d: URGENCY_PRIORITY.get(d.get('urgency'), len(URGENCY_PRIORITY)))
+        node_map = {n['id']: n for n in nodes}
+        lanes = state.get('lanes')
         
-        for reorder in reorder_decisions:
-            dest_node = next((n for n in nodes if n['id'] == reorder['node_id']), None)
+        for position, reorder in enumerate(reorder_decisions):
+            if self.deadline_reached(state):
+                self.mark_unprocessed(state, [d['node_id'] for d in reorder_decisions[position:]])
+                break
+            
+            dest_node = node_map.get(reorder['node_id'])
             if not dest_node:
                 continue
             
@@ -31,35 +49,130 @@ class TransportationAgent(BaseAgent):
                 dest_node,
                 reorder['quantity'],
                 nodes,
-                reorder['urgency']
+                reorder['urgency'],
+                lanes
             )
             
             if best_route:
-                decisions.append({
-                    'type': 'TRANSPORT',
-                    'agent': self.name,
-                    'from_node_id': best_route['source_id'],
-                    'from_node_code': best_route['source_code'],
-                    'to_node_id': dest_node['id'],
-                    'to_node_code': dest_node['code'],
-                    'quantity': reorder['quantity'],
-                    'estimated_cost': best_route['cost'],
-                    'distance': best_route['distance'],
-                    'urgency': reorder['urgency'],
-                    'reason': f"Optimal route: {best_route['source_code']} → {dest_node['code']}",
-                    'metadata': {
-                        'transit_time': best_route['transit_time'],
-                        'cost_breakdown': best_route['cost_breakdown']
-                    }
-                })
+                decisions.append(self._transport_decision(reorder, dest_node, best_route))
         
         return decisions
     
+    def _transport_decision(self, reorder: Dict, dest_node: Dict, route: Dict) -> Dict[str, Any]:
+        return {
+            'type': 'TRANSPORT',
+            'agent': self.name,
+            'from_node_id': route['source_id'],
+            'from_node_code': route['source_code'],
+            'to_node_id': dest_node['id'],
+            'to_node_code': dest_node['code'],
+            'quantity': reorder['quantity'],
+            'estimated_cost': route['cost'],
+            'distance': route['distance'],
+            'urgency': reorder['urgency'],
+            'reason': f"Optimal route: {route['source_code']} → {dest_node['code']}",
+            'metadata': {
+                'transit_time': route['transit_time'],
+                'cost_breakdown': route['cost_breakdown']
+            }
+        }
+    
+    def plan_routes(self, reorders: List[Dict], node_map: Dict[Any, Dict], candidates: List[Dict],
+                    state: Dict[str, Any] = None, chunk_size: int = 256) -> Dict[Any, Dict]:
+        """
+        Vectorized _find_optimal_route for many reorders over a set of candidate sources
+        
+        Used by incremental re-planning: new reorders search every node,
+        unchanged reorders only the nodes that changed. With a deadline in
+        state, stops between chunks and marks the remaining reorders. With
+        a lane graph in state, routes are costed over lanes.
+        
+        Returns:
+            Dictionary of destination node id -> best route (same shape as
+            _find_optimal_route) for reorders some candidate can serve
+        """
+        candidates = [c for c in candidates if c.get('is_active', True)]
+        if not reorders or not candidates:
+            return {}
+        
+        source_ids = [c['id'] for c in candidates]
+        source_index = {node_id: i for i, node_id in enumerate(source_ids)}
+        source_lat = np.radians([c['latitude'] for c in candidates])
+        source_lon = np.radians([c['longitude'] for c in candidates])
+        source_inventory = np.array([c['current_inventory'] for c in candidates])
+        lanes = state.get('lanes') if state is not None else None
+        if lanes is not None:
+            lane_columns = np.array([lanes.index.get(node_id, -1) for node_id in source_ids])
+            on_lanes = lane_columns >= 0
+        
+        routes = {}
+        for start in range(0, len(reorders), chunk_size):
+            if state is not None and self.deadline_reached(state):
+                self.mark_unprocessed(state, [r['node_id'] for r in reorders[start:]])
+                break
+            
+            chunk = reorders[start:start + chunk_size]
+            dests = [node_map[r['node_id']] for r in chunk]
+            if lanes is None:
+                dest_lat = np.radians([d['latitude'] for d in dests])[:, None]
+                dest_lon = np.radians([d['longitude'] for d in dests])[:, None]
+                
+                a = (np.sin((dest_lat - source_lat) / 2) ** 2 +
+                     np.cos(source_lat) * np.cos(dest_lat) *
+                     np.sin((dest_lon - source_lon) / 2) ** 2)
+                distance = 3959 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+                transport = distance * self.cost_per_mile
+            else:
+                # One cached shortest-path tree per destination, gathered at the candidates
+                trees = [lanes.to_target(d['id']) for d in dests]
+                transport, distance, hours = (
+                    np.where(on_lanes, np.stack([tree[k][lane_columns] for tree in trees]), np.inf)
+                    for k in range(3)
+                )
+            
+            quantity = np.array([r['quantity'] for r in chunk])[:, None]
+            multiplier = np.array([{'CRITICAL': 1.5, 'HIGH': 1.2}.get(r['urgency'], 1.0) for r in chunk])[:, None]
+            cost = (transport + quantity * self.cost_per_unit) * multiplier
+            cost[source_inventory[None, :] < quantity] = np.inf
+            for row, dest in enumerate(dests):
+                own = source_index.get(dest['id'])
+                if own is not None:
+                    cost[row, own] = np.inf
+            
+            # argmin keeps the first of equal costs, like the strict < in _find_optimal_route
+            best = np.argmin(cost, axis=1)
+            for row, reorder in enumerate(chunk):
+                column = best[row]
+                if not np.isfinite(cost[row, column]):
+                    continue
+                
+                source = candidates[column]
+                miles = float(distance[row, column])
+                if lanes is None:
+                    transit_time = self._estimate_transit_time(miles, reorder['urgency'])
+                else:
+                    transit_time = int(hours[row, column])
+                routes[reorder['node_id']] = {
+                    'source_id': source['id'],
+                    'source_code': source['code'],
+                    'distance': miles,
+                    'cost': float(cost[row, column]),
+                    'transit_time': transit_time,
+                    'cost_breakdown': {
+                        'transport': float(transport[row, column]),
+                        'handling': reorder['quantity'] * self.cost_per_unit
+                    }
+                }
+        
+        return routes
+    
     def _find_optimal_route(self, dest_node: Dict, quantity: int, 
-                           all_nodes: List[Dict], urgency: str) -> Dict:
-        """Find the optimal source node and route"""
+                           all_nodes: List[Dict], urgency: str, lanes=None) -> Dict:
+        """Find the optimal source node and route, over lanes when a LaneGraph is given"""
         best_route = None
         lowest_cost = float('inf')
+        if lanes is not None:
+            lane_cost, lane_miles, lane_hours = lanes.to_target(dest_node['id'])
         
         for source_node in all_nodes:
             if (source_node['id'] == dest_node['id'] or 
@@ -67,12 +180,19 @@ class TransportationAgent(BaseAgent):
                 source_node['current_inventory'] < quantity):
                 continue
             
-            distance = self._calculate_distance(
-                source_node['latitude'], source_node['longitude'],
-                dest_node['latitude'], dest_node['longitude']
-            )
+            if lanes is None:
+                distance = self._calculate_distance(
+                    source_node['latitude'], source_node['longitude'],
+                    dest_node['latitude'], dest_node['longitude']
+                )
+                transport_cost = distance * self.cost_per_mile
+            else:
+                column = lanes.index.get(source_node['id'])
+                if column is None or not np.isfinite(lane_cost[column]):
+                    continue
+                distance = float(lane_miles[column])
+                transport_cost = float(lane_cost[column])
             
-            transport_cost = distance * self.cost_per_mile
             handling_cost = quantity * self.cost_per_unit
             total_cost = transport_cost + handling_cost
             
@@ -83,7 +203,10 @@ class TransportationAgent(BaseAgent):
             
             if total_cost < lowest_cost:
                 lowest_cost = total_cost
-                transit_time = self._estimate_transit_time(distance, urgency)
+                if lanes is None:
+                    transit_time = self._estimate_transit_time(distance, urgency)
+                else:
+                    transit_time = int(lane_hours[column])
                 
                 best_route = {
                     'source_id': source_node['id'],
@@ -125,4 +248,89 @@ class TransportationAgent(BaseAgent):
         elif urgency == 'HIGH':
             base_speed = 55
         
-        return int(distance / base_speed)
\ No newline at end of file
+        return int(distance / base_speed)
+    
+    def distance_matrix(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """Haversine miles between every pair of nodes, (sources, destinations)"""
+        return haversine_matrix(latitude, longitude)
+    
+    def consolidate(self, decisions: List[Dict[str, Any]], nodes: List[Dict],
+                    time_budget_ms: float, lanes=None, first_route_id: int = 1) -> Dict[str, Any]:
+        """Merge transports sharing a source into multi-drop routes within the budget, over lanes if given"""
+        return consolidate(
+            decisions, nodes, self.cost_per_mile, time_budget_ms,
+            vehicle_capacity=self.vehicle_capacity, max_stops=self.max_stops, lanes=lanes,
+            first_route_id=first_route_id
+        )
+    
+    def make_matrix_decision(self, on_hand: np.ndarray, order_quantity: np.ndarray,
+                             reorder: np.ndarray, urgency: np.ndarray,
+                             latitude: np.ndarray, longitude: np.ndarray,
+                             active: np.ndarray = None,
+                             distances: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        Vectorized _find_optimal_route for every reorder in a node x SKU matrix
+        
+        Handling cost and the urgency multiplier do not depend on the source,
+        so the cheapest source is the nearest one holding enough stock. Each
+        destination walks its sources nearest-first once, resolving all of
+        its SKUs per step instead of looping per SKU.
+        
+        Returns:
+            Dictionary of (nodes, skus) arrays: source node index (-1 when no
+            source has stock), distance, estimated cost and transit hours
+        """
+        on_hand = np.asarray(on_hand)
+        order_quantity = np.asarray(order_quantity)
+        n_nodes, n_skus = on_hand.shape
+        
+        if distances is None:
+            distances = self.distance_matrix(latitude, longitude)
+        distances = np.array(distances, dtype=np.float64)
+        np.fill_diagonal(distances, np.inf)
+        if active is not None:
+            distances[~np.asarray(active, dtype=bool), :] = np.inf
+            reorder = reorder & np.asarray(active, dtype=bool)[:, None]
+        
+        # Sources nearest-first for every destination (stable keeps node order on ties)
+        nearest = np.argsort(distances, axis=0, kind='stable')
+        
+        # A reorder larger than any node's stock of that SKU can never be served
+        reorder = reorder & (order_quantity <= on_hand.max(axis=0)[None, :])
+        
+        source = np.full((n_nodes, n_skus), -1, dtype=np.int32)
+        distance = np.zeros((n_nodes, n_skus), dtype=np.float64)
+        
+        for dest in np.flatnonzero(reorder.any(axis=1)):
+            skus = np.flatnonzero(reorder[dest])
+            need = order_quantity[dest, skus]
+            
+            for candidate in nearest[:, dest]:
+                if not np.isfinite(distances[candidate, dest]):
+                    break
+                
+                served = on_hand[candidate, skus] >= need
+                if served.any():
+                    source[dest, skus[served]] = candidate
+                    distance[dest, skus[served]] = distances[candidate, dest]
+                    skus = skus[~served]
+                    need = need[~served]
+                    if skus.size == 0:
+                        break
+        
+        routed = source >= 0
+        urgency = np.asarray(urgency, dtype=np.int64)
+        cost = np.where(
+            routed,
+            (distance * self.cost_per_mile + order_quantity * self.cost_per_unit) *
+            URGENCY_COST_MULTIPLIER[urgency],
+            0
+        ).astype(np.float32)
+        transit_time = np.where(routed, distance / URGENCY_SPEED[urgency], 0).astype(np.int32)
+        
+        return {
+            'source': source,
+            'distance': distance,
+            'estimated_cost': cost,
+            'transit_time': transit_time,
+        }
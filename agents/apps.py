@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class AgentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'agents'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import middleware, search
+        from .agents import agent_logging
+
+        post_migrate.connect(search.restore_triggers, sender=self, dispatch_uid='agents.search.restore_triggers')
+        if getattr(settings, 'QUERY_STATS_ENABLED', True):
+            connection_created.connect(middleware.instrument, dispatch_uid='agents.middleware.instrument')
+
+        agent_logging.configure(
+            levels=getattr(settings, 'AGENT_LOG_LEVELS', {}),
+            sample_rates=getattr(settings, 'AGENT_LOG_SAMPLE_RATES', {}),
+        )
+        if getattr(settings, 'AGENT_LOG_ASYNC', False):
+            agent_logging.start_async_logging()
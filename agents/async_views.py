@@ -0,0 +1,151 @@
+"""
+Async read endpoints.
+
+Dashboards poll the node list, network summary, decision list and demand
+series. Under /api/async/ these views serve the same payloads as the REST
+endpoints (same query parameters, pagination and JSON bytes) through
+Django's async ORM, so under an ASGI server a waiting request holds no
+thread. Writes and every other endpoint stay on the REST viewsets.
+
+Concurrent identical requests (same URL, on one event loop) are coalesced:
+the first runs the queries and renders the body, and the rest await that
+result instead of querying again. This is what lets one worker serve
+thousands of pollers: the async ORM still runs each query on a
+sync_to_async thread, so a worker that queried once per request would
+queue every poller behind the database. A coalesced response is never
+older than the read that was in flight when its request arrived.
+(Django's ASGI handler itself still briefly uses a thread per request to
+close the response.)
+
+Under WSGI each async view runs in its own event loop, so nothing is
+coalesced; the REST endpoints are the better fit there.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import decision_stats, queries, search
+from .fieldsets import sparse_queryset
+from .models import AgentDecision, NetworkNode
+from .serializers import AgentDecisionSerializer, NetworkNodeSerializer
+
+INVALID_PAGE = {'detail': 'Invalid page.'}
+
+_inflight = {}
+
+
+async def _coalesced(key, render):
+    """Await render() once for all concurrent callers with the same key on this event loop"""
+    key = (asyncio.get_running_loop(), key)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(render())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # A client that goes away cancels its own wait, not the shared read
+    return await asyncio.shield(task)
+
+
+async def _respond(request, render):
+    """JSON response for render()'s (status, payload), shared by identical concurrent requests"""
+    async def rendered():
+        status, payload = await render()
+        return status, JSONRenderer().render(payload)
+
+    status, body = await _coalesced(request.build_absolute_uri(), rendered)
+    return HttpResponse(body, status=status, content_type='application/json')
+
+
+async def _paginate(request, queryset, serializer_class, context):
+    """(status, payload) for one page, as the REST PageNumberPagination returns it"""
+    number = request.GET.get('page', 1)
+    if number != 'last':
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 404, INVALID_PAGE
+
+    # The REST views' paginator class fixed its page size when it was imported
+    page_size = api_settings.DEFAULT_PAGINATION_CLASS.page_size
+    count = await queryset.acount()
+    pages = max(1, -(-count // page_size))
+    if number == 'last':
+        number = pages
+    if not 1 <= number <= pages:
+        return 404, INVALID_PAGE
+
+    offset = (number - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, 'page', number + 1) if number < pages else None
+    if number == 1:
+        previous_link = None
+    elif number == 2:
+        previous_link = remove_query_param(url, 'page')
+    else:
+        previous_link = replace_query_param(url, 'page', number - 1)
+
+    return 200, {
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': serializer_class(objects, many=True, context=context).data,
+    }
+
+
+@require_GET
+async def node_list(request):
+    """GET /api/nodes/"""
+    async def render():
+        context = {'request': Request(request)}
+        queryset = sparse_queryset(NetworkNode.objects.all(), NetworkNodeSerializer(context=context))
+        return await _paginate(request, queryset, NetworkNodeSerializer, context)
+
+    return await _respond(request, render)
+
+
+@require_GET
+async def network_summary(request):
+    """GET /api/nodes/network_summary/"""
+    async def render():
+        nodes, aggregates = queries.network_summary_aggregates()
+        totals = await nodes.aaggregate(**aggregates)
+        return 200, queries.network_summary(totals, await decision_stats.anetwork_kpis())
+
+    return await _respond(request, render)
+
+
+@require_GET
+async def decision_list(request):
+    """GET /api/decisions/"""
+    async def render():
+        context = {'request': Request(request)}
+        use_index = None
+        if request.GET.get('q'):
+            # Checked once per process, by introspection
+            use_index = await sync_to_async(search.index_available)()
+        queryset = queries.filter_decisions(AgentDecision.objects.all(), request.GET, use_search_index=use_index)
+        queryset = sparse_queryset(queryset, AgentDecisionSerializer(context=context)).order_by('-created_at')
+        return await _paginate(request, queryset, AgentDecisionSerializer, context)
+
+    return await _respond(request, render)
+
+
+@require_GET
+async def demand_series(request):
+    """GET /api/demands/series/"""
+    async def render():
+        try:
+            bucket, start, end, rows = queries.demand_series_rows(request.GET)
+        except ValueError as e:
+            return 400, {'status': 'error', 'message': str(e)}
+        return 200, queries.demand_series(bucket, start, end, [row async for row in rows])
+
+    return await _respond(request, render)
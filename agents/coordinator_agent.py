@@ -1,7 +1,15 @@
 # agents/coordinator_agent.py
 import math
+import time
 from typing import Dict, Any, List
 
+import numpy as np
+
+from .agents.agent_logging import LogSummary
+from .agents.stockout_risk import stockout_risk
+
+KM_PER_MILE = 1.609344
+
 # Simple haversine distance (km)
 def haversine_km(lat1, lon1, lat2, lon2):
     R = 6371.0
@@ -20,19 +28,31 @@ class CoordinatorAgent:
         target_utilization: float = 0.6,
         reorder_threshold: float = 0.35,
         transfer_threshold: float = 0.8,
-        per_unit_transport_cost_km: float = 0.02
+        per_unit_transport_cost_km: float = 0.02,
+        risk_horizon: int = 2,
+        risk_threshold: float = 0.2,
+        risk_paths: int = 1000,
+        demand_cv: float = 0.25
     ):
         self.target_utilization = float(target_utilization)
         self.reorder_threshold = float(reorder_threshold)
         self.transfer_threshold = float(transfer_threshold)
         self.per_unit_transport_cost_km = float(per_unit_transport_cost_km)
+        # Forecast alerts: simulated stockout probability over risk_horizon cycles
+        self.risk_horizon = int(risk_horizon)
+        self.risk_threshold = float(risk_threshold)
+        self.risk_paths = int(risk_paths)
+        self.demand_cv = float(demand_cv)
 
-    def make_decision(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def make_decision(self, state: Dict[str, Any], deadline_ms: float = None) -> Dict[str, Any]:
+
+        deadline = time.perf_counter() + deadline_ms / 1000.0 if deadline_ms is not None else None
+        unprocessed = []
 
         nodes = state.get('nodes', [])
         demands = state.get('demands', {})
 
-        logs = []
+        log = LogSummary(verbose=state.get('verbose_logs', False))
         inventory_decisions = []
         transport_decisions = []
         service_alerts = []
@@ -41,10 +61,27 @@ class CoordinatorAgent:
         node_map = {n['id']: n for n in nodes}
         donors = []
 
+        # Stockout risk for every node in one simulation. Demand spread comes
+        # from the node's reorder policy when it has one, else demand_cv * estimate;
+        # with no spread this is the old cycles_left < risk_horizon rule.
+        # Every node shares the same simulated paths, seeded by state['risk_seed'],
+        # so its alert only changes when its own stock or demand does
+        policies = state.get('reorder_policies') or {}
+        estimates = np.array([demands.get(n['id'], 150) for n in nodes], dtype=np.float64)
+        spread = np.array([
+            policies[n['id']]['demand_std'] if n['id'] in policies else self.demand_cv * estimate
+            for n, estimate in zip(nodes, estimates)
+        ], dtype=np.float64)
+        risk = stockout_risk(
+            [n['current_inventory'] for n in nodes], estimates, spread,
+            horizon=self.risk_horizon, paths=self.risk_paths, quantiles=(0.5, 0.95),
+            rng=state.get('risk_seed'), common_paths=True
+        )
+
         # --------------------------------------------------------------------
         # ⭐ PHASE 1: Scan nodes for shortages, surplus & forecasting alerts
         # --------------------------------------------------------------------
-        for n in nodes:
+        for i, n in enumerate(nodes):
 
             cap = max(1, n['inventory_capacity'])
             curr = n['current_inventory']
@@ -54,18 +91,25 @@ class CoordinatorAgent:
             demand_est = demands.get(node_id, 150)
 
             # ———————— ⭐ FORECAST ALERT ————————
-            if demand_est > 0:
-                cycles_left = curr / demand_est
-
-                if cycles_left < 2:
-                    forecasting_alerts.append({
-                        'agent': 'ForecastAgent',
-                        'node_id': node_id,
-                        'type': 'FORECAST_ALERT',
-                        'urgency': 'HIGH',
-                        'reason': f"{n['name']} will stockout in {round(cycles_left,1)} cycles"
-                    })
-                    logs.append(f"[FORECAST] {n['code']} risk of stockout in {round(cycles_left,1)} cycles")
+            probability = risk['probability'][i]
+            if demand_est > 0 and probability >= self.risk_threshold:
+                shortfall_p50, shortfall_p95 = risk['shortfall_quantiles'][i]
+                forecasting_alerts.append({
+                    'agent': 'ForecastAgent',
+                    'node_id': node_id,
+                    'type': 'FORECAST_ALERT',
+                    'urgency': 'HIGH',
+                    'reason': (f"{n['name']} has a {probability:.0%} chance of stocking out "
+                               f"within {self.risk_horizon} cycles (p95 shortfall {shortfall_p95:.0f})"),
+                    'metadata': {
+                        'stockout_probability': float(probability),
+                        'expected_shortfall': float(risk['expected_shortfall'][i]),
+                        'shortfall_p50': float(shortfall_p50),
+                        'shortfall_p95': float(shortfall_p95),
+                    }
+                })
+                log.add('FORECAST', "%s stockout risk %.0f%% within %d cycles",
+                        n['code'], probability * 100, self.risk_horizon)
 
             # ———————— ⭐ CRITICAL SHORTAGE ALERT ————————
             if ratio < 0.15:
@@ -76,7 +120,7 @@ class CoordinatorAgent:
                     'urgency': 'CRITICAL',
                     'reason': f"Inventory dangerously low ({curr}/{cap})"
                 })
-                logs.append(f"[ALERT] {n['code']} CRITICAL low ({curr}/{cap})")
+                log.add('ALERT', "%s CRITICAL low (%s/%s)", n['code'], curr, cap)
 
             # ———————— ⭐ REORDER (Receiver Node) ————————
             if ratio < self.reorder_threshold:
@@ -89,7 +133,7 @@ class CoordinatorAgent:
                     'quantity': need,
                     'reason': f"Below threshold ({ratio:.2f}), need {need}"
                 })
-                logs.append(f"[REORDER] {n['code']} needs {need}")
+                log.add('REORDER', "%s needs %s", n['code'], need)
 
             # ———————— ⭐ SURPLUS (Donor Node) ————————
             if ratio > self.transfer_threshold:
@@ -103,35 +147,52 @@ class CoordinatorAgent:
                         'lon': n['longitude'],
                         'surplus': surplus
                     })
-                    logs.append(f"[DONOR] {n['code']} surplus {surplus}")
+                    log.add('DONOR', "%s surplus %s", n['code'], surplus)
 
         # --------------------------------------------------------------------
         # ⭐ PHASE 2: Transport Planning (Donor → Receiver)
         # --------------------------------------------------------------------
-        receivers = [{'id': d['node_id'], 'need': d['quantity']} for d in inventory_decisions]
+        # With a lane graph, donors are ranked by lane path distance and
+        # donors with no path to the receiver are skipped
+        lanes = state.get('lanes')
+
+        # HIGH urgency first so a deadline cut-off only drops MEDIUM receivers
+        receivers = [
+            {'id': d['node_id'], 'need': d['quantity']}
+            for d in sorted(inventory_decisions, key=lambda d: d['urgency'] != 'HIGH')
+        ]
+
+        for i, rec in enumerate(receivers):
+            if deadline is not None and time.perf_counter() >= deadline:
+                unprocessed = [r['id'] for r in receivers[i:]]
+                log.add('DEADLINE', "%d receivers left unplanned", len(unprocessed))
+                break
 
-        for rec in receivers:
             rnode = node_map.get(rec['id'])
             if not rnode:
                 continue
 
             need_left = rec['need']
 
-            donors_sorted = sorted(
-                donors,
-                key=lambda d: haversine_km(
-                    rnode['latitude'], rnode['longitude'], d['lat'], d['lon']
-                )
-            )
-
-            for donor in donors_sorted:
+            if lanes is None:
+                routes = [
+                    (haversine_km(rnode['latitude'], rnode['longitude'], d['lat'], d['lon']), None, d)
+                    for d in donors
+                ]
+            else:
+                _, lane_miles, lane_hours = lanes.to_target(rec['id'])
+                routes = []
+                for d in donors:
+                    column = lanes.index.get(d['id'])
+                    if column is not None and math.isfinite(lane_miles[column]):
+                        routes.append((float(lane_miles[column]) * KM_PER_MILE, float(lane_hours[column]), d))
+            routes.sort(key=lambda route: route[0])
+
+            for distance, transit_hours, donor in routes:
                 if need_left <= 0 or donor['surplus'] <= 0:
                     continue
 
                 qty = min(need_left, donor['surplus'])
-                distance = haversine_km(
-                    rnode['latitude'], rnode['longitude'], donor['lat'], donor['lon']
-                )
                 cost = round(distance * qty * self.per_unit_transport_cost_km, 2)
 
                 transport_decisions.append({
@@ -144,10 +205,10 @@ class CoordinatorAgent:
                     'estimated_cost': cost,
                     'reason': f"Move {qty} units ({distance:.1f} km, cost ${cost})"
                 })
+                if transit_hours is not None:
+                    transport_decisions[-1]['metadata'] = {'transit_time': int(transit_hours)}
 
-                logs.append(
-                    f"[TRANSPORT] {donor['code']} → {rnode['code']} qty {qty} cost ${cost}"
-                )
+                log.add('TRANSPORT', "%s → %s qty %s cost $%s", donor['code'], rnode['code'], qty, cost)
 
                 donor['surplus'] -= qty
                 need_left -= qty
@@ -179,7 +240,12 @@ class CoordinatorAgent:
             'service_alerts': service_alerts + forecasting_alerts,
             'total_transport_cost': round(total_transport_cost, 2),
             'total_service_level_cost': round(total_service_level_cost, 2),
-            'logs': logs
+            'log_summary': log.summary(),
+            'deadline_exceeded': bool(unprocessed),
+            'unprocessed_nodes': {'TransportPlanner': unprocessed} if unprocessed else {}
         }
+        # Per-event messages only on request; formatting them costs more than the plan at scale
+        if log.verbose:
+            results['logs'] = [f"[{kind}] {message}" for kind, message in log.events()]
 
         return results
@@ -0,0 +1,644 @@
+"""
+Agent decision cycle.
+
+A cycle generates demand, runs the coordinator, upserts the resulting
+decisions and executes transports. The API view and the scheduled Celery
+task both go through ``run_cycle`` so they share one overlap lock.
+
+Every cycle is recorded as a ``CycleRun`` whose id is also the lock token,
+so callers that find the lock held can attach to the in-flight run and
+read its result instead of starting another cycle (single-flight).
+
+An Idempotency-Key is bound to its run as soon as the run is recorded, so
+requests waiting on the key get that run's outcome, failure included. A key
+whose run failed may be claimed again by a retry; keys expire after
+IDEMPOTENCY_KEY_TTL seconds (``purge_idempotency_keys``).
+"""
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import NetworkNode, Demand, AgentDecision, CycleLock, CycleRun, IdempotencyKey
+from . import decision_stats, engines, lanes, ledger, replan
+
+# The agent package and NumPy are imported on first use (see run_cycle and
+# get_history_store) so loading the URLconf stays cheap for every worker.
+
+CYCLE_LOCK_NAME = 'agent-cycle'
+DECISION_BATCH_SIZE = 500
+DECISION_UPSERT_FIELDS = ['agent_name', 'urgency', 'quantity', 'estimated_cost', 'reason']
+
+# Service level cost: a simple heuristic based on alert urgency (customize as needed)
+URGENCY_COST = {
+    'CRITICAL': 500.0,
+    'HIGH': 200.0,
+    'MEDIUM': 50.0,
+    'LOW': 10.0
+}
+
+
+_history_store = None
+
+
+class CycleBusy(Exception):
+    """Another agent cycle holds the lock"""
+
+
+class NoActiveNodes(Exception):
+    """There is nothing to run a cycle on"""
+
+
+class PlanningFailed(Exception):
+    """The planning engine reported an error; its partial plan is not saved"""
+
+
+class IdempotencyKeyReleased(Exception):
+    """The owner of an idempotency key gave it up without starting a cycle"""
+
+
+def acquire_lock(name=CYCLE_LOCK_NAME, ttl=None, token=None):
+    """Take a named lease in the database; returns a token or None if held"""
+    ttl = ttl or getattr(settings, 'AGENT_CYCLE_LOCK_TTL', 600)
+    token = token or uuid.uuid4().hex
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+
+    # Take over an expired lease, or create the row the first time
+    taken = CycleLock.objects.filter(name=name, expires_at__lt=now).update(
+        holder=token, acquired_at=now, expires_at=expires_at
+    )
+    if not taken:
+        try:
+            with transaction.atomic():
+                CycleLock.objects.create(
+                    name=name, holder=token, acquired_at=now, expires_at=expires_at
+                )
+        except IntegrityError:
+            return None
+
+    return token
+
+
+def release_lock(token, name=CYCLE_LOCK_NAME):
+    CycleLock.objects.filter(name=name, holder=token).delete()
+
+
+def get_history_store():
+    """This process's handle on the shared forecast history, warmed on first creation"""
+    global _history_store
+
+    path = getattr(settings, 'FORECAST_HISTORY_PATH', None)
+    if not path:
+        return None
+
+    if _history_store is None:
+        from .agents.history_store import RingBufferStore
+
+        store = RingBufferStore(str(path), window=getattr(settings, 'FORECAST_HISTORY_WINDOW', 30))
+        if store.created:
+            warm_history_store(store)
+        _history_store = store
+
+    return _history_store
+
+
+def warm_history_store(store):
+    """Load the latest ``window`` demands per node from the database in one query"""
+    latest = (Demand.objects
+              .annotate(position=Window(RowNumber(), partition_by=F('node_id'),
+                                        order_by=F('timestamp').desc()))
+              .filter(position__lte=store.window)
+              .order_by('node_id', 'timestamp')
+              .values_list('node_id', 'quantity'))
+
+    histories = {}
+    for node_id, quantity in latest.iterator(chunk_size=DECISION_BATCH_SIZE):
+        histories.setdefault(str(node_id), []).append(quantity)
+
+    store.load(histories)
+    return len(histories)
+
+
+def node_state(node):
+    """Agent view of one node"""
+    return {
+        'id': str(node.id),
+        'code': node.code,
+        'name': node.name,
+        'node_type': node.node_type,
+        'current_inventory': node.current_inventory,
+        'inventory_capacity': node.inventory_capacity,
+        'latitude': node.latitude,
+        'longitude': node.longitude,
+        'is_active': node.is_active
+    }
+
+
+def build_state(nodes, demands):
+    """Prepare state for agents"""
+    return {
+        'nodes': [node_state(node) for node in nodes],
+        'demands': demands
+    }
+
+
+def load_nodes(cache=None):
+    """Active node states by id, and the ids changed since cache (None: plan everything)"""
+    if cache is not None:
+        nodes = dict(cache.nodes)
+        dirty = set(cache.pending)
+        for node in replan.changed_nodes(cache).iterator(chunk_size=DECISION_BATCH_SIZE):
+            node_id = str(node.id)
+            dirty.add(node_id)
+            if node.is_active:
+                nodes[node_id] = node_state(node)
+            else:
+                nodes.pop(node_id, None)
+
+        # Deleted nodes leave no row to notice; a count mismatch means the cache holds some
+        if len(nodes) == NetworkNode.objects.filter(is_active=True).count():
+            return nodes, dirty
+
+    nodes = NetworkNode.objects.filter(is_active=True).iterator(chunk_size=DECISION_BATCH_SIZE)
+    return {str(node.id): node_state(node) for node in nodes}, None
+
+
+def run_cycle(deadline_ms=None, verbose_logs=False, engine=None, shadow_engine=None,
+              idempotency_key=None):
+    """Run one locked agent cycle; raises CycleBusy if one is already running
+
+    idempotency_key (claimed by the caller) is bound to the run once it is
+    recorded, so requests waiting on the key see this run's outcome.
+
+    engine names the planning engine (default PLANNING_ENGINE); shadow_engine
+    (default PLANNING_SHADOW_ENGINE, '' for none) also plans the cycle in the
+    background without saving anything but a ShadowRun comparison (see
+    agents.engines).
+
+    deadline_ms bounds the planning work from the start of the cycle; the
+    coordinator returns its best plan so far and lists skipped nodes.
+
+    With AGENT_CYCLE_INCREMENTAL the cycle re-plans only nodes whose
+    inventory, capacity or demand changed since the previous cycle (see
+    agents.replan) and writes decisions for just the nodes they affect.
+
+    Results and the run summary carry counted log events ('log_summary');
+    verbose_logs adds the individual messages ('logs').
+    """
+    started = time.perf_counter()
+    if deadline_ms is None:
+        deadline_ms = settings.AGENT_CYCLE_DEADLINE_MS
+    engine = engines.check(engine or settings.PLANNING_ENGINE)
+    if shadow_engine is None:
+        shadow_engine = settings.PLANNING_SHADOW_ENGINE
+    if shadow_engine:
+        engines.check(shadow_engine)
+    run_id = uuid.uuid4()
+    token = acquire_lock(token=run_id.hex)
+    if token is None:
+        raise CycleBusy('An agent cycle is already running')
+
+    try:
+        run = CycleRun.objects.create(id=run_id)
+    except Exception:
+        release_lock(token)
+        raise
+    try:
+        if idempotency_key:
+            bind_idempotency_key(idempotency_key, run)
+        as_of = timezone.now()
+        # Loaded first: a lane or policy change drops the re-planning cache
+        from . import reorder_policies
+        lane_graph = lanes.get_graph()
+        policies = reorder_policies.current_policies()
+        cache = replan.get_cache() if settings.AGENT_CYCLE_INCREMENTAL else None
+        nodes, dirty = load_nodes(cache)
+
+        if not nodes:
+            raise NoActiveNodes('No nodes found. Please initialize network first.')
+
+        # Open (and if new, warm) the shared history before this cycle's demand exists
+        history_store = get_history_store()
+
+        # Generate demands; when re-planning, only a sample of nodes gets new demand
+        if dirty is None:
+            demands = generate_demands(list(nodes.values()))
+        else:
+            demands = {node_id: cache.demands[node_id] for node_id in nodes if node_id in cache.demands}
+            fraction = settings.SIMULATED_DEMAND_FRACTION
+            sampled = [n for node_id, n in nodes.items()
+                       if node_id not in demands or random.random() < fraction]
+            for node_id, quantity in generate_demands(sampled).items():
+                if demands.get(node_id) != quantity:
+                    dirty.add(node_id)
+                demands[node_id] = quantity
+            dirty |= set(cache.nodes) - set(nodes)
+
+        # Run the planning engine
+        coordinator = engines.create(engine, history_store)
+        state = {
+            'nodes': list(nodes.values()),
+            'demands': demands,
+            'consolidation_budget_ms': settings.TRANSPORT_CONSOLIDATION_BUDGET_MS,
+            'verbose_logs': verbose_logs,
+            'lanes': lane_graph,
+            'reorder_policies': policies,
+            # Stockout simulations repeat within a demand period
+            'risk_seed': as_of.date().toordinal(),
+        }
+        if deadline_ms is not None:
+            deadline_ms = max(0.0, deadline_ms - (time.perf_counter() - started) * 1000)
+
+        previous = cache.evaluations if cache is not None else None
+        frozen = engines.freeze_state(state, history_store, previous, dirty) if shadow_engine else None
+
+        planning_mode = engines.mode(coordinator, dirty)
+        planning_started = time.perf_counter()
+        results = engines.plan(coordinator, state, deadline_ms=deadline_ms, previous=previous, dirty=dirty)
+        planning_ms = (time.perf_counter() - planning_started) * 1000
+        if results.get('error'):
+            raise PlanningFailed(f"Planning engine '{engine}' failed: {results['error']}")
+        # A full plan has no 'changes' and is written out in full
+        changes = results.get('changes', results)
+        scope = changes.get('nodes')
+
+        # --- Compute totals here so frontend gets them ---
+        # Total transport cost: sum estimated_cost fields on transport_decisions
+        total_transport_cost = 0
+        for td in results.get('transport_decisions', []):
+            # estimated_cost could be number or string; coerce safely
+            try:
+                total_transport_cost += float(td.get('estimated_cost', 0) or 0)
+            except Exception:
+                total_transport_cost += 0
+
+        total_service_level_cost = 0
+        for alert in results.get('service_alerts', []):
+            urgency = alert.get('urgency', 'MEDIUM')
+            total_service_level_cost += URGENCY_COST.get(urgency.upper(), 50.0)
+
+        # Save decisions in DB
+        saved_decisions = save_decisions(changes, scope=scope)
+
+        # Execute transport decisions (update inventories)
+        executed_keys = execute_transport_decisions(changes.get('transport_decisions', []))
+        mark_executed(saved_decisions, executed_keys)
+
+        # Nodes the deadline cut off stay dirty for the next cycle
+        pending = set()
+        for node_ids in results.get('unprocessed_nodes', {}).values():
+            pending.update(node_ids)
+        if 'evaluations' in results:
+            replan.store_cache(replan.PlanCache(
+                run.id, as_of, nodes, demands, results['evaluations'], pending
+            ))
+        else:
+            replan.invalidate()
+
+        shadow = None
+        if shadow_engine:
+            shadow = engines.start_shadow(run, shadow_engine, frozen, engine, planning_mode, planning_ms,
+                                          results, deadline_ms=deadline_ms)
+
+        run.status = 'SUCCEEDED'
+        run.summary = {
+            'engine': engine,
+            'shadow_run_id': str(shadow.id) if shadow is not None else None,
+            'inventory_decisions': len(results.get('inventory_decisions', [])),
+            'transport_decisions': len(results.get('transport_decisions', [])),
+            'routes': len(results.get('routes', [])),
+            'service_alerts': len(results.get('service_alerts', [])),
+            'total_transport_cost': round(total_transport_cost, 2),
+            'total_service_level_cost': round(total_service_level_cost, 2),
+            'log_summary': results.get('log_summary', {}),
+            'deadline_exceeded': results.get('deadline_exceeded', False),
+            'unprocessed_nodes': results.get('unprocessed_nodes', {}),
+            'replanned_nodes': len(nodes) if dirty is None or 'changes' not in results else len(dirty),
+            'changed_nodes': len(nodes) if scope is None else len(scope),
+            'decision_ids': [str(d.id) for d in saved_decisions],
+        }
+        if 'logs' in results:
+            run.summary['logs'] = results['logs']
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'summary', 'finished_at'])
+
+        return {
+            'run': run,
+            'engine': engine,
+            'shadow': shadow,
+            'results': results,
+            'saved_decisions': saved_decisions,
+            'total_transport_cost': total_transport_cost,
+            'total_service_level_cost': total_service_level_cost,
+        }
+    except Exception as e:
+        replan.invalidate()
+        run.status = 'FAILED'
+        run.error = str(e)
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+    finally:
+        release_lock(token)
+
+
+def current_run_id(name=CYCLE_LOCK_NAME):
+    """Id of the run holding the cycle lock, if any"""
+    holder = CycleLock.objects.filter(name=name).values_list('holder', flat=True).first()
+    return uuid.UUID(holder) if holder else None
+
+
+def recent_run(window):
+    """A run started in the last ``window`` seconds that is still running"""
+    since = timezone.now() - timedelta(seconds=window)
+    return (CycleRun.objects
+            .filter(started_at__gte=since, status='RUNNING')
+            .order_by('-started_at')
+            .first())
+
+
+def wait_for_run(run_id, timeout=None):
+    """Block until a run finishes; returns it, or None on timeout"""
+    if timeout is None:
+        timeout = getattr(settings, 'AGENT_CYCLE_LOCK_TTL', 600)
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+
+    while True:
+        run = CycleRun.objects.filter(id=run_id).first()
+        if run is not None and run.status != 'RUNNING':
+            return run
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+def claim_idempotency_key(key):
+    """Returns (True, entry) if this caller owns the key, else (False, entry)"""
+    try:
+        with transaction.atomic():
+            return True, IdempotencyKey.objects.create(key=key)
+    except IntegrityError:
+        pass
+    # A retry takes over a key whose run failed; only one retry's update matches
+    retried = (IdempotencyKey.objects
+               .filter(key=key, run__status='FAILED')
+               .update(run=None, created_at=timezone.now()))
+    return bool(retried), IdempotencyKey.objects.get(key=key)
+
+
+def bind_idempotency_key(key, run):
+    IdempotencyKey.objects.filter(key=key).update(run=run)
+
+
+def release_idempotency_key(key):
+    """Forget a key whose request did not produce a result, so a retry can run"""
+    IdempotencyKey.objects.filter(key=key, run__isnull=True).delete()
+
+
+def wait_for_idempotency_key(key, timeout=None):
+    """
+    Block until the run the key is bound to has finished; returns it, or
+    None on timeout. Raises IdempotencyKeyReleased if the owner gave the
+    key up without a run (it got no cycle to run), so the caller may claim it.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'AGENT_CYCLE_LOCK_TTL', 600)
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+
+    while True:
+        entry = list(IdempotencyKey.objects.filter(key=key).values_list('run_id', flat=True))
+        if not entry:
+            raise IdempotencyKeyReleased(key)
+        if entry[0] is not None:
+            return wait_for_run(entry[0], timeout=max(0.0, deadline - time.monotonic()))
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+def purge_idempotency_keys(ttl=None):
+    """Delete keys older than ttl seconds (default IDEMPOTENCY_KEY_TTL); returns how many"""
+    if ttl is None:
+        ttl = settings.IDEMPOTENCY_KEY_TTL
+    expired = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=ttl))
+    return expired.delete()[0]
+
+
+def generate_demands(nodes):
+    """Generate random demands for nodes"""
+    demands = {}
+    rows = []
+    today = timezone.now().date()
+
+    for node in nodes:
+        if node['node_type'] == 'STORE':
+            demand_qty = random.randint(100, 300)
+        elif node['node_type'] == 'DC':
+            demand_qty = random.randint(50, 200)
+        else:
+            demand_qty = random.randint(30, 150)
+
+        demands[node['id']] = demand_qty
+        rows.append(Demand(node_id=node['id'], quantity=demand_qty, period=today))
+
+    # Save to database
+    Demand.objects.bulk_create(rows, batch_size=DECISION_BATCH_SIZE)
+
+    return demands
+
+
+def save_decisions(results, scope=None):
+    """Upsert agent decisions, keeping one open decision per node and type
+
+    With scope (destination node ids), only those nodes' open decisions are
+    reconciled; decisions for every other node are left as they are.
+    DecisionStats counters change in the same transaction.
+    """
+    now = timezone.now()
+    incoming = {}
+
+    # Inventory decisions
+    for decision in results.get('inventory_decisions', []):
+        incoming_decision = AgentDecision(
+            agent_name=decision.get('agent', 'ReorderAgent'),
+            decision_type=decision.get('type', 'REORDER'),
+            urgency=decision.get('urgency', 'MEDIUM'),
+            destination_node_id=decision['node_id'],
+            quantity=decision.get('quantity'),
+            reason=decision.get('reason', '')
+        )
+        incoming[_decision_key(incoming_decision)] = incoming_decision
+
+    # Transport decisions
+    for decision in results.get('transport_decisions', []):
+        incoming_decision = AgentDecision(
+            agent_name=decision.get('agent', 'TransportPlanner'),
+            decision_type=decision.get('type', 'TRANSPORT'),
+            urgency=decision.get('urgency', 'MEDIUM'),
+            source_node_id=decision['from_node_id'],
+            destination_node_id=decision['to_node_id'],
+            quantity=decision.get('quantity'),
+            estimated_cost=decision.get('estimated_cost'),
+            reason=decision.get('reason', '')
+        )
+        incoming[_decision_key(incoming_decision)] = incoming_decision
+
+    # Service alerts
+    for alert in results.get('service_alerts', []):
+        incoming_decision = AgentDecision(
+            agent_name=alert.get('agent', 'MonitorAgent'),
+            decision_type=alert.get('type', 'SERVICE_ALERT'),
+            urgency=alert.get('urgency', 'MEDIUM'),
+            destination_node_id=alert['node_id'],
+            reason=alert.get('reason', '')
+        )
+        incoming[_decision_key(incoming_decision)] = incoming_decision
+
+    saved_decisions = []
+    to_create = []
+    to_update = []
+    stats = decision_stats.Deltas()
+
+    with transaction.atomic():
+        keys = list(incoming)
+        existing = {}
+        for i in range(0, len(keys), DECISION_BATCH_SIZE):
+            open_decisions = AgentDecision.objects.filter(
+                status=AgentDecision.STATUS_OPEN,
+                decision_key__in=keys[i:i + DECISION_BATCH_SIZE]
+            )
+            existing.update({d.decision_key: d for d in open_decisions})
+
+        for key, incoming_decision in incoming.items():
+            current = existing.get(key)
+            if current is None:
+                incoming_decision.updated_at = now
+                to_create.append(incoming_decision)
+                saved_decisions.append(incoming_decision)
+                continue
+
+            # Same decision as last cycle: refresh it in place
+            stats.decision(current, -1)
+            for field in DECISION_UPSERT_FIELDS:
+                setattr(current, field, getattr(incoming_decision, field))
+            stats.decision(current)
+            current.updated_at = now
+            to_update.append(current)
+            saved_decisions.append(current)
+
+        AgentDecision.objects.bulk_update(
+            to_update,
+            DECISION_UPSERT_FIELDS + ['updated_at'],
+            batch_size=DECISION_BATCH_SIZE
+        )
+        AgentDecision.objects.bulk_create(to_create, batch_size=DECISION_BATCH_SIZE)
+        # created_at is stamped by bulk_create
+        for decision in to_create:
+            stats.decision(decision)
+
+        # Open decisions this cycle did not re-emit no longer apply
+        stale = AgentDecision.objects.filter(status=AgentDecision.STATUS_OPEN, updated_at__lt=now)
+        if scope is None:
+            stats.move(stale, AgentDecision.STATUS_SUPERSEDED)
+            stale.update(status=AgentDecision.STATUS_SUPERSEDED, updated_at=now)
+        else:
+            scope = list(scope)
+            for i in range(0, len(scope), DECISION_BATCH_SIZE):
+                batch = stale.filter(destination_node_id__in=scope[i:i + DECISION_BATCH_SIZE])
+                stats.move(batch, AgentDecision.STATUS_SUPERSEDED)
+                batch.update(status=AgentDecision.STATUS_SUPERSEDED, updated_at=now)
+
+        decision_stats.apply(stats)
+
+    return saved_decisions
+
+
+def _decision_key(decision):
+    decision.decision_key = AgentDecision.make_key(
+        decision.decision_type, decision.source_node_id, decision.destination_node_id
+    )
+    return decision.decision_key
+
+
+def mark_executed(saved_decisions, executed_keys):
+    """Move executed decisions out of the open set"""
+    if not executed_keys:
+        return
+
+    now = timezone.now()
+    keys = list(executed_keys)
+    stats = decision_stats.Deltas()
+    with transaction.atomic():
+        for i in range(0, len(keys), DECISION_BATCH_SIZE):
+            batch = AgentDecision.objects.filter(
+                status=AgentDecision.STATUS_OPEN,
+                decision_key__in=keys[i:i + DECISION_BATCH_SIZE]
+            )
+            stats.move(batch, AgentDecision.STATUS_EXECUTED)
+            batch.update(
+                status=AgentDecision.STATUS_EXECUTED,
+                is_executed=True,
+                executed_at=now,
+                updated_at=now
+            )
+        decision_stats.apply(stats)
+
+    for decision in saved_decisions:
+        if decision.decision_key in executed_keys:
+            decision.status = AgentDecision.STATUS_EXECUTED
+            decision.is_executed = True
+            decision.executed_at = now
+
+
+def execute_transport_decisions(transport_decisions):
+    """Execute transportation decisions and record them in the inventory ledger"""
+    executed_keys = set()
+    movements = []
+
+    node_ids = set()
+    for decision in transport_decisions:
+        node_ids.update([decision['from_node_id'], decision['to_node_id']])
+    nodes = NetworkNode.objects.in_bulk(list(node_ids))
+    nodes = {str(pk): node for pk, node in nodes.items()}
+
+    for decision in transport_decisions:
+        try:
+            from_node = nodes[str(decision['from_node_id'])]
+            to_node = nodes[str(decision['to_node_id'])]
+            quantity = int(decision.get('quantity', 0))
+
+            if from_node.current_inventory >= quantity:
+                received = min(
+                    to_node.current_inventory + quantity,
+                    to_node.inventory_capacity
+                ) - to_node.current_inventory
+
+                from_node.current_inventory -= quantity
+                to_node.current_inventory += received
+
+                note = f"{from_node.code} -> {to_node.code}"
+                movements.append(ledger.movement(from_node.pk, 'TRANSPORT_OUT', -quantity, note))
+                movements.append(ledger.movement(to_node.pk, 'TRANSPORT_IN', received, note))
+
+                executed_keys.add(AgentDecision.make_key(
+                    decision.get('type', 'TRANSPORT'), from_node.id, to_node.id
+                ))
+
+        except Exception as e:
+            # log and continue
+            print(f"Error executing transport decision: {str(e)}")
+            continue
+
+    ledger.apply_movements(movements)
+    return executed_keys
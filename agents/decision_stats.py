@@ -0,0 +1,202 @@
+"""
+Per-node decision statistics.
+
+``DecisionStats`` has one row per destination node, day, decision type and
+urgency. It counts the decisions created that day by their current status
+(open, executed, superseded) and sums their estimated transport cost while
+open and once executed. Every decision write applies its change to these
+counters in the same transaction: ``save_decisions`` and ``mark_executed``
+in the cycle, and decision edits through the API and admin. Dashboard KPIs
+read open rows (the network's, or one node's) through partial indexes and a
+day's rows through the day or unique (node, day, type, urgency) index,
+instead of scanning agent_decisions; a node's closed history is never read.
+
+A decision always counts against the day it was created. Re-emitting an
+open decision in a later cycle changes nothing, unless its urgency or cost
+changed; then it moves between that day's rows.
+
+Changes are collected as ``Deltas`` and written with one executemany
+upsert that adds to the stored counters
+(``ON CONFLICT DO UPDATE SET n = n + excluded.n``). That is the F()
+increment bulk_create's update_conflicts cannot express, so concurrent
+writers add to each other's counts instead of overwriting them.
+
+``rebuild`` (command ``rebuild_decision_stats``) recomputes the table from
+agent_decisions after changes made around these paths, such as raw SQL.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AgentDecision, DecisionStats
+
+BATCH_SIZE = 1000
+
+KEY_FIELDS = ['node_id', 'day', 'decision_type', 'urgency']
+COUNTERS = ['open_count', 'executed_count', 'superseded_count',
+            'open_transport_cost', 'executed_transport_cost']
+
+# Counted as open alerts; FORECAST_ALERT comes from the greedy engine
+ALERT_TYPES = ('SERVICE_ALERT', 'FORECAST', 'FORECAST_ALERT')
+
+# status: (count counter, cost counter)
+STATUS_COUNTERS = {
+    AgentDecision.STATUS_OPEN: (0, 3),
+    AgentDecision.STATUS_EXECUTED: (1, 4),
+    AgentDecision.STATUS_SUPERSEDED: (2, None),
+}
+
+
+class Deltas:
+    """Counter changes by (node id, day, type, urgency), applied with ``apply``"""
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: [0, 0, 0, 0.0, 0.0])
+
+    def add(self, node_id, day, decision_type, urgency, status, count=1, cost=None):
+        if node_id is None:
+            return
+        count_at, cost_at = STATUS_COUNTERS[status]
+        row = self.rows[(node_id, day, decision_type, urgency)]
+        row[count_at] += count
+        if cost_at is not None and cost:
+            row[cost_at] += cost
+
+    def decision(self, decision, sign=1):
+        """Count (sign=1) or uncount (sign=-1) one decision as it is now"""
+        self.add(decision.destination_node_id, timezone.localdate(decision.created_at),
+                 decision.decision_type, decision.urgency, decision.status,
+                 count=sign, cost=sign * (decision.estimated_cost or 0))
+
+    def move(self, queryset, status=None):
+        """
+        Move the decisions in queryset to status (None: deleted); call it
+        before the update or delete, with the same filter
+        """
+        rows = (queryset
+                .order_by()
+                .values_list('destination_node_id', TruncDate('created_at'), 'decision_type',
+                             'urgency', 'status')
+                .annotate(count=Count('id'), cost=Sum('estimated_cost')))
+        for node_id, day, decision_type, urgency, current, count, cost in rows:
+            self.add(node_id, day, decision_type, urgency, current, count=-count, cost=-(cost or 0))
+            if status is not None:
+                self.add(node_id, day, decision_type, urgency, status, count=count, cost=cost)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+
+def apply(deltas):
+    """Add the deltas to the stored counters; call it in the transaction of the decision writes"""
+    node_field = DecisionStats._meta.get_field('node')
+    day_field = DecisionStats._meta.get_field('day')
+    rows = [
+        (node_field.get_db_prep_value(node_id, connection), day_field.get_db_prep_value(day, connection),
+         decision_type, urgency, *counters)
+        for (node_id, day, decision_type, urgency), counters in deltas.rows.items()
+        if any(counters)
+    ]
+    if not rows:
+        return 0
+
+    table = DecisionStats._meta.db_table
+    quote = connection.ops.quote_name
+    columns = KEY_FIELDS + COUNTERS
+    sql = (
+        f"INSERT INTO {quote(table)} ({', '.join(map(quote, columns))}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(map(quote, KEY_FIELDS))}) DO UPDATE SET "
+        + ', '.join(f'{quote(c)} = {quote(table)}.{quote(c)} + excluded.{quote(c)}' for c in COUNTERS)
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+    return len(rows)
+
+
+def rebuild():
+    """Recompute every counter from agent_decisions; returns the number of rows written"""
+    with transaction.atomic():
+        DecisionStats.objects.all().delete()
+        deltas = Deltas()
+        rows = (AgentDecision.objects
+                .order_by()
+                .values_list('destination_node_id', TruncDate('created_at'), 'decision_type',
+                             'urgency', 'status')
+                .annotate(count=Count('id'), cost=Sum('estimated_cost')))
+        for node_id, day, decision_type, urgency, status, count, cost in rows.iterator(chunk_size=BATCH_SIZE):
+            deltas.add(node_id, day, decision_type, urgency, status, count=count, cost=cost)
+        return apply(deltas)
+
+
+def _totals(rows):
+    totals = {
+        'open': 0,
+        'open_by_urgency': {urgency: 0 for urgency, _ in AgentDecision.URGENCY_LEVELS},
+        'open_by_type': {decision_type: 0 for decision_type, _ in AgentDecision.DECISION_TYPES},
+        'open_transport_cost': 0.0,
+    }
+    for decision_type, urgency, open_count, open_cost in rows:
+        totals['open'] += open_count
+        totals['open_by_urgency'][urgency] = totals['open_by_urgency'].get(urgency, 0) + open_count
+        totals['open_by_type'][decision_type] = totals['open_by_type'].get(decision_type, 0) + open_count
+        totals['open_transport_cost'] += open_cost
+    totals['open_alerts'] = sum(totals['open_by_type'].get(decision_type, 0) for decision_type in ALERT_TYPES)
+    totals['open_transport_cost'] = round(totals['open_transport_cost'], 2)
+    return totals
+
+
+def _day_totals(executed, superseded, executed_cost):
+    return {
+        'executed': executed or 0,
+        'superseded': superseded or 0,
+        'executed_transport_cost': round(executed_cost or 0, 2),
+    }
+
+
+def _network_queries(day):
+    open_rows = (DecisionStats.objects
+                 .filter(open_count__gt=0)
+                 .values_list('decision_type', 'urgency')
+                 .annotate(open_count=Sum('open_count'), open_cost=Sum('open_transport_cost')))
+    day_totals = {
+        'executed': Sum('executed_count'),
+        'superseded': Sum('superseded_count'),
+        'executed_cost': Sum('executed_transport_cost'),
+    }
+    return open_rows, DecisionStats.objects.filter(day=day), day_totals
+
+
+def _network_kpis(day, open_rows, day_totals):
+    kpis = _totals(open_rows)
+    kpis['day'] = day.isoformat()
+    kpis.update(_day_totals(**day_totals))
+    return kpis
+
+
+def network_kpis(day=None):
+    """Open decisions across the network, and decisions created on day (default today) by outcome"""
+    day = day or timezone.localdate()
+    open_rows, day_rows, day_totals = _network_queries(day)
+    return _network_kpis(day, open_rows, day_rows.aggregate(**day_totals))
+
+
+async def anetwork_kpis(day=None):
+    """network_kpis through the async ORM"""
+    day = day or timezone.localdate()
+    open_rows, day_rows, day_totals = _network_queries(day)
+    return _network_kpis(day, [row async for row in open_rows], await day_rows.aaggregate(**day_totals))
+
+
+def node_kpis(node_id, day=None):
+    """network_kpis for one node"""
+    day = day or timezone.localdate()
+    rows = (DecisionStats.objects
+            .filter(node_id=node_id, open_count__gt=0)
+            .values_list('decision_type', 'urgency', 'open_count', 'open_transport_cost'))
+    _, day_rows, day_totals = _network_queries(day)
+    return _network_kpis(day, rows, day_rows.filter(node_id=node_id).aggregate(**day_totals))
@@ -0,0 +1,228 @@
+"""
+Planning engines.
+
+An engine plans one cycle from the agent state with
+``make_decision(state, deadline_ms=None)`` and returns the results dict the
+cycle saves; engines that also have ``replan`` get incremental re-planning.
+An engine fails by raising or by returning results with an ``error``
+message; either way the cycle fails and saves nothing.
+Engines are registered by name:
+
+    multi_agent  forecast / inventory / transport / service agents
+                 (agents/agents/coordinator_agent.py)
+    greedy       threshold reorders matched to the nearest surplus donors
+                 (agents/coordinator_agent.py)
+
+PLANNING_ENGINE picks the engine cycles use; ``?engine=`` on
+run_agent_cycle overrides it per request.
+
+Shadow runs: PLANNING_SHADOW_ENGINE (or ``?shadow=``) names a candidate
+that plans the same cycle from a frozen copy of its state in a background
+thread. Its plan is never saved; only a ``ShadowRun`` row with both
+engines' runtime and plan metrics, and their differences, is recorded.
+When the primary re-planned incrementally, the candidate re-plans from a
+copy of the same previous evaluations and dirty nodes if it can; both
+modes are recorded, and runtimes are only compared within one mode.
+Shadow runs do not queue: while one is still running, the next cycle's is
+skipped.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.utils import timezone
+
+from .models import ShadowRun
+
+logger = logging.getLogger(__name__)
+
+_engines = {}
+_executor = None
+_shadow_slot = threading.Lock()
+
+
+class UnknownEngine(ValueError):
+    """No planning engine is registered under that name"""
+
+
+def register(name):
+    """Register an engine factory, called with the shared history store"""
+    def decorator(factory):
+        _engines[name] = factory
+        return factory
+    return decorator
+
+
+def names():
+    return sorted(_engines)
+
+
+def check(name):
+    if name not in _engines:
+        raise UnknownEngine(f"Unknown planning engine '{name}'; choose one of {', '.join(names())}")
+    return name
+
+
+def create(name, history_store=None):
+    return _engines[check(name)](history_store)
+
+
+# Engines import the agent package (and NumPy) only when a cycle builds them
+
+@register('multi_agent')
+def _multi_agent(history_store):
+    from .agents.coordinator_agent import CoordinatorAgent
+    return CoordinatorAgent(history_store=history_store)
+
+
+@register('greedy')
+def _greedy(history_store):
+    from .coordinator_agent import CoordinatorAgent
+    return CoordinatorAgent()
+
+
+def mode(engine, dirty=None):
+    """'replan' if plan() re-plans incrementally with these arguments, else 'full'"""
+    return 'replan' if dirty is not None and hasattr(engine, 'replan') else 'full'
+
+
+def plan(engine, state, deadline_ms=None, previous=None, dirty=None):
+    """Run an engine; re-plan incrementally when it can and previous evaluations are given"""
+    if mode(engine, dirty) == 'replan':
+        return engine.replan(state, previous, dirty, deadline_ms=deadline_ms)
+    return engine.make_decision(state, deadline_ms=deadline_ms)
+
+
+def plan_metrics(results):
+    """Comparable plan-quality figures for any engine's results"""
+    transports = results.get('transport_decisions', [])
+    reorders = [d for d in results.get('inventory_decisions', []) if d.get('type', 'REORDER') == 'REORDER']
+    routed = {t['to_node_id'] for t in transports}
+    units_moved = sum(int(t.get('quantity') or 0) for t in transports)
+    transport_cost = sum(float(t.get('estimated_cost') or 0) for t in transports)
+    return {
+        'reorders': len(reorders),
+        'reorder_units': sum(int(d.get('quantity') or 0) for d in reorders),
+        'unrouted_reorders': sum(1 for d in reorders if d['node_id'] not in routed),
+        'transports': len(transports),
+        'units_moved': units_moved,
+        'transport_cost': round(transport_cost, 2),
+        'cost_per_unit': round(transport_cost / units_moved, 4) if units_moved else None,
+        'service_alerts': len(results.get('service_alerts', [])),
+        'deadline_exceeded': bool(results.get('deadline_exceeded')),
+    }
+
+
+class FrozenHistory:
+    """Copy of the shared demand history for a shadow run; its appends stay in the copy"""
+
+    def __init__(self, store, node_ids):
+        self.window = store.window
+        self.histories = {node_id: list(store.get(node_id)) for node_id in node_ids}
+
+    def append(self, values):
+        for node_id, value in values.items():
+            history = self.histories.setdefault(node_id, [])
+            history.append(value)
+            del history[:-self.window]
+
+    def get(self, node_id):
+        return self.histories.get(node_id, [])
+
+
+def _copy_evaluations(evaluations):
+    """
+    Copy of the containers in a coordinator's evaluations, which replan
+    updates in place; it replaces per-node entries but never edits them
+    """
+    copied = {}
+    for key, value in evaluations.items():
+        if isinstance(value, dict):
+            value = {k: set(v) if isinstance(v, set) else list(v) if isinstance(v, list) else v
+                     for k, v in value.items()}
+        copied[key] = value
+    return copied
+
+
+def freeze_state(state, history_store=None, previous=None, dirty=None):
+    """
+    (state, history, previous, dirty) snapshot a shadow engine can plan from
+    while the cycle moves on; call it before the primary plans, which
+    updates previous in place
+    """
+    frozen = {key: value for key, value in state.items() if key not in ('nodes', 'demands')}
+    # Engines add keys to the state and the cycle's execution never touches these dicts,
+    # so copying each node row is enough
+    frozen['nodes'] = [dict(node) for node in state['nodes']]
+    frozen['demands'] = dict(state['demands'])
+    history = None
+    if history_store is not None:
+        history = FrozenHistory(history_store, [node['id'] for node in state['nodes']])
+    if previous is None or dirty is None:
+        return frozen, history, None, None
+    return frozen, history, _copy_evaluations(previous), set(dirty)
+
+
+def start_shadow(run, candidate, frozen, primary_engine, primary_mode, primary_ms, primary_results,
+                 deadline_ms=None):
+    """Plan the frozen state with the candidate engine in the background; returns the ShadowRun or None"""
+    global _executor
+    if not _shadow_slot.acquire(blocking=False):
+        logger.info("Skipping shadow run of %s: the previous one is still running", candidate)
+        return None
+
+    try:
+        shadow = ShadowRun.objects.create(
+            cycle_run=run,
+            primary_engine=primary_engine,
+            candidate_engine=candidate,
+            primary_mode=primary_mode,
+            primary_ms=round(primary_ms, 2),
+            primary_metrics=plan_metrics(primary_results),
+        )
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-engine')
+        _executor.submit(_run_shadow, shadow, frozen, deadline_ms)
+    except Exception:
+        _shadow_slot.release()
+        raise
+    return shadow
+
+
+def _run_shadow(shadow, frozen, deadline_ms):
+    state, history, previous, dirty = frozen
+    try:
+        engine = create(shadow.candidate_engine, history)
+        # An engine that cannot re-plan makes a full plan; its runtime is then not comparable
+        shadow.candidate_mode = mode(engine, dirty)
+        started = time.perf_counter()
+        results = plan(engine, state, deadline_ms=deadline_ms, previous=previous, dirty=dirty)
+        if results.get('error'):
+            raise RuntimeError(results['error'])
+        shadow.candidate_ms = round((time.perf_counter() - started) * 1000, 2)
+        shadow.candidate_metrics = plan_metrics(results)
+
+        deltas = {}
+        if shadow.candidate_mode == shadow.primary_mode:
+            deltas['runtime_ms'] = round(shadow.candidate_ms - shadow.primary_ms, 2)
+        for key, value in shadow.candidate_metrics.items():
+            primary = shadow.primary_metrics.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and \
+                    isinstance(primary, (int, float)) and not isinstance(primary, bool):
+                deltas[key] = round(value - primary, 4)
+        shadow.deltas = deltas
+        shadow.status = 'SUCCEEDED'
+    except Exception as e:
+        logger.exception("Shadow run of %s failed", shadow.candidate_engine)
+        shadow.status = 'FAILED'
+        shadow.error = str(e)
+    finally:
+        try:
+            shadow.finished_at = timezone.now()
+            shadow.save(update_fields=['status', 'candidate_mode', 'candidate_ms', 'candidate_metrics',
+                                       'deltas', 'error', 'finished_at'])
+        finally:
+            connections.close_all()
+            _shadow_slot.release()
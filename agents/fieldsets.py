@@ -0,0 +1,89 @@
+"""
+Sparse fieldsets.
+
+``?fields=a,b`` keeps only the named serializer fields and ``?omit=c,d``
+drops some; unknown names are ignored. ``SparseFieldsMixin`` trims the
+serializer and ``SparseFieldsViewMixin`` pushes the remaining fields down
+into ``.only()`` (plus ``select_related`` for dotted sources such as
+``source_node.name``), so unused columns are never read.
+"""
+from rest_framework import serializers
+
+
+def _names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def selected_fields(query_params, available):
+    """Names from available to keep for ?fields=/?omit=; None when neither is given"""
+    fields = _names(query_params.get('fields'))
+    omit = _names(query_params.get('omit'))
+    if not fields and not omit:
+        return None
+    return [name for name in available if (not fields or name in fields) and name not in omit]
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin: drops fields not selected by the request in context
+
+    Meta.sparse_sources maps fields whose source is not a model attribute
+    (SerializerMethodField) to the model fields they read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Input serializers (data=...) always keep every field
+        request = self.context.get('request')
+        if request is None or 'data' in kwargs:
+            return
+        keep = selected_fields(request.query_params, list(self.fields))
+        if keep is not None:
+            for name in set(self.fields) - set(keep):
+                self.fields.pop(name)
+
+    def query_paths(self):
+        """
+        (only() paths, select_related() paths) covering the current fields,
+        or None if some field's source is unknown
+        """
+        sparse_sources = getattr(self.Meta, 'sparse_sources', {})
+        only, related = set(), set()
+        for name, field in self.fields.items():
+            if name in sparse_sources:
+                only.update(sparse_sources[name])
+                continue
+            if field.source == '*':
+                return None
+            if isinstance(field, serializers.ManyRelatedField):
+                continue
+            attrs = field.source.split('.')
+            only.add('__'.join(attrs))
+            for depth in range(1, len(attrs)):
+                only.add('__'.join(attrs[:depth]))
+                related.add('__'.join(attrs[:depth]))
+        return sorted(only), sorted(related)
+
+
+def sparse_queryset(queryset, serializer):
+    """queryset loading only the columns (and related rows) serializer reads"""
+    paths = serializer.query_paths() if hasattr(serializer, 'query_paths') else None
+    if paths is None:
+        return queryset
+    only, related = paths
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only)
+
+
+class SparseFieldsViewMixin:
+    """
+    Viewset mixin: on list and retrieve, loads only the columns the
+    (possibly trimmed) serializer will read
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def sparse_queryset(self, queryset):
+        if self.action not in self.sparse_actions:
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer())
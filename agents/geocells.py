@@ -0,0 +1,163 @@
+"""
+Spatial buckets for map clustering.
+
+Each node stores ``geo_cell``: the Z-order (Morton) code of its position on
+a 2**MAX_LEVEL x 2**MAX_LEVEL longitude/latitude grid. Dropping the low
+``2 * (MAX_LEVEL - level)`` bits gives the cell at any coarser level, so
+one indexed integer column serves every zoom, and all nodes inside a cell
+sit in one contiguous ``geo_cell`` range.
+
+A viewport is covered by the cells it overlaps, merged into at most
+MAX_RANGES ``geo_cell`` ranges, so a query scans the index entries of
+cells in (or next to) the view rather than everything between the Morton
+codes of its corners. Boxes crossing the antimeridian (min_lon > max_lon)
+are split in two.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Avg, Count, F, FloatField, Min, Q, Sum
+from django.db.models.functions import Cast, NullIf
+
+MAX_LEVEL = 16
+
+# Grid level used at a web-map zoom: roughly 8 x 8 cells per 256px tile
+ZOOM_LEVEL_OFFSET = 3
+
+# Most cells enumerated to cover a box; larger covers use coarser cells
+MAX_COVER_CELLS = 1024
+# Most geo_cell ranges per box; the closest ranges are joined past this
+MAX_RANGES = 8
+
+
+def _spread(v):
+    """Insert a zero bit between each of the low 16 bits of v"""
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    return (v | (v << 1)) & 0x55555555
+
+
+def _compact(v):
+    """Inverse of _spread"""
+    v &= 0x55555555
+    v = (v | (v >> 1)) & 0x33333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF
+    return (v | (v >> 8)) & 0x0000FFFF
+
+
+def _grid(latitude, longitude):
+    size = 1 << MAX_LEVEL
+    x = min(size - 1, max(0, int((longitude + 180.0) / 360.0 * size)))
+    y = min(size - 1, max(0, int((latitude + 90.0) / 180.0 * size)))
+    return x, y
+
+
+def cell_for(latitude, longitude):
+    """geo_cell value (MAX_LEVEL) for a position"""
+    x, y = _grid(latitude, longitude)
+    return _spread(x) | (_spread(y) << 1)
+
+
+def level_for_zoom(zoom):
+    return max(0, min(MAX_LEVEL, int(zoom) + ZOOM_LEVEL_OFFSET))
+
+
+def cell_bounds(cell, level):
+    """(min_lon, min_lat, max_lon, max_lat) of a cell at the given level"""
+    x, y = _compact(cell), _compact(cell >> 1)
+    width, height = 360.0 / (1 << level), 180.0 / (1 << level)
+    return (-180.0 + x * width, -90.0 + y * height,
+            -180.0 + (x + 1) * width, -90.0 + (y + 1) * height)
+
+
+def split_bbox(bbox):
+    """bbox as one or two boxes that do not cross the antimeridian"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if min_lon <= max_lon:
+        return [tuple(bbox)]
+    return [(min_lon, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lon, max_lat)]
+
+
+def cell_ranges(bbox, level):
+    """
+    Inclusive geo_cell ranges covering a box that does not cross the
+    antimeridian, from the cells it overlaps at the given level, or at the
+    finest coarser level where that is at most MAX_COVER_CELLS cells
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    (x0, y0), (x1, y1) = _grid(min_lat, min_lon), _grid(max_lat, max_lon)
+
+    def cover_size(drop):
+        return ((x1 >> drop) - (x0 >> drop) + 1) * ((y1 >> drop) - (y0 >> drop) + 1)
+
+    drop = MAX_LEVEL - level
+    while drop < MAX_LEVEL and cover_size(drop) > MAX_COVER_CELLS:
+        drop += 1
+    shift = 2 * drop
+
+    cells = sorted(_spread(x) | (_spread(y) << 1)
+                   for x in range(x0 >> drop, (x1 >> drop) + 1)
+                   for y in range(y0 >> drop, (y1 >> drop) + 1))
+
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell - 1:
+            ranges[-1][1] = cell
+        else:
+            ranges.append([cell, cell])
+
+    # Each extra range costs an index seek; bridge the smallest gaps instead
+    if len(ranges) > MAX_RANGES:
+        gaps = sorted(range(1, len(ranges)), key=lambda i: ranges[i][0] - ranges[i - 1][1])
+        starts = sorted([0] + gaps[len(ranges) - MAX_RANGES:])
+        ends = [start - 1 for start in starts[1:]] + [len(ranges) - 1]
+        ranges = [[ranges[start][0], ranges[end][1]] for start, end in zip(starts, ends)]
+
+    return [(low << shift, ((high + 1) << shift) - 1) for low, high in ranges]
+
+
+def clusters(queryset, bbox, zoom):
+    """
+    Aggregate nodes inside bbox (min_lon, min_lat, max_lon, max_lat) per grid
+    cell for the zoom level, in one GROUP BY over the geo_cell ranges
+    covering it; min_lon > max_lon is a box across the antimeridian
+    """
+    level = level_for_zoom(zoom)
+    shift = 2 * (MAX_LEVEL - level)
+
+    in_view = []
+    for box in split_bbox(bbox):
+        min_lon, min_lat, max_lon, max_lat = box
+        cells = reduce(or_, (Q(geo_cell__range=r) for r in cell_ranges(box, level)))
+        in_view.append(cells & Q(latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon)))
+
+    rows = (queryset
+            .filter(reduce(or_, in_view))
+            .annotate(cell=F('geo_cell').bitrightshift(shift))
+            .values('cell')
+            .annotate(
+                count=Count('*'),
+                total_inventory=Sum('current_inventory'),
+                total_capacity=Sum('inventory_capacity'),
+                worst_inventory_ratio=Min(
+                    Cast('current_inventory', FloatField()) / NullIf('inventory_capacity', 0)
+                ),
+                latitude=Avg('latitude'),
+                longitude=Avg('longitude'),
+            )
+            .order_by('cell'))
+
+    cells = []
+    for row in rows:
+        cells.append({
+            'cell': row['cell'],
+            'count': row['count'],
+            'total_inventory': row['total_inventory'] or 0,
+            'total_capacity': row['total_capacity'] or 0,
+            'worst_inventory_ratio': row['worst_inventory_ratio'],
+            'centroid': [row['latitude'], row['longitude']],
+            'bounds': cell_bounds(row['cell'], level),
+        })
+    return {'zoom': zoom, 'level': level, 'cells': cells}
@@ -0,0 +1,53 @@
+"""
+Transport lanes for the planners.
+
+When any active ``Lane`` exists, the transportation agent and the legacy
+coordinator cost routes over the lane graph (cheapest path by lane cost,
+with the distance and transit time along it) instead of straight-line
+distance; node pairs with no path between them are not matched.
+
+The graph and the shortest-path trees it has computed are kept in process
+and reused by every cycle until the lanes change. A change is noticed by a
+single aggregate (lane count and latest ``updated_at``): saves and
+queryset updates (``Lane.objects`` stamps ``updated_at`` on bulk updates,
+which ``auto_now`` alone would not) bump ``updated_at``, and deletes,
+including cascades from deleted nodes, change the count. Rebuilding the graph also drops the re-planning cache, whose
+routes were costed on the old lanes.
+"""
+from django.db.models import Count, Max
+
+from .models import Lane
+from . import replan
+
+_graph = None
+_version = None
+
+
+def lanes_version():
+    stats = Lane.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return stats['count'], stats['updated']
+
+
+def get_graph():
+    """The current LaneGraph, or None when no lanes are defined"""
+    global _graph, _version
+    version = lanes_version()
+    if version == _version:
+        return _graph
+
+    rows = (Lane.objects
+            .filter(is_active=True)
+            .values_list('source_id', 'destination_id', 'cost', 'distance_miles', 'transit_hours'))
+    lanes = [(str(src), str(dst), cost, miles, hours) for src, dst, cost, miles, hours in rows]
+    if lanes:
+        # Imported here: the lane graph pulls in NumPy, which web workers defer
+        from .agents.lane_graph import LaneGraph
+        node_ids = sorted({lane[0] for lane in lanes} | {lane[1] for lane in lanes})
+        graph = LaneGraph(node_ids, lanes)
+    else:
+        graph = None
+
+    if _version is not None:
+        replan.invalidate()
+    _graph, _version = graph, version
+    return _graph
@@ -0,0 +1,177 @@
+"""
+Inventory ledger.
+
+Every change to a node's inventory is appended to ``InventoryMovement``;
+``InventorySnapshot`` rows periodically fold the ledger into a balance so
+reads only ever touch the movements after the latest snapshot (the "tail").
+``NetworkNode.current_inventory`` stays as the cached balance the agents read.
+
+Nothing writes that balance directly: every change is a movement applied
+with ``apply_movements`` as an F() increment in the same transaction.
+Writers that set a node to a given quantity (API, admin, topology import)
+go through ``adjust_balances``, which turns the target into an ADJUSTMENT
+against the locked, committed balance, so no concurrent movement is lost
+and the ledger always sums to the cached balance.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import NetworkNode, InventoryMovement, InventorySnapshot
+
+BATCH_SIZE = 1000
+
+
+def movement(node_id, movement_type, quantity, note=''):
+    """Build an unsaved movement"""
+    return InventoryMovement(
+        node_id=node_id,
+        movement_type=movement_type,
+        quantity=int(quantity),
+        note=note[:200]
+    )
+
+
+def apply_movements(movements):
+    """Append movements and apply their net delta to the cached balances"""
+    movements = [m for m in movements if m.quantity]
+
+    deltas = defaultdict(int)
+    for m in movements:
+        deltas[m.node_id] += m.quantity
+
+    # Nodes that moved by the same amount share a single UPDATE
+    nodes_by_delta = defaultdict(list)
+    for node_id, delta in deltas.items():
+        if delta:
+            nodes_by_delta[delta].append(node_id)
+
+    now = timezone.now()
+    with transaction.atomic():
+        InventoryMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+        for delta, node_ids in nodes_by_delta.items():
+            for i in range(0, len(node_ids), BATCH_SIZE):
+                NetworkNode.objects.filter(pk__in=node_ids[i:i + BATCH_SIZE]).update(
+                    current_inventory=F('current_inventory') + delta,
+                    updated_at=now
+                )
+
+    return movements
+
+
+def _balance_queryset(upto=None):
+    """Nodes annotated with their latest snapshot and the tail after it"""
+    latest = InventorySnapshot.objects.filter(node=OuterRef('pk')).order_by('-last_movement_id')
+
+    nodes = NetworkNode.objects.annotate(
+        snapshot_balance=Coalesce(Subquery(latest.values('balance')[:1]), 0),
+        snapshot_position=Coalesce(Subquery(latest.values('last_movement_id')[:1]), 0),
+    )
+
+    tail = InventoryMovement.objects.filter(node=OuterRef('pk'), id__gt=OuterRef('snapshot_position'))
+    if upto is not None:
+        tail = tail.filter(id__lte=upto)
+    tail = tail.order_by().values('node')
+
+    return nodes.annotate(
+        tail_total=Coalesce(Subquery(tail.annotate(total=Sum('quantity')).values('total')), 0),
+        tail_count=Coalesce(Subquery(tail.annotate(count=Count('id')).values('count')), 0),
+    )
+
+
+def adjust_balances(targets, note=''):
+    """
+    Bring nodes to target balances ({node pk: quantity}) with ADJUSTMENT
+    movements; returns the movements applied
+    """
+    with transaction.atomic():
+        current = {}
+        pks = list(targets)
+        for i in range(0, len(pks), BATCH_SIZE):
+            current.update(NetworkNode.objects
+                           .select_for_update()
+                           .filter(pk__in=pks[i:i + BATCH_SIZE])
+                           .values_list('pk', 'current_inventory'))
+        return apply_movements([
+            movement(pk, 'ADJUSTMENT', targets[pk] - balance, note)
+            for pk, balance in current.items()
+        ])
+
+
+def take_snapshots(node_ids=None, min_tail=1):
+    """Fold each node's tail into a new snapshot; returns the number taken"""
+    with transaction.atomic():
+        upto = InventoryMovement.objects.aggregate(position=Max('id'))['position'] or 0
+
+        nodes = _balance_queryset(upto=upto).filter(tail_count__gte=max(1, min_tail))
+        if node_ids is not None:
+            nodes = nodes.filter(pk__in=node_ids)
+
+        snapshots = [
+            InventorySnapshot(
+                node_id=pk,
+                balance=snapshot_balance + tail_total,
+                last_movement_id=upto
+            )
+            for pk, snapshot_balance, tail_total in nodes.values_list(
+                'pk', 'snapshot_balance', 'tail_total'
+            ).iterator(chunk_size=BATCH_SIZE)
+        ]
+        InventorySnapshot.objects.bulk_create(snapshots, batch_size=BATCH_SIZE)
+
+    return len(snapshots)
+
+
+def _sum(movements):
+    return movements.aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def _opening_balance(node_id, start):
+    """
+    Balance of one node just before start, from the nearest fold of the
+    ledger: the last snapshot before start plus the movements after it, else
+    the first snapshot after start minus the movements between start and
+    that snapshot, else the cached balance minus the movements since start
+    """
+    movements = InventoryMovement.objects.filter(node_id=node_id)
+    snapshots = InventorySnapshot.objects.filter(node_id=node_id)
+
+    before = snapshots.filter(taken_at__lte=start).order_by('-taken_at').first()
+    if before is not None:
+        return before.balance + _sum(movements.filter(id__gt=before.last_movement_id, created_at__lt=start))
+
+    after = snapshots.filter(taken_at__gt=start).order_by('taken_at').first()
+    if after is not None:
+        return after.balance - _sum(movements.filter(id__lte=after.last_movement_id, created_at__gte=start))
+
+    balance = NetworkNode.objects.filter(pk=node_id).values_list('current_inventory', flat=True).first() or 0
+    return balance - _sum(movements.filter(created_at__gte=start))
+
+
+def inventory_series(node_id, start=None, end=None):
+    """Balance after every movement of one node between start and end"""
+    end = end or timezone.now()
+    start = start or end - timedelta(days=7)
+
+    with transaction.atomic():
+        opening = _opening_balance(node_id, start)
+        points = [{'timestamp': start, 'movement_type': None, 'quantity': 0, 'balance': opening}]
+        balance = opening
+        window = (InventoryMovement.objects
+                  .filter(node_id=node_id, created_at__gte=start, created_at__lte=end)
+                  .order_by('created_at', 'id')
+                  .values_list('created_at', 'movement_type', 'quantity'))
+        for created_at, movement_type, quantity in window.iterator(chunk_size=BATCH_SIZE):
+            balance += quantity
+            points.append({
+                'timestamp': created_at,
+                'movement_type': movement_type,
+                'quantity': quantity,
+                'balance': balance
+            })
+
+    return {'start': start, 'end': end, 'opening_balance': opening, 'points': points}
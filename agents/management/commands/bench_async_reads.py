@@ -0,0 +1,205 @@
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+
+from agents.models import NetworkNode
+
+POLLED_PATHS = [
+    'nodes/',
+    'nodes/network_summary/',
+    'decisions/',
+    'demands/series/',
+]
+PATH_PREFIXES = {
+    'sync': '/api/',
+    'async': '/api/async/',
+}
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class AsgiClient:
+    """Calls an ASGI application in-process, with no server or sockets in between"""
+
+    def __init__(self, app, host='localhost'):
+        self.app = app
+        self.host = host
+
+    async def get(self, path):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', self.host.encode()), (b'accept', b'application/json')],
+            'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+        }
+        requested = False
+        disconnected = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client stays connected; Django cancels this wait once it has responded
+            return await disconnected
+
+        response = {'status': None, 'headers': {}, 'body': []}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {k.decode().lower(): v.decode() for k, v in message['headers']}
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return response['status'], response['headers'], b''.join(response['body'])
+
+    async def close(self):
+        pass
+
+
+class HttpClient:
+    """Requests against a running server (e.g. a single uvicorn worker) through aiohttp"""
+
+    def __init__(self, base_url, connections):
+        import aiohttp
+        self.base_url = base_url.rstrip('/')
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=connections),
+            headers={'Accept': 'application/json'},
+        )
+
+    async def get(self, path):
+        async with self.session.get(self.base_url + path) as response:
+            return response.status, {k.lower(): v for k, v in response.headers.items()}, await response.read()
+
+    async def close(self):
+        await self.session.close()
+
+
+class Command(BaseCommand):
+    help = ('Poll the node list, network summary, decision list and demand series from many '
+            'concurrent clients through the sync REST views and their async counterparts, '
+            'and report throughput, latency percentiles, queries and threads as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pollers', type=int, default=1000, help='Concurrent polling clients')
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Times each poller requests every endpoint')
+        parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+        parser.add_argument('--url',
+                            help='Base URL of a running ASGI server to poll instead of calling the '
+                                 'application in-process, e.g. http://127.0.0.1:8000 for '
+                                 '"uvicorn supply_chain_project.asgi:application --workers 1"')
+        parser.add_argument('--output', help='Also write the JSON report here')
+
+    def handle(self, *args, **options):
+        if options['pollers'] < 1 or options['rounds'] < 1:
+            raise CommandError('--pollers and --rounds must be >= 1')
+        if options['url'] is None and not NetworkNode.objects.exists():
+            raise CommandError('No nodes found; run initialize_network or import_network first')
+
+        modes = ['sync', 'async'] if options['mode'] == 'both' else [options['mode']]
+        report = asyncio.run(self._bench(modes, options))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def _bench(self, modes, options):
+        if options['url']:
+            client = HttpClient(options['url'], options['pollers'])
+        else:
+            client = AsgiClient(get_asgi_application())
+
+        try:
+            report = {
+                'transport': options['url'] or 'in-process ASGI',
+                'pollers': options['pollers'],
+                'rounds': options['rounds'],
+                'identical_bodies': await self._compare(client) if len(modes) == 2 else None,
+                'modes': {},
+            }
+            for mode in modes:
+                report['modes'][mode] = await self._poll(client, PATH_PREFIXES[mode], options)
+        finally:
+            await client.close()
+        return report
+
+    async def _compare(self, client):
+        """Whether each async endpoint returns the sync endpoint's status and body (page links aside)"""
+        identical = {}
+        for path in POLLED_PATHS:
+            sync = await client.get(PATH_PREFIXES['sync'] + path)
+            asynchronous = await client.get(PATH_PREFIXES['async'] + path)
+            # Page links point back at the endpoint that served them
+            body = asynchronous[2].replace(PATH_PREFIXES['async'].encode(), PATH_PREFIXES['sync'].encode())
+            identical[path] = (sync[0], sync[2]) == (asynchronous[0], body)
+        return identical
+
+    async def _poll(self, client, prefix, options):
+        latencies = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        queries = defaultdict(int)
+        peak_threads = threading.active_count()
+        done = asyncio.Event()
+
+        async def watch_threads():
+            nonlocal peak_threads
+            while not done.is_set():
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.01)
+
+        async def poller():
+            for _ in range(options['rounds']):
+                for path in POLLED_PATHS:
+                    started = time.perf_counter()
+                    try:
+                        status, headers, _ = await client.get(prefix + path)
+                    except Exception as e:
+                        status, headers = type(e).__name__, {}
+                    latencies[path].append((time.perf_counter() - started) * 1000)
+                    statuses[path][status] += 1
+                    queries[path] += int(headers.get('x-db-queries', 0))
+
+        watcher = asyncio.create_task(watch_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(poller() for _ in range(options['pollers'])))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await watcher
+
+        endpoints = {}
+        for path in POLLED_PATHS:
+            ordered = sorted(latencies[path])
+            endpoints[path] = {
+                'requests': len(ordered),
+                'statuses': {str(code): count for code, count in statuses[path].items()},
+                'queries_per_request': round(queries[path] / len(ordered), 3),
+                'p50_ms': round(_percentile(ordered, 50), 2),
+                'p95_ms': round(_percentile(ordered, 95), 2),
+                'p99_ms': round(_percentile(ordered, 99), 2),
+                'max_ms': round(ordered[-1], 2),
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        return {
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            # In-process only: threads of this process (the sync-to-async pool included)
+            'peak_threads': peak_threads if not options['url'] else None,
+            'endpoints': endpoints,
+        }
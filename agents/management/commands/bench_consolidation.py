@@ -0,0 +1,97 @@
+import copy
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+URGENCIES = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+URGENCY_MULTIPLIER = {'CRITICAL': 1.5, 'HIGH': 1.2}
+
+
+def _synthetic_plan(agent, n_nodes, n_sources, n_transports, seed):
+    """Nodes spread over the continental US and one transport per destination"""
+    rng = np.random.default_rng(seed)
+    nodes = [
+        {
+            'id': f'node-{i}',
+            'code': f'N{i:05d}',
+            'latitude': float(rng.uniform(25, 48)),
+            'longitude': float(rng.uniform(-123, -70)),
+        }
+        for i in range(n_nodes)
+    ]
+
+    destinations = rng.choice(np.arange(n_sources, n_nodes), size=n_transports, replace=False)
+    decisions = []
+    for dest in destinations:
+        source = int(rng.integers(n_sources))
+        quantity = int(rng.integers(200, 3000))
+        urgency = URGENCIES[int(rng.integers(len(URGENCIES)))]
+        distance = agent._calculate_distance(
+            nodes[source]['latitude'], nodes[source]['longitude'],
+            nodes[dest]['latitude'], nodes[dest]['longitude']
+        )
+        transport = distance * agent.cost_per_mile
+        handling = quantity * agent.cost_per_unit
+        decisions.append({
+            'type': 'TRANSPORT',
+            'from_node_id': nodes[source]['id'],
+            'from_node_code': nodes[source]['code'],
+            'to_node_id': nodes[dest]['id'],
+            'to_node_code': nodes[dest]['code'],
+            'quantity': quantity,
+            'urgency': urgency,
+            'estimated_cost': (transport + handling) * URGENCY_MULTIPLIER.get(urgency, 1.0),
+            'metadata': {'cost_breakdown': {'transport': transport, 'handling': handling}},
+        })
+    return nodes, decisions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark transport consolidation runtime against cost savings for several time budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=2000)
+        parser.add_argument('--sources', type=int, default=10)
+        parser.add_argument('--transports', type=int, default=1500)
+        parser.add_argument('--budgets', default='1,5,20,50,200,1000',
+                            help='Comma-separated time budgets in milliseconds')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        from agents.agents.transportation_agent import TransportationAgent
+
+        if options['transports'] > options['nodes'] - options['sources']:
+            raise CommandError('--transports cannot exceed --nodes minus --sources')
+        try:
+            budgets = [float(b) for b in options['budgets'].split(',') if b.strip()]
+        except ValueError:
+            raise CommandError('--budgets must be comma-separated numbers')
+
+        agent = TransportationAgent()
+        nodes, decisions = _synthetic_plan(
+            agent, options['nodes'], options['sources'], options['transports'], options['seed']
+        )
+        direct_cost = sum(d['estimated_cost'] for d in decisions)
+
+        runs = []
+        for budget in budgets:
+            result = agent.consolidate(copy.deepcopy(decisions), nodes, budget)
+            planned_cost = sum(d['estimated_cost'] for d in result['decisions'])
+            runs.append({
+                'budget_ms': budget,
+                'elapsed_ms': round(result['elapsed_ms'], 2),
+                'complete': result['complete'],
+                'routes': len(result['routes']),
+                'consolidated_transports': sum(len(r['stops']) for r in result['routes']),
+                'total_cost': round(planned_cost, 2),
+                'savings_pct': round(100 * (direct_cost - planned_cost) / direct_cost, 2),
+            })
+
+        self.stdout.write(json.dumps({
+            'nodes': options['nodes'],
+            'sources': options['sources'],
+            'transports': options['transports'],
+            'direct_cost': round(direct_cost, 2),
+            'runs': runs,
+        }, indent=2))
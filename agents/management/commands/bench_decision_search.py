@@ -0,0 +1,103 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from agents import search
+from agents.models import AgentDecision, NetworkNode
+
+REASONS = [
+    'Inventory at {pct:.1f}% ({days:.1f} days supply)',
+    'Optimal route: {src} → {dst}',
+    'Service level at {pct:.1f}%',
+    'Excess inventory detected: {pct:.1f}%',
+    'Consolidated route: {src} → {dst} (stop 1/2)',
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2), result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark decision search through the FTS5 index against LIKE scans (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Query to time (repeatable); defaults to a few typical ones')
+
+    def handle(self, *args, **options):
+        if not search.index_available():
+            raise CommandError('The FTS5 decision index is not installed (SQLite with FTS5 required)')
+
+        nodes = list(NetworkNode.objects.values_list('id', 'code'))
+        if len(nodes) < 2:
+            raise CommandError('Need at least two nodes; run initialize_network first')
+
+        rng = random.Random(options['seed'])
+        queries = options['queries'] or [
+            nodes[0][1],
+            f'{nodes[0][1]} {nodes[1][1]}',
+            'consolidated',
+            'service level',
+            'no-such-term',
+        ]
+
+        report = {'rows': options['rows'], 'queries': []}
+        try:
+            with transaction.atomic():
+                decisions = []
+                for _ in range(options['rows']):
+                    (src_id, src), (dst_id, dst) = rng.sample(nodes, 2)
+                    decisions.append(AgentDecision(
+                        agent_name=rng.choice(['InventoryManager', 'TransportationOptimizer', 'ServiceLevelMonitor']),
+                        decision_type='TRANSPORT',
+                        source_node_id=src_id,
+                        destination_node_id=dst_id,
+                        reason=rng.choice(REASONS).format(
+                            pct=rng.uniform(0, 100), days=rng.uniform(0, 30), src=src, dst=dst
+                        ),
+                        status=AgentDecision.STATUS_SUPERSEDED,
+                    ))
+
+                started = time.perf_counter()
+                AgentDecision.objects.bulk_create(decisions, batch_size=2000)
+                report['insert_s'] = round(time.perf_counter() - started, 2)
+
+                queryset = AgentDecision.objects.all()
+                for query in queries:
+                    like_ms, like_count = _median_ms(
+                        lambda: search.like_filter(queryset, query).count(), options['repeat']
+                    )
+                    fts_ms, fts_count = _median_ms(
+                        lambda: search.search_decisions(queryset, query, use_index=True).count(), options['repeat']
+                    )
+                    report['queries'].append({
+                        'query': query,
+                        'like_ms': like_ms,
+                        'fts_ms': fts_ms,
+                        'speedup': round(like_ms / fts_ms, 1) if fts_ms else None,
+                        'like_matches': like_count,
+                        'fts_matches': fts_count,
+                    })
+
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,187 @@
+import json
+import resource
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+NODE_TYPES = ['SUPPLIER', 'WH', 'DC', 'STORE']
+
+
+def _synthetic_state(nodes, skus, periods, seed):
+    rng = np.random.default_rng(seed)
+    capacity = rng.integers(500, 5000, size=(nodes, skus), dtype=np.int32)
+    on_hand = (capacity * rng.uniform(0, 1, size=(nodes, skus))).astype(np.int32)
+    history = rng.poisson(40, size=(periods, nodes, skus)).astype(np.float32)
+    return {
+        'history': history,
+        'on_hand': on_hand,
+        'capacity': capacity,
+        'latitude': rng.uniform(25, 48, size=nodes),
+        'longitude': rng.uniform(-123, -70, size=nodes),
+        'active': rng.uniform(size=nodes) > 0.02,
+        'node_types': [NODE_TYPES[i % len(NODE_TYPES)] for i in range(nodes)],
+    }
+
+
+def _stored_round_trip(state, timings):
+    """
+    Save the synthetic matrix as NodeSkuInventory rows for throwaway nodes
+    and load it back; returns the loaded state, everything written is
+    rolled back
+    """
+    from agents import geocells, sku_matrix
+    from agents.models import NetworkNode
+
+    nodes, skus = state['on_hand'].shape
+    with transaction.atomic():
+        created = NetworkNode.objects.bulk_create([
+            NetworkNode(
+                name=f'Bench node {i}', code=f'BENCH-{i}', node_type=state['node_types'][i],
+                latitude=float(state['latitude'][i]), longitude=float(state['longitude'][i]),
+                geo_cell=geocells.cell_for(state['latitude'][i], state['longitude'][i]),
+                inventory_capacity=int(state['capacity'][i].sum()), is_active=bool(state['active'][i]),
+            )
+            for i in range(nodes)
+        ], batch_size=sku_matrix.BATCH_SIZE)
+        # Matrix columns past any SKUs the database already has
+        first = sku_matrix.next_position()
+        sku_matrix.register_skus([f'BENCH-SKU-{k}' for k in range(skus)])
+
+        started = time.perf_counter()
+        on_hand = np.zeros((nodes, first + skus), dtype=np.int32)
+        capacity = np.zeros((nodes, first + skus), dtype=np.int32)
+        on_hand[:, first:], capacity[:, first:] = state['on_hand'], state['capacity']
+        sku_matrix.save_matrix([n.pk for n in created], on_hand, capacity)
+        timings['save_matrix'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, _, loaded = sku_matrix.load_state([n.pk for n in created])
+        timings['load_state'] = time.perf_counter() - started
+
+        transaction.set_rollback(True)
+
+    loaded['on_hand'] = loaded['on_hand'][:, first:]
+    loaded['capacity'] = loaded['capacity'][:, first:]
+    return dict(loaded, history=state['history'])
+
+
+def _scalar_sku(coordinator, state, sku):
+    """Per-node dict path the agent cycle uses, for one SKU column"""
+    nodes = [
+        {
+            'id': i,
+            'code': f'N{i}',
+            'node_type': state['node_types'][i],
+            'current_inventory': int(state['on_hand'][i, sku]),
+            'inventory_capacity': int(state['capacity'][i, sku]),
+            'latitude': float(state['latitude'][i]),
+            'longitude': float(state['longitude'][i]),
+            'is_active': bool(state['active'][i]),
+        }
+        for i in range(len(state['on_hand']))
+    ]
+    history = state['history'][:, :, sku]
+    forecaster = coordinator.agents['demand_forecast']
+    agent_state = {
+        'nodes': nodes,
+        'demands': {i: int(history[-1, i]) for i in range(len(nodes))},
+        'forecasts': {i: forecaster._generate_forecast(list(history[:, i]), node)
+                      for i, node in enumerate(nodes)},
+    }
+    agent_state['inventory_decisions'] = coordinator.agents['inventory'].make_decision(agent_state)
+    return coordinator.agents['transportation'].make_decision(agent_state)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized node x SKU planning path on a synthetic network'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=1000)
+        parser.add_argument('--skus', type=int, default=5000)
+        parser.add_argument('--history', type=int, default=7, help='Demand periods per cell')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--loop-sample', type=int, default=20,
+                            help='SKUs to run through the per-node loop for comparison (0 skips)')
+        parser.add_argument('--stored', action='store_true',
+                            help='Plan from the matrix saved to and loaded back from the database '
+                                 '(written in a transaction that is rolled back)')
+
+    def handle(self, *args, **options):
+        from agents.agents.coordinator_agent import CoordinatorAgent
+
+        coordinator = CoordinatorAgent()
+        state = _synthetic_state(options['nodes'], options['skus'], options['history'], options['seed'])
+
+        timings = {}
+        if options['stored']:
+            stored = _stored_round_trip(state, timings)
+            round_trip = {
+                'save_s': round(timings.pop('save_matrix'), 4),
+                'load_s': round(timings.pop('load_state'), 4),
+                'matches': all(np.array_equal(stored[k], state[k]) for k in ('on_hand', 'capacity', 'active')),
+            }
+            state = stored
+
+        started = time.perf_counter()
+        state['distances'] = coordinator.agents['transportation'].distance_matrix(
+            state['latitude'], state['longitude']
+        )
+        timings['distance_matrix'] = time.perf_counter() - started
+
+        agents = coordinator.agents
+        started = time.perf_counter()
+        forecasts = agents['demand_forecast'].forecast_matrix(state['history'], state['node_types'])
+        timings['forecast'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        inventory = agents['inventory'].make_matrix_decision(
+            state['on_hand'], state['capacity'], state['history'][-1], state['active']
+        )
+        timings['inventory'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        transport = agents['transportation'].make_matrix_decision(
+            state['on_hand'], inventory['order_quantity'], inventory['reorder'],
+            inventory['urgency'], state['latitude'], state['longitude'], state['active'],
+            distances=state['distances']
+        )
+        timings['transport'] = time.perf_counter() - started
+        timings['total'] = sum(timings.values())
+
+        report = {
+            'nodes': options['nodes'],
+            'skus': options['skus'],
+            'periods': options['history'],
+            'cells': options['nodes'] * options['skus'],
+            'timings_s': {k: round(v, 4) for k, v in timings.items()},
+            'reorders': int(inventory['reorder'].sum()),
+            'routed': int((transport['source'] >= 0).sum()),
+            'forecast_total': int(forecasts.sum(dtype=np.int64)),
+            # ru_maxrss is KiB on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+        if options['stored']:
+            report['stored'] = round_trip
+
+        sample = min(options['loop_sample'], options['skus'])
+        if sample:
+            started = time.perf_counter()
+            mismatched = 0
+            for sku in range(sample):
+                decisions = _scalar_sku(coordinator, state, sku)
+                expected = {d['to_node_id']: d['from_node_id'] for d in decisions}
+                routed = transport['source'][:, sku]
+                actual = {int(i): int(routed[i]) for i in np.flatnonzero(routed >= 0)}
+                mismatched += expected != actual
+            elapsed = time.perf_counter() - started
+            report['loop'] = {
+                'sampled_skus': sample,
+                'sample_s': round(elapsed, 4),
+                'extrapolated_s': round(elapsed / sample * options['skus'], 2),
+                'speedup': round(elapsed / sample * options['skus'] / timings['total'], 1),
+                'mismatched_skus': mismatched,
+            }
+
+        self.stdout.write(json.dumps(report, indent=2))
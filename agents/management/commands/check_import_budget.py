@@ -0,0 +1,97 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BUDGET_FILE = Path(settings.BASE_DIR) / 'supply_chain_project' / 'import_budget.json'
+
+# What a fresh web worker does before serving its first request
+STARTUP_SCRIPT = """
+import json, sys
+import supply_chain_project.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _measure_once():
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+        'DJANGO_SETTINGS_MODULE', 'supply_chain_project.settings'
+    ))
+    env.pop('PRELOAD_AGENTS', None)
+
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise CommandError(f'Startup script failed:\n{proc.stderr[-2000:]}')
+
+    # "import time: self [us] | cumulative | imported package"
+    self_us = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|', 2)
+        self_us[name.strip()] = int(own)
+
+    return {
+        'import_ms': sum(self_us.values()) / 1000,
+        'wall_ms': wall_ms,
+        'self_us': self_us,
+        'modules': json.loads(proc.stdout.strip().splitlines()[-1]),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measure web worker cold start with python -X importtime and check it against the budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10, help='Show the N slowest modules')
+        parser.add_argument('--update', action='store_true',
+                            help='Rewrite the budget from this measurement (+25%% headroom)')
+
+    def handle(self, *args, **options):
+        runs = [_measure_once() for _ in range(max(1, options['runs']))]
+        import_ms = statistics.median(r['import_ms'] for r in runs)
+        wall_ms = statistics.median(r['wall_ms'] for r in runs)
+
+        self.stdout.write(f"Cold start over {len(runs)} runs: imports {import_ms:.0f} ms, "
+                          f"process wall {wall_ms:.0f} ms")
+        slowest = sorted(runs[-1]['self_us'].items(), key=lambda item: item[1], reverse=True)
+        for name, own in slowest[:options['top']]:
+            self.stdout.write(f"  {own / 1000:8.1f} ms  {name}")
+
+        budget = json.loads(BUDGET_FILE.read_text()) if BUDGET_FILE.exists() else {}
+
+        if options['update']:
+            budget['max_import_ms'] = round(import_ms * 1.25)
+            budget['max_wall_ms'] = round(wall_ms * 1.25)
+            budget.setdefault('deferred_modules', [])
+            BUDGET_FILE.write_text(json.dumps(budget, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Budget updated in {BUDGET_FILE}'))
+            return
+
+        failures = []
+        if import_ms > budget.get('max_import_ms', float('inf')):
+            failures.append(f"imports {import_ms:.0f} ms > {budget['max_import_ms']} ms")
+        if wall_ms > budget.get('max_wall_ms', float('inf')):
+            failures.append(f"wall {wall_ms:.0f} ms > {budget['max_wall_ms']} ms")
+        loaded = set(runs[-1]['modules'])
+        for module in budget.get('deferred_modules', []):
+            if module in loaded:
+                failures.append(f"{module} is imported at startup but should be deferred")
+
+        if failures:
+            raise CommandError('Import budget exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Within import budget'))
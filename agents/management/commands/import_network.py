@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from agents import topology
+
+
+class Command(BaseCommand):
+    help = 'Bulk upsert network nodes by code from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file of nodes')
+        parser.add_argument('--chunk-size', type=int, default=topology.IMPORT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate and count without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = None
+        if path.lower().endswith('.csv'):
+            input_format = 'csv'
+        elif path.lower().endswith('.json'):
+            input_format = 'json'
+
+        try:
+            with open(path, 'rb') as f:
+                rows = topology.parse_rows(f.read(), input_format)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        report = topology.import_nodes(rows, chunk_size=options['chunk_size'],
+                                       dry_run=options['dry_run'])
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']} ({error['code']}): {error['errors']}")
+        if report['failed'] > len(report['errors']):
+            self.stderr.write(f"... {report['failed'] - len(report['errors'])} more errors")
+
+        prefix = '[dry run] ' if report['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report['total_rows']} rows: {report['created']} created, "
+            f"{report['updated']} updated, {report['failed']} failed"
+        ))
@@ -0,0 +1,302 @@
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+NODE_TYPES = ['DC', 'WH', 'STORE']
+POLLED_ENDPOINTS = [
+    '/api/nodes/',
+    '/api/nodes/network_summary/',
+    '/api/decisions/',
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _synthetic_network(n_nodes, seed):
+    """Node rows in the import_network format, spread over the continental US"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_nodes):
+        capacity = rng.choice([5000, 10000, 20000])
+        rows.append({
+            'code': f'LT{i:05d}',
+            'name': f'Load test node {i}',
+            'node_type': NODE_TYPES[i % len(NODE_TYPES)],
+            'latitude': round(rng.uniform(25, 48), 5),
+            'longitude': round(rng.uniform(-123, -70), 5),
+            'inventory_capacity': capacity,
+            'current_inventory': rng.randint(0, capacity),
+        })
+    return rows
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Recorder:
+    """Latency samples and status counts per endpoint label, shared by all workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, label, elapsed_ms, status):
+        with self.lock:
+            self.latencies[label].append(elapsed_ms)
+            self.statuses[label][status] += 1
+
+    def report(self, duration_s):
+        endpoints = {}
+        for label in sorted(self.latencies):
+            ordered = sorted(self.latencies[label])
+            statuses = dict(self.statuses[label])
+            errors = sum(count for code, count in statuses.items()
+                         if not (isinstance(code, int) and code < 400))
+            endpoints[label] = {
+                'requests': len(ordered),
+                'throughput_rps': round(len(ordered) / duration_s, 2),
+                'error_rate': round(errors / len(ordered), 4),
+                'statuses': {str(code): count for code, count in statuses.items()},
+                'p50_ms': round(_percentile(ordered, 50), 2),
+                'p95_ms': round(_percentile(ordered, 95), 2),
+                'p99_ms': round(_percentile(ordered, 99), 2),
+                'max_ms': round(ordered[-1], 2),
+            }
+        return endpoints
+
+
+class Client:
+    """One keep-alive HTTP connection per worker; reconnects after errors"""
+
+    def __init__(self, port, recorder, timeout):
+        self.port = port
+        self.recorder = recorder
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, label=None, body=None):
+        label = f"{method} {label or path.split('?')[0]}"
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            self.recorder.add(label, (time.perf_counter() - started) * 1000, type(e).__name__)
+            return None, None
+        self.recorder.add(label, (time.perf_counter() - started) * 1000, status)
+        return status, data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Command(BaseCommand):
+    help = ('Start the app on a scratch SQLite database seeded with a synthetic network, '
+            'replay dashboard-like traffic and report per-endpoint latency percentiles as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nodes', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of traffic')
+        parser.add_argument('--pollers', type=int, default=8,
+                            help='Concurrent dashboards polling nodes, summary and decisions')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds each poller waits between rounds')
+        parser.add_argument('--transfer-workers', type=int, default=2,
+                            help='Concurrent clients PATCHing inventory transfers')
+        parser.add_argument('--transfer-interval', type=float, default=0.5)
+        parser.add_argument('--cycle-interval', type=float, default=5.0,
+                            help='Seconds between run_agent_cycle calls (0 disables)')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Where to write the JSON report (default: loadtest-<time>.json)')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database directory')
+
+    def handle(self, *args, **options):
+        if options['pollers'] < 0 or options['transfer_workers'] < 0 or options['duration'] <= 0:
+            raise CommandError('--pollers and --transfer-workers must be >= 0 and --duration > 0')
+
+        workdir = Path(tempfile.mkdtemp(prefix='loadtest-'))
+        env = dict(
+            os.environ,
+            SQLITE_PATH=str(workdir / 'db.sqlite3'),
+            FORECAST_HISTORY_PATH=str(workdir / 'forecast_history'),
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'supply_chain_project.settings'),
+        )
+        manage = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py')]
+        server = server_log = None
+        try:
+            self._run(manage + ['migrate', '--noinput', '-v0'], env, 'migrate')
+            network = workdir / 'network.json'
+            network.write_text(json.dumps(_synthetic_network(options['nodes'], options['seed'])))
+            self._run(manage + ['import_network', str(network)], env, 'import_network')
+
+            port = _free_port()
+            server_log = open(workdir / 'server.log', 'w')
+            server = subprocess.Popen(
+                manage + ['runserver', '--noreload', f'127.0.0.1:{port}'],
+                cwd=settings.BASE_DIR, env=env, stdout=server_log, stderr=subprocess.STDOUT
+            )
+            self._wait_until_up(port, server)
+
+            report = self._drive(port, options)
+            report['config'] = {
+                key: options[key] for key in (
+                    'nodes', 'duration', 'pollers', 'poll_interval', 'transfer_workers',
+                    'transfer_interval', 'cycle_interval', 'seed'
+                )
+            }
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            if server_log is not None:
+                server_log.close()
+            if options['keep']:
+                self.stderr.write(f'Scratch data kept in {workdir}')
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        output = options['output'] or f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write(f"{'endpoint':<48} {'req':>6} {'rps':>7} {'err%':>6} "
+                          f"{'p50':>8} {'p95':>8} {'p99':>8}")
+        for label, stats in report['endpoints'].items():
+            self.stdout.write(
+                f"{label:<48} {stats['requests']:>6} {stats['throughput_rps']:>7} "
+                f"{stats['error_rate'] * 100:>6.1f} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
+
+    def _run(self, command, env, step):
+        proc = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise CommandError(f'{step} failed:\n{proc.stderr[-2000:]}')
+
+    def _wait_until_up(self, port, server, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('The server exited during startup; rerun with --keep and see server.log')
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'The server did not start within {timeout}s')
+
+    def _node_capacities(self, client):
+        """{node id: capacity} for every node, read through the paginated list"""
+        capacities = {}
+        page = 1
+        while True:
+            status, data = client.request(
+                'GET', f'/api/nodes/?fields=id,inventory_capacity&page={page}', label='/api/nodes/ (setup)'
+            )
+            if status != 200:
+                raise CommandError(f'Could not list nodes (status {status})')
+            body = json.loads(data)
+            capacities.update({n['id']: n['inventory_capacity'] for n in body['results']})
+            if not body.get('next'):
+                return capacities
+            page += 1
+
+    def _drive(self, port, options):
+        recorder = Recorder()
+        setup = Client(port, Recorder(), options['timeout'])
+        capacities = self._node_capacities(setup)
+        setup.close()
+        node_ids = list(capacities)
+        if len(node_ids) < 2:
+            raise CommandError('Need at least two nodes for transfers')
+
+        stop = threading.Event()
+
+        def poller(index):
+            client = Client(port, recorder, options['timeout'])
+            # Stagger dashboards so they don't poll in lockstep
+            stop.wait(options['poll_interval'] * index / max(1, options['pollers']))
+            while not stop.is_set():
+                for path in POLLED_ENDPOINTS:
+                    client.request('GET', path)
+                stop.wait(options['poll_interval'])
+            client.close()
+
+        def transfer(index):
+            client = Client(port, recorder, options['timeout'])
+            rng = random.Random(options['seed'] + index)
+            while not stop.is_set():
+                source, destination = rng.sample(node_ids, 2)
+                for node_id in (source, destination):
+                    client.request(
+                        'PATCH', f'/api/nodes/{node_id}/', label='/api/nodes/{id}/',
+                        body={'current_inventory': rng.randint(0, capacities[node_id])}
+                    )
+                stop.wait(options['transfer_interval'])
+            client.close()
+
+        def cycles():
+            client = Client(port, recorder, options['timeout'])
+            while not stop.is_set():
+                client.request('POST', '/api/decisions/run_agent_cycle/?decisions=summary')
+                stop.wait(options['cycle_interval'])
+            client.close()
+
+        workers = [threading.Thread(target=poller, args=(i,)) for i in range(options['pollers'])]
+        workers += [threading.Thread(target=transfer, args=(i,)) for i in range(options['transfer_workers'])]
+        if options['cycle_interval'] > 0:
+            workers.append(threading.Thread(target=cycles))
+
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        stop.wait(options['duration'])
+        stop.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        endpoints = recorder.report(elapsed)
+        total = sum(e['requests'] for e in endpoints.values())
+        errors = sum(e['requests'] * e['error_rate'] for e in endpoints.values())
+        return {
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            'error_rate': round(errors / total, 4) if total else 0,
+            'endpoints': endpoints,
+        }
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from agents import cycle
+
+
+class Command(BaseCommand):
+    help = 'Delete run_agent_cycle idempotency keys older than IDEMPOTENCY_KEY_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=None,
+                            help='Age in seconds past which keys are deleted (default IDEMPOTENCY_KEY_TTL)')
+
+    def handle(self, *args, **options):
+        purged = cycle.purge_idempotency_keys(ttl=options['ttl'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} idempotency keys'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from agents import decision_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-node decision stats from agent_decisions'
+
+    def handle(self, *args, **options):
+        rows = decision_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} decision stats rows'))
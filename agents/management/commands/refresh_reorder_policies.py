@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from agents import reorder_policies
+
+
+class Command(BaseCommand):
+    help = 'Fold new Demand rows into the per-node statistical reorder policies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every policy from the whole Demand history')
+
+    def handle(self, *args, **options):
+        updated = reorder_policies.refresh_policies(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} reorder policies'))
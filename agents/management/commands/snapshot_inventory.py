@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from agents import ledger
+
+
+class Command(BaseCommand):
+    help = 'Fold the inventory ledger tail into per-node snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-tail', type=int, default=1,
+                            help='Only snapshot nodes with at least this many new movements')
+
+    def handle(self, *args, **options):
+        taken = ledger.take_snapshots(min_tail=options['min_tail'])
+        self.stdout.write(self.style.SUCCESS(f'Took {taken} inventory snapshots'))
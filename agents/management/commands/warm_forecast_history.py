@@ -0,0 +1,26 @@
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from agents import cycle
+
+
+class Command(BaseCommand):
+    help = 'Build the shared forecast history store from recent demand rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete the existing store before rebuilding')
+
+    def handle(self, *args, **options):
+        path = settings.FORECAST_HISTORY_PATH
+        if options['reset']:
+            shutil.rmtree(path, ignore_errors=True)
+
+        store = cycle.get_history_store()
+        if not store.created:
+            loaded = cycle.warm_history_store(store)
+        else:
+            loaded = len(store.index)
+        self.stdout.write(self.style.SUCCESS(f'Forecast history ready for {loaded} nodes at {path}'))
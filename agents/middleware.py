@@ -0,0 +1,142 @@
+"""
+Per-request SQL instrumentation.
+
+``QueryStatsMiddleware`` wraps every database connection with
+``connection.execute_wrapper`` for the duration of a request, counting
+queries, summing their time and counting repeats of the same SQL text.
+Django's SQL is parametrised, so a query run once per row of a list (an
+N+1) shows up as one statement repeated many times.
+
+Responses get ``X-DB-Queries`` / ``X-DB-Duplicates`` and a ``Server-Timing``
+header (``db`` and ``app`` durations, visible in the browser's network
+panel). Requests slower than ``SLOW_REQUEST_MS``, or with a statement
+repeated ``N_PLUS_ONE_THRESHOLD`` times or more, are logged to
+``agents.requests`` with the most repeated statement.
+
+Each query costs two clock reads and a dict update, cheap enough to leave
+on; ``QUERY_STATS_ENABLED = False`` removes even that. Queries that
+a streaming response runs while it streams happen after the headers are
+sent, so they are not counted.
+
+The middleware is also async-capable, so under ASGI it does not force
+every request (async views included) through a thread. Async requests run
+their queries on sync_to_async threads, where a wrapper entered on the event
+loop's connections would never see them; instead every new connection gets
+one wrapper that reports to the current request's stats through a context
+variable, which sync_to_async carries into the thread. The app connects
+``instrument`` to ``connection_created`` when it loads, so connections opened
+before the first request (the middleware itself is built lazily) have it too.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('agents.requests')
+
+_request_stats = ContextVar('request_query_stats', default=None)
+
+
+class QueryStats:
+    """Counts and times the queries run through one or more connections"""
+
+    def __init__(self):
+        self.count = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Executions beyond the first of each distinct statement"""
+        return self.count - len(self.statements)
+
+    def most_repeated(self):
+        return self.statements.most_common(1)[0] if self.statements else (None, 0)
+
+
+def _record(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def instrument(sender, connection, **kwargs):
+    """connection_created receiver: report the connection's queries to the current async request"""
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+class QueryStatsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_STATS_ENABLED', True)
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 1000)
+        self.n_plus_one = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 20)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(stats))
+            response = self.get_response(request)
+        return self.report(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        stats = QueryStats()
+        started = time.perf_counter()
+        token = _request_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.report(request, response, stats, started)
+
+    def report(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.db_seconds * 1000
+
+        response['X-DB-Queries'] = str(stats.count)
+        response['X-DB-Duplicates'] = str(stats.duplicates)
+        timing = f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms - db_ms:.1f}'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        statement, repeats = stats.most_repeated()
+        if total_ms >= self.slow_ms or repeats >= self.n_plus_one:
+            logger.warning(
+                '%s %s %s: %.0f ms, %d queries (%.0f ms), %d duplicates; most repeated x%d: %.200s',
+                request.method, request.get_full_path(), response.status_code, total_ms,
+                stats.count, db_ms, stats.duplicates, repeats, statement,
+            )
+        return response
@@ -0,0 +1,75 @@
+"""
+Custom migration operations.
+
+``WithoutSearchTriggers`` runs schema operations with the decision search
+triggers (migration 0009) set aside. SQLite applies most ALTERs by
+rebuilding the table (create a copy, drop, rename); the rename fails while
+a trigger on ``agent_decisions`` still names the dropped ``network_nodes``,
+and dropping ``network_nodes`` would silently take its code trigger with
+it.
+
+Since migration 0017 no trigger reads another Django table, and
+``search.restore_triggers`` reinstalls dropped triggers after ``migrate``,
+so new migrations need no wrapping. This remains for migration 0010.
+"""
+from django.db.migrations.operations.base import Operation
+
+TRIGGER_PREFIX = 'agent_decision_search_'
+
+
+def _installed_triggers(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [TRIGGER_PREFIX + '%']
+        )
+        return cursor.fetchall()
+
+
+class WithoutSearchTriggers(Operation):
+    """Run operations with the search triggers dropped, then reinstall them as they were"""
+
+    reduces_to_sql = False
+
+    def __init__(self, operations):
+        self.operations = operations
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.operations], {}
+
+    def state_forwards(self, app_label, state):
+        for operation in self.operations:
+            operation.state_forwards(app_label, state)
+
+    def _run(self, schema_editor, apply):
+        triggers = _installed_triggers(schema_editor.connection) if schema_editor.connection.vendor == 'sqlite' else []
+        for name, _ in triggers:
+            schema_editor.execute(f'DROP TRIGGER {name}')
+        apply()
+        for _, sql in triggers:
+            schema_editor.execute(sql)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        def apply():
+            state = from_state.clone()
+            for operation in self.operations:
+                new_state = state.clone()
+                operation.state_forwards(app_label, new_state)
+                operation.database_forwards(app_label, schema_editor, state, new_state)
+                state = new_state
+        self._run(schema_editor, apply)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        def apply():
+            # Replay states forwards, then undo the operations in reverse
+            states = [to_state.clone()]
+            for operation in self.operations:
+                state = states[-1].clone()
+                operation.state_forwards(app_label, state)
+                states.append(state)
+            for i in reversed(range(len(self.operations))):
+                self.operations[i].database_backwards(app_label, schema_editor, states[i + 1], states[i])
+        self._run(schema_editor, apply)
+
+    def describe(self):
+        return 'Without search triggers: ' + '; '.join(op.describe() for op in self.operations)
@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+def close_legacy_decisions(apps, schema_editor):
+    # Rows written before the lifecycle existed have no key; close them so
+    # the next cycle re-opens whatever still applies.
+    AgentDecision = apps.get_model('agents', 'AgentDecision')
+    AgentDecision.objects.filter(is_executed=True).update(status='EXECUTED')
+    AgentDecision.objects.filter(is_executed=False).update(status='SUPERSEDED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentdecision',
+            name='decision_key',
+            field=models.CharField(blank=True, max_length=120, null=True),
+        ),
+        migrations.AddField(
+            model_name='agentdecision',
+            name='status',
+            field=models.CharField(choices=[('OPEN', 'Open'), ('SUPERSEDED', 'Superseded'), ('EXECUTED', 'Executed')], default='OPEN', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='agentdecision',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(close_legacy_decisions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='agentdecision',
+            index=models.Index(fields=['status', 'updated_at'], name='decision_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='agentdecision',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'OPEN')), fields=('decision_key',), name='unique_open_decision'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0 on 2026-10-19 04:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def snapshot_opening_balances(apps, schema_editor):
+    # Existing balances become each node's first snapshot
+    NetworkNode = apps.get_model('agents', 'NetworkNode')
+    InventorySnapshot = apps.get_model('agents', 'InventorySnapshot')
+    InventorySnapshot.objects.bulk_create(
+        [InventorySnapshot(node_id=pk, balance=balance, last_movement_id=0)
+         for pk, balance in NetworkNode.objects.values_list('pk', 'current_inventory')],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0002_decision_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('TRANSPORT_IN', 'Transport In'), ('TRANSPORT_OUT', 'Transport Out'), ('DEMAND', 'Demand Consumption'), ('ADJUSTMENT', 'Manual Adjustment')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('note', models.CharField(blank=True, default='', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='agents.networknode')),
+            ],
+            options={
+                'db_table': 'inventory_movements',
+                'indexes': [models.Index(fields=['node', 'id'], name='movement_node_pos_idx'), models.Index(fields=['node', 'created_at'], name='movement_node_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='agents.networknode')),
+            ],
+            options={
+                'db_table': 'inventory_snapshots',
+                'indexes': [models.Index(fields=['node', 'last_movement_id'], name='snapshot_node_pos_idx'), models.Index(fields=['node', 'taken_at'], name='snapshot_node_time_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_opening_balances, migrations.RunPython.noop),
+    ]
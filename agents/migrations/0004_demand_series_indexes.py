@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0003_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['node', 'period', 'quantity', 'forecast_quantity'], name='demand_node_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['period', 'quantity', 'forecast_quantity'], name='demand_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demand',
+            index=models.Index(fields=['timestamp'], name='demand_timestamp_idx'),
+        ),
+    ]
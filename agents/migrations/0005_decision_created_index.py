@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0004_demand_series_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agentdecision',
+            index=models.Index(fields=['created_at'], name='decision_created_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-19 04:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0007_cycle_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeSkuInventory',
+            fields=[
+                ('node', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sku_inventory', serialize=False, to='agents.networknode')),
+                ('on_hand', models.BinaryField(default=b'')),
+                ('capacity', models.BinaryField(default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'node_sku_inventory',
+            },
+        ),
+        migrations.CreateModel(
+            name='Sku',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(blank=True, default='', max_length=200)),
+                ('position', models.PositiveIntegerField(unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'skus',
+                'ordering': ['position'],
+            },
+        ),
+    ]
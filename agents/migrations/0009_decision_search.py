@@ -0,0 +1,120 @@
+from django.db import migrations
+
+# SQLite FTS5 index over decision reason, agent name and node codes. Triggers
+# keep it in sync with every write, bulk_create and bulk_update included.
+# FTS rowids live in agent_decision_search_docs (an INTEGER PRIMARY KEY table)
+# rather than agent_decisions' implicit rowid, which VACUUM may renumber.
+CREATE_SQL = [
+    """
+    CREATE TABLE agent_decision_search_docs (
+        doc INTEGER PRIMARY KEY,
+        decision_id CHAR(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE agent_decision_search USING fts5(
+        reason, agent_name, source_code, destination_code,
+        tokenize = 'unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_insert AFTER INSERT ON agent_decisions BEGIN
+        INSERT INTO agent_decision_search_docs (decision_id) VALUES (new.id);
+        INSERT INTO agent_decision_search (rowid, reason, agent_name, source_code, destination_code)
+        VALUES (
+            (SELECT doc FROM agent_decision_search_docs WHERE decision_id = new.id),
+            new.reason,
+            new.agent_name,
+            (SELECT code FROM network_nodes WHERE id = new.source_node_id),
+            (SELECT code FROM network_nodes WHERE id = new.destination_node_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_update
+    AFTER UPDATE OF reason, agent_name, source_node_id, destination_node_id ON agent_decisions BEGIN
+        UPDATE agent_decision_search SET
+            reason = new.reason,
+            agent_name = new.agent_name,
+            source_code = (SELECT code FROM network_nodes WHERE id = new.source_node_id),
+            destination_code = (SELECT code FROM network_nodes WHERE id = new.destination_node_id)
+        WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_delete AFTER DELETE ON agent_decisions BEGIN
+        DELETE FROM agent_decision_search
+        WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+        DELETE FROM agent_decision_search_docs WHERE decision_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_node_code AFTER UPDATE OF code ON network_nodes BEGIN
+        UPDATE agent_decision_search SET source_code = new.code
+        WHERE rowid IN (
+            SELECT s.doc FROM agent_decision_search_docs s
+            JOIN agent_decisions d ON d.id = s.decision_id
+            WHERE d.source_node_id = new.id
+        );
+        UPDATE agent_decision_search SET destination_code = new.code
+        WHERE rowid IN (
+            SELECT s.doc FROM agent_decision_search_docs s
+            JOIN agent_decisions d ON d.id = s.decision_id
+            WHERE d.destination_node_id = new.id
+        );
+    END
+    """,
+    """
+    INSERT INTO agent_decision_search_docs (decision_id) SELECT id FROM agent_decisions
+    """,
+    """
+    INSERT INTO agent_decision_search (rowid, reason, agent_name, source_code, destination_code)
+    SELECT s.doc, d.reason, d.agent_name, src.code, dst.code
+    FROM agent_decision_search_docs s
+    JOIN agent_decisions d ON d.id = s.decision_id
+    LEFT JOIN network_nodes src ON src.id = d.source_node_id
+    LEFT JOIN network_nodes dst ON dst.id = d.destination_node_id
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS agent_decision_search_node_code",
+    "DROP TRIGGER IF EXISTS agent_decision_search_delete",
+    "DROP TRIGGER IF EXISTS agent_decision_search_update",
+    "DROP TRIGGER IF EXISTS agent_decision_search_insert",
+    "DROP TABLE IF EXISTS agent_decision_search",
+    "DROP TABLE IF EXISTS agent_decision_search_docs",
+]
+
+
+def fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    # Other backends (and SQLite builds without FTS5) fall back to LIKE search
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or not fts5_available(connection):
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0008_sku_matrix'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+from agents.geocells import cell_for
+from agents.migration_operations import WithoutSearchTriggers
+
+
+def backfill_geo_cells(apps, schema_editor):
+    NetworkNode = apps.get_model('agents', 'NetworkNode')
+    nodes = list(NetworkNode.objects.only('id', 'latitude', 'longitude'))
+    for node in nodes:
+        node.geo_cell = cell_for(node.latitude, node.longitude)
+    NetworkNode.objects.bulk_update(nodes, ['geo_cell'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0009_decision_search'),
+    ]
+
+    operations = [
+        # SQLite adds the column by rebuilding network_nodes
+        WithoutSearchTriggers([
+            migrations.AddField(
+                model_name='networknode',
+                name='geo_cell',
+                field=models.BigIntegerField(default=0, editable=False),
+            ),
+        ]),
+        migrations.RunPython(backfill_geo_cells, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='networknode',
+            index=models.Index(fields=['geo_cell', 'is_active', 'latitude', 'longitude', 'current_inventory', 'inventory_capacity'], name='node_geo_cell_idx'),
+        ),
+    ]
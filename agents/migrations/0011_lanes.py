@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 04:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0010_map_clusters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lane',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_miles', models.FloatField()),
+                ('cost', models.FloatField()),
+                ('transit_hours', models.FloatField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbound_lanes', to='agents.networknode')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbound_lanes', to='agents.networknode')),
+            ],
+            options={
+                'db_table': 'lanes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lane',
+            constraint=models.UniqueConstraint(fields=('source', 'destination'), name='unique_lane'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0011_lanes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderPolicy',
+            fields=[
+                ('node', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_policy', serialize=False, to='agents.networknode')),
+                ('observations', models.IntegerField(default=0)),
+                ('demand_sum', models.FloatField(default=0)),
+                ('demand_sum_sq', models.FloatField(default=0)),
+                ('demand_through', models.DateTimeField(blank=True, null=True)),
+                ('demand_mean', models.FloatField(default=0)),
+                ('demand_std', models.FloatField(default=0)),
+                ('lead_time_periods', models.FloatField(blank=True, null=True)),
+                ('safety_stock', models.IntegerField(default=0)),
+                ('reorder_point', models.IntegerField(default=0)),
+                ('order_up_to', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'reorder_policies',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-19 05:30
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0012_reorder_policies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('primary_engine', models.CharField(max_length=50)),
+                ('candidate_engine', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='RUNNING', max_length=20)),
+                ('primary_ms', models.FloatField()),
+                ('candidate_ms', models.FloatField(blank=True, null=True)),
+                ('primary_metrics', models.JSONField(default=dict)),
+                ('candidate_metrics', models.JSONField(blank=True, null=True)),
+                ('deltas', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('cycle_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_runs', to='agents.cyclerun')),
+            ],
+            options={
+                'db_table': 'shadow_runs',
+                'indexes': [models.Index(fields=['candidate_engine', 'created_at'], name='shadow_run_engine_idx')],
+            },
+        ),
+    ]
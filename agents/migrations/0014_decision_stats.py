@@ -0,0 +1,60 @@
+# Generated by Django 5.0 on 2026-10-19 05:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    AgentDecision = apps.get_model('agents', 'AgentDecision')
+    DecisionStats = apps.get_model('agents', 'DecisionStats')
+    rows = (AgentDecision.objects
+            .filter(destination_node__isnull=False)
+            .order_by()
+            .values('destination_node_id', 'decision_type', 'urgency', day=TruncDate('created_at'))
+            .annotate(
+                open_count=Count('id', filter=Q(status='OPEN')),
+                executed_count=Count('id', filter=Q(status='EXECUTED')),
+                superseded_count=Count('id', filter=Q(status='SUPERSEDED')),
+                open_transport_cost=Sum('estimated_cost', filter=Q(status='OPEN'), default=0),
+                executed_transport_cost=Sum('estimated_cost', filter=Q(status='EXECUTED'), default=0),
+            ))
+    DecisionStats.objects.bulk_create(
+        (DecisionStats(node_id=row.pop('destination_node_id'), **row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0013_shadow_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DecisionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('decision_type', models.CharField(choices=[('REORDER', 'Reorder'), ('REDISTRIBUTE', 'Redistribute'), ('TRANSPORT', 'Transport'), ('SERVICE_ALERT', 'Service Alert'), ('FORECAST', 'Demand Forecast')], max_length=20)),
+                ('urgency', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('CRITICAL', 'Critical')], max_length=20)),
+                ('open_count', models.IntegerField(default=0)),
+                ('executed_count', models.IntegerField(default=0)),
+                ('superseded_count', models.IntegerField(default=0)),
+                ('open_transport_cost', models.FloatField(default=0)),
+                ('executed_transport_cost', models.FloatField(default=0)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='decision_stats', to='agents.networknode')),
+            ],
+            options={
+                'db_table': 'decision_stats',
+                'indexes': [models.Index(fields=['day'], name='decision_stats_day_idx'), models.Index(condition=models.Q(('open_count__gt', 0)), fields=['urgency', 'decision_type'], name='decision_stats_open_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='decisionstats',
+            constraint=models.UniqueConstraint(fields=('node', 'day', 'decision_type', 'urgency'), name='unique_decision_stats'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
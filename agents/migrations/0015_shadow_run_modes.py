@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0014_decision_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shadowrun',
+            name='candidate_mode',
+            field=models.CharField(blank=True, choices=[('full', 'Full plan'), ('replan', 'Incremental re-plan')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='shadowrun',
+            name='primary_mode',
+            field=models.CharField(choices=[('full', 'Full plan'), ('replan', 'Incremental re-plan')], default='full', max_length=10),
+        ),
+    ]
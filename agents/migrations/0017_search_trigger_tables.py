@@ -0,0 +1,182 @@
+from django.db import migrations
+
+# The search triggers read node codes from network_nodes and joined
+# agent_decisions from the node code trigger, so SQLite could not rebuild
+# either table under them (the final rename fails on the dangling reference).
+# Node codes now live in agent_decision_search_nodes, kept by triggers on
+# network_nodes, and each doc row carries its decision's node ids; no
+# trigger reads a table other than the one it is defined on and the search
+# tables.
+TRIGGER_NAMES = [
+    'agent_decision_search_insert',
+    'agent_decision_search_update',
+    'agent_decision_search_delete',
+    'agent_decision_search_node_code',
+]
+
+FORWARD_SQL = [
+    "ALTER TABLE agent_decision_search_docs ADD COLUMN source_node_id CHAR(32)",
+    "ALTER TABLE agent_decision_search_docs ADD COLUMN destination_node_id CHAR(32)",
+    """
+    UPDATE agent_decision_search_docs SET
+        source_node_id = (SELECT source_node_id FROM agent_decisions WHERE id = decision_id),
+        destination_node_id = (SELECT destination_node_id FROM agent_decisions WHERE id = decision_id)
+    """,
+    "CREATE INDEX agent_decision_search_docs_source ON agent_decision_search_docs (source_node_id)",
+    "CREATE INDEX agent_decision_search_docs_destination ON agent_decision_search_docs (destination_node_id)",
+    """
+    CREATE TABLE agent_decision_search_nodes (
+        node_id CHAR(32) PRIMARY KEY,
+        code TEXT NOT NULL
+    )
+    """,
+    "INSERT INTO agent_decision_search_nodes (node_id, code) SELECT id, code FROM network_nodes",
+    """
+    CREATE TRIGGER agent_decision_search_insert AFTER INSERT ON agent_decisions BEGIN
+        INSERT INTO agent_decision_search_docs (decision_id, source_node_id, destination_node_id)
+        VALUES (new.id, new.source_node_id, new.destination_node_id);
+        INSERT INTO agent_decision_search (rowid, reason, agent_name, source_code, destination_code)
+        VALUES (
+            (SELECT doc FROM agent_decision_search_docs WHERE decision_id = new.id),
+            new.reason,
+            new.agent_name,
+            (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.source_node_id),
+            (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.destination_node_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_update
+    AFTER UPDATE OF reason, agent_name, source_node_id, destination_node_id ON agent_decisions BEGIN
+        UPDATE agent_decision_search_docs SET
+            source_node_id = new.source_node_id,
+            destination_node_id = new.destination_node_id
+        WHERE decision_id = old.id;
+        UPDATE agent_decision_search SET
+            reason = new.reason,
+            agent_name = new.agent_name,
+            source_code = (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.source_node_id),
+            destination_code = (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.destination_node_id)
+        WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_delete AFTER DELETE ON agent_decisions BEGIN
+        DELETE FROM agent_decision_search
+        WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+        DELETE FROM agent_decision_search_docs WHERE decision_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_node_insert AFTER INSERT ON network_nodes BEGIN
+        INSERT OR REPLACE INTO agent_decision_search_nodes (node_id, code) VALUES (new.id, new.code);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_node_code AFTER UPDATE OF code ON network_nodes BEGIN
+        UPDATE agent_decision_search_nodes SET code = new.code WHERE node_id = new.id;
+        UPDATE agent_decision_search SET source_code = new.code
+        WHERE rowid IN (SELECT doc FROM agent_decision_search_docs WHERE source_node_id = new.id);
+        UPDATE agent_decision_search SET destination_code = new.code
+        WHERE rowid IN (SELECT doc FROM agent_decision_search_docs WHERE destination_node_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_node_delete AFTER DELETE ON network_nodes BEGIN
+        DELETE FROM agent_decision_search_nodes WHERE node_id = old.id;
+    END
+    """,
+]
+
+# Migration 0009's triggers
+BACKWARD_SQL = [
+    "DROP TRIGGER IF EXISTS agent_decision_search_node_insert",
+    "DROP TRIGGER IF EXISTS agent_decision_search_node_delete",
+    "DROP TABLE agent_decision_search_nodes",
+    "DROP INDEX agent_decision_search_docs_source",
+    "DROP INDEX agent_decision_search_docs_destination",
+    "ALTER TABLE agent_decision_search_docs DROP COLUMN source_node_id",
+    "ALTER TABLE agent_decision_search_docs DROP COLUMN destination_node_id",
+    """
+    CREATE TRIGGER agent_decision_search_insert AFTER INSERT ON agent_decisions BEGIN
+        INSERT INTO agent_decision_search_docs (decision_id) VALUES (new.id);
+        INSERT INTO agent_decision_search (rowid, reason, agent_name, source_code, destination_code)
+        VALUES (
+            (SELECT doc FROM agent_decision_search_docs WHERE decision_id = new.id),
+            new.reason,
+            new.agent_name,
+            (SELECT code FROM network_nodes WHERE id = new.source_node_id),
+            (SELECT code FROM network_nodes WHERE id = new.destination_node_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_update
+    AFTER UPDATE OF reason, agent_name, source_node_id, destination_node_id ON agent_decisions BEGIN
+        UPDATE agent_decision_search SET
+            reason = new.reason,
+            agent_name = new.agent_name,
+            source_code = (SELECT code FROM network_nodes WHERE id = new.source_node_id),
+            destination_code = (SELECT code FROM network_nodes WHERE id = new.destination_node_id)
+        WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_delete AFTER DELETE ON agent_decisions BEGIN
+        DELETE FROM agent_decision_search
+        WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+        DELETE FROM agent_decision_search_docs WHERE decision_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER agent_decision_search_node_code AFTER UPDATE OF code ON network_nodes BEGIN
+        UPDATE agent_decision_search SET source_code = new.code
+        WHERE rowid IN (
+            SELECT s.doc FROM agent_decision_search_docs s
+            JOIN agent_decisions d ON d.id = s.decision_id
+            WHERE d.source_node_id = new.id
+        );
+        UPDATE agent_decision_search SET destination_code = new.code
+        WHERE rowid IN (
+            SELECT s.doc FROM agent_decision_search_docs s
+            JOIN agent_decisions d ON d.id = s.decision_id
+            WHERE d.destination_node_id = new.id
+        );
+    END
+    """,
+]
+
+
+def search_index_exists(schema_editor):
+    connection = schema_editor.connection
+    return (connection.vendor == 'sqlite' and
+            'agent_decision_search' in connection.introspection.table_names())
+
+
+def forwards(apps, schema_editor):
+    if not search_index_exists(schema_editor):
+        return
+    for name in TRIGGER_NAMES:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for sql in FORWARD_SQL:
+        schema_editor.execute(sql)
+
+
+def backwards(apps, schema_editor):
+    if not search_index_exists(schema_editor):
+        return
+    for name in TRIGGER_NAMES:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for sql in BACKWARD_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0016_idempotency_key_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backdate_opening_snapshots(apps, schema_editor):
+    # 0003 stamped each node's opening snapshot with the migration time, so
+    # series windows before it opened at 0; the opening balance held since
+    # the node was created
+    NetworkNode = apps.get_model('agents', 'NetworkNode')
+    InventorySnapshot = apps.get_model('agents', 'InventorySnapshot')
+    InventorySnapshot.objects.filter(last_movement_id=0).update(
+        taken_at=Subquery(NetworkNode.objects.filter(pk=OuterRef('node_id')).values('created_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0017_search_trigger_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(backdate_opening_snapshots, migrations.RunPython.noop),
+    ]
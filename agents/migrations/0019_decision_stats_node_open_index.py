@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0018_backdate_opening_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='decisionstats',
+            index=models.Index(condition=models.Q(('open_count__gt', 0)), fields=['node'], name='decision_stats_node_open_idx'),
+        ),
+    ]
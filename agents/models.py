@@ -1,6 +1,9 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
+from . import geocells
+
 class NetworkNode(models.Model):
     NODE_TYPES = [
         ('DC', 'Distribution Center'),
@@ -17,6 +20,8 @@ class NetworkNode(models.Model):
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Z-order grid cell of the location (see agents/geocells.py), kept in step by save() and imports
+    geo_cell = models.BigIntegerField(default=0, editable=False)
     
     # Capacity
     inventory_capacity = models.IntegerField()
@@ -31,10 +36,23 @@ class NetworkNode(models.Model):
     
     class Meta:
         db_table = 'network_nodes'
+        indexes = [
+            # Covers the map cluster aggregates (geocells.clusters)
+            models.Index(fields=['geo_cell', 'is_active', 'latitude', 'longitude',
+                                 'current_inventory', 'inventory_capacity'],
+                         name='node_geo_cell_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.code})"
 
+    def save(self, *args, **kwargs):
+        self.geo_cell = geocells.cell_for(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = list(update_fields) + ['geo_cell']
+        super().save(*args, **kwargs)
+
 
 class Demand(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -46,6 +64,14 @@ class Demand(models.Model):
     
     class Meta:
         db_table = 'demands'
+        indexes = [
+            # Key columns double as covering columns for the series aggregates
+            models.Index(fields=['node', 'period', 'quantity', 'forecast_quantity'],
+                         name='demand_node_period_idx'),
+            models.Index(fields=['period', 'quantity', 'forecast_quantity'],
+                         name='demand_period_idx'),
+            models.Index(fields=['timestamp'], name='demand_timestamp_idx'),
+        ]
 
 
 class AgentDecision(models.Model):
@@ -63,6 +89,15 @@ class AgentDecision(models.Model):
         ('HIGH', 'High'),
         ('CRITICAL', 'Critical'),
     ]
+
+    STATUS_OPEN = 'OPEN'
+    STATUS_SUPERSEDED = 'SUPERSEDED'
+    STATUS_EXECUTED = 'EXECUTED'
+    STATUSES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_SUPERSEDED, 'Superseded'),
+        (STATUS_EXECUTED, 'Executed'),
+    ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     agent_name = models.CharField(max_length=100)
@@ -81,14 +116,277 @@ class AgentDecision(models.Model):
     reason = models.TextField()
     
     # Status
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_OPEN)
+    decision_key = models.CharField(max_length=120, null=True, blank=True)
     is_executed = models.BooleanField(default=False)
     executed_at = models.DateTimeField(null=True, blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'agent_decisions'
+        constraints = [
+            # At most one open decision per (type, source, destination)
+            models.UniqueConstraint(
+                fields=['decision_key'],
+                condition=models.Q(status='OPEN'),
+                name='unique_open_decision',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='decision_status_idx'),
+            models.Index(fields=['created_at'], name='decision_created_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.agent_name} - {self.decision_type}"
\ No newline at end of file
+        return f"{self.agent_name} - {self.decision_type}"
+
+    def save(self, *args, **kwargs):
+        if self.is_executed and self.status == self.STATUS_OPEN:
+            self.status = self.STATUS_EXECUTED
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def make_key(decision_type, source_node_id=None, destination_node_id=None):
+        """Build the key that identifies an open decision across cycles"""
+        return f"{decision_type}:{source_node_id or '-'}:{destination_node_id or '-'}"
+
+class DecisionStats(models.Model):
+    """Decision counts per destination node, creation day, type and urgency (agents/decision_stats.py)"""
+    node = models.ForeignKey(NetworkNode, on_delete=models.CASCADE, related_name='decision_stats')
+    day = models.DateField()
+    decision_type = models.CharField(max_length=20, choices=AgentDecision.DECISION_TYPES)
+    urgency = models.CharField(max_length=20, choices=AgentDecision.URGENCY_LEVELS)
+
+    # Decisions created that day, by current status
+    open_count = models.IntegerField(default=0)
+    executed_count = models.IntegerField(default=0)
+    superseded_count = models.IntegerField(default=0)
+    # Sum of estimated_cost (set on transports only)
+    open_transport_cost = models.FloatField(default=0)
+    executed_transport_cost = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'decision_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['node', 'day', 'decision_type', 'urgency'],
+                                    name='unique_decision_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='decision_stats_day_idx'),
+            # Network-wide open counts read only the rows that still have open decisions
+            models.Index(fields=['urgency', 'decision_type'], name='decision_stats_open_idx',
+                         condition=models.Q(open_count__gt=0)),
+            # A node's open counts, without its closed history
+            models.Index(fields=['node'], name='decision_stats_node_open_idx',
+                         condition=models.Q(open_count__gt=0)),
+        ]
+
+    def __str__(self):
+        return f"{self.node_id} {self.day} {self.decision_type}/{self.urgency}"
+
+class InventoryMovement(models.Model):
+    """Append-only record of every change to a node's inventory"""
+    MOVEMENT_TYPES = [
+        ('TRANSPORT_IN', 'Transport In'),
+        ('TRANSPORT_OUT', 'Transport Out'),
+        ('DEMAND', 'Demand Consumption'),
+        ('ADJUSTMENT', 'Manual Adjustment'),
+    ]
+
+    node = models.ForeignKey(NetworkNode, on_delete=models.CASCADE, related_name='movements')
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
+    quantity = models.IntegerField()  # signed delta
+    note = models.CharField(max_length=200, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'inventory_movements'
+        indexes = [
+            models.Index(fields=['node', 'id'], name='movement_node_pos_idx'),
+            models.Index(fields=['node', 'created_at'], name='movement_node_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.node_id} {self.movement_type} {self.quantity:+d}"
+
+
+class InventorySnapshot(models.Model):
+    """Node balance as of a given ledger position"""
+    node = models.ForeignKey(NetworkNode, on_delete=models.CASCADE, related_name='snapshots')
+    balance = models.IntegerField()
+    last_movement_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'inventory_snapshots'
+        indexes = [
+            models.Index(fields=['node', 'last_movement_id'], name='snapshot_node_pos_idx'),
+            models.Index(fields=['node', 'taken_at'], name='snapshot_node_time_idx'),
+        ]
+
+
+class CycleLock(models.Model):
+    """Named lease that keeps agent cycles from overlapping"""
+    name = models.CharField(max_length=50, primary_key=True)
+    holder = models.CharField(max_length=64)
+    acquired_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'cycle_locks'
+
+
+class CycleRun(models.Model):
+    """One executed agent cycle and the summary callers get back"""
+    STATUSES = [
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUSES, default='RUNNING')
+    summary = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'cycle_runs'
+        indexes = [
+            models.Index(fields=['started_at'], name='cycle_run_started_idx'),
+        ]
+
+
+class ShadowRun(models.Model):
+    """A candidate planning engine run on a cycle's state without persisting (see agents/engines.py)"""
+    STATUSES = [
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+    MODES = [
+        ('full', 'Full plan'),
+        ('replan', 'Incremental re-plan'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    cycle_run = models.ForeignKey(CycleRun, on_delete=models.CASCADE, related_name='shadow_runs')
+    primary_engine = models.CharField(max_length=50)
+    candidate_engine = models.CharField(max_length=50)
+    primary_mode = models.CharField(max_length=10, choices=MODES, default='full')
+    candidate_mode = models.CharField(max_length=10, choices=MODES, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUSES, default='RUNNING')
+    primary_ms = models.FloatField()
+    candidate_ms = models.FloatField(null=True, blank=True)
+    primary_metrics = models.JSONField(default=dict)
+    candidate_metrics = models.JSONField(null=True, blank=True)
+    # candidate - primary for every numeric metric, plus runtime_ms when both ran in the same mode
+    deltas = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'shadow_runs'
+        indexes = [
+            models.Index(fields=['candidate_engine', 'created_at'], name='shadow_run_engine_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Client-supplied key mapped to the cycle run that answered it"""
+    key = models.CharField(max_length=255, primary_key=True)
+    run = models.ForeignKey(CycleRun, on_delete=models.CASCADE, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_key_created_idx'),
+        ]
+
+
+class Sku(models.Model):
+    """Stock keeping unit; position is its column in the node x SKU matrix"""
+    code = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=200, blank=True, default='')
+    position = models.PositiveIntegerField(unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'skus'
+        ordering = ['position']
+
+    def __str__(self):
+        return self.code
+
+
+class NodeSkuInventory(models.Model):
+    """Per-SKU stock for one node, packed as little-endian int32 by Sku.position"""
+    node = models.OneToOneField(NetworkNode, on_delete=models.CASCADE,
+                                primary_key=True, related_name='sku_inventory')
+    on_hand = models.BinaryField(default=b'')
+    capacity = models.BinaryField(default=b'')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'node_sku_inventory'
+
+
+class LaneQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # auto_now only applies on save(); stamp bulk updates (and bulk_update,
+        # which goes through here) too, so lanes.lanes_version() sees them
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class Lane(models.Model):
+    """Directed transport lane; the planners route over these when any exist (see agents/lanes.py)"""
+    source = models.ForeignKey(NetworkNode, on_delete=models.CASCADE, related_name='outbound_lanes')
+    destination = models.ForeignKey(NetworkNode, on_delete=models.CASCADE, related_name='inbound_lanes')
+    distance_miles = models.FloatField()
+    # Cost of one shipment over the lane, before handling and urgency
+    cost = models.FloatField()
+    transit_hours = models.FloatField()
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LaneQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'lanes'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'destination'], name='unique_lane'),
+        ]
+
+    def __str__(self):
+        return f"{self.source.code} → {self.destination.code}"
+
+
+class ReorderPolicy(models.Model):
+    """Per-node demand statistics and the reorder thresholds derived from them (agents/reorder_policies.py)"""
+    node = models.OneToOneField(NetworkNode, on_delete=models.CASCADE,
+                                primary_key=True, related_name='reorder_policy')
+    # Running sums over every Demand row up to demand_through, so refreshes only read new rows
+    observations = models.IntegerField(default=0)
+    demand_sum = models.FloatField(default=0)
+    demand_sum_sq = models.FloatField(default=0)
+    demand_through = models.DateTimeField(null=True, blank=True)
+
+    demand_mean = models.FloatField(default=0)
+    demand_std = models.FloatField(default=0)
+    # In demand periods (one Demand row per cycle); blank uses REORDER_LEAD_TIME_PERIODS
+    lead_time_periods = models.FloatField(null=True, blank=True)
+    safety_stock = models.IntegerField(default=0)
+    reorder_point = models.IntegerField(default=0)
+    order_up_to = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'reorder_policies'
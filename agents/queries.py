@@ -0,0 +1,152 @@
+"""
+Read queries shared by the REST viewsets and their async counterparts
+(agents/async_views.py).
+
+Each helper builds a lazy queryset or aggregate and turns fetched rows into
+the response payload; fetching is left to the caller, so the sync views
+evaluate them directly and the async views use the async ORM. Both return
+identical payloads.
+"""
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils.dateparse import parse_date
+
+from . import search
+from .models import Demand, NetworkNode
+
+SERIES_BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def network_summary_aggregates():
+    """(active nodes, aggregates) for every network_summary total in one query"""
+    aggregates = {
+        'total_nodes': Count('id'),
+        'total_capacity': Sum('inventory_capacity'),
+        'total_inventory': Sum('current_inventory'),
+    }
+    for node_type, _ in NetworkNode.NODE_TYPES:
+        of_type = Q(node_type=node_type)
+        aggregates[f'{node_type}_count'] = Count('id', filter=of_type)
+        aggregates[f'{node_type}_inventory'] = Sum('current_inventory', filter=of_type)
+        aggregates[f'{node_type}_capacity'] = Sum('inventory_capacity', filter=of_type)
+    return NetworkNode.objects.filter(is_active=True), aggregates
+
+
+def network_summary(totals, decisions):
+    """network_summary payload from the aggregate totals and decision_stats KPIs"""
+    summary = {
+        'total_nodes': totals['total_nodes'],
+        'total_capacity': totals['total_capacity'] or 0,
+        'total_inventory': totals['total_inventory'] or 0,
+        'by_type': {
+            node_type: {
+                'count': totals[f'{node_type}_count'],
+                'total_inventory': totals[f'{node_type}_inventory'] or 0,
+                'total_capacity': totals[f'{node_type}_capacity'] or 0,
+            }
+            for node_type, _ in NetworkNode.NODE_TYPES
+        },
+    }
+    summary['utilization_rate'] = (summary['total_inventory'] / summary['total_capacity'] * 100) if summary['total_capacity'] > 0 else 0
+    summary['decisions'] = decisions
+    return summary
+
+
+def filter_decisions(queryset, query_params, use_search_index=None):
+    """Decision list filters: ?agent=, ?type=, ?urgency=, ?status= and full-text ?q="""
+    agent_name = query_params.get('agent', None)
+    if agent_name:
+        queryset = queryset.filter(agent_name=agent_name)
+
+    decision_type = query_params.get('type', None)
+    if decision_type:
+        queryset = queryset.filter(decision_type=decision_type)
+
+    urgency = query_params.get('urgency', None)
+    if urgency:
+        queryset = queryset.filter(urgency=urgency)
+
+    decision_status = query_params.get('status', None)
+    if decision_status:
+        queryset = queryset.filter(status=decision_status.upper())
+
+    # Full-text search over reason, agent name and node codes
+    query = query_params.get('q', None)
+    if query:
+        queryset = search.search_decisions(queryset, query, use_index=use_search_index)
+
+    return queryset
+
+
+def demand_series_rows(query_params):
+    """
+    (bucket, start, end, rows) for a demand series request; rows is a lazy
+    values() queryset. Raises ValueError with a message for the client.
+    """
+    bucket = query_params.get('bucket', 'day').lower()
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(SERIES_BUCKETS)}")
+
+    queryset = Demand.objects.all()
+
+    # ?node=<id>&node=<id> or ?node=<id>,<id>
+    node_ids = [
+        node_id
+        for value in query_params.getlist('node')
+        for node_id in value.split(',') if node_id
+    ]
+    if node_ids:
+        queryset = queryset.filter(node_id__in=node_ids)
+
+    start = query_params.get('start')
+    end = query_params.get('end')
+    try:
+        if start:
+            queryset = queryset.filter(period__gte=parse_date(start))
+        if end:
+            queryset = queryset.filter(period__lte=parse_date(end))
+    except (TypeError, ValueError):
+        raise ValueError('start and end must be dates (YYYY-MM-DD)') from None
+
+    aggregates = {
+        'total': Sum('quantity'),
+        'average': Avg('quantity'),
+        'minimum': Min('quantity'),
+        'maximum': Max('quantity'),
+        'samples': Count('id'),
+    }
+    include_forecast = query_params.get('forecast', '').lower() in ('1', 'true', 'yes')
+    if include_forecast:
+        aggregates['forecast_total'] = Sum('forecast_quantity')
+        aggregates['forecast_average'] = Avg('forecast_quantity')
+
+    rows = (queryset
+            .annotate(bucket=SERIES_BUCKETS[bucket]('period'))
+            .values('node_id', 'node__code', 'bucket')
+            .annotate(**aggregates)
+            .order_by('node__code', 'bucket'))
+    return bucket, start, end, rows
+
+
+def demand_series(bucket, start, end, rows):
+    """Demand series payload from the fetched rows of demand_series_rows"""
+    series = {}
+    for row in rows:
+        node_series = series.setdefault(row.pop('node__code'), {
+            'node_id': row['node_id'],
+            'points': []
+        })
+        row.pop('node_id')
+        row['period'] = row.pop('bucket')
+        node_series['points'].append(row)
+
+    return {
+        'bucket': bucket,
+        'start': start,
+        'end': end,
+        'series': series
+    }
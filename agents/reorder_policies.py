@@ -0,0 +1,182 @@
+"""
+Statistical reorder policies.
+
+Each node's ``ReorderPolicy`` holds the mean and standard deviation of its
+demand per period (one ``Demand`` row per cycle) and the thresholds derived
+from them for REORDER_SERVICE_LEVEL:
+
+    safety stock  = z * std * sqrt(lead time)
+    reorder point = mean * lead time + safety stock
+    order-up-to   = reorder point + mean * REORDER_REVIEW_PERIODS
+
+``refresh_policies`` runs in the background (beat task and management
+command), not in the cycle. It reads only Demand rows newer than the last
+refresh (a range on the timestamp index) and the older history of nodes
+that have no policy yet (by node), as per-node GROUP BYs. It adds those
+counts and sums to the stored running sums and recomputes every touched
+node's thresholds in one NumPy pass. The cycle only loads the stored
+thresholds (``current_policies``), and the inventory agent compares
+against them.
+"""
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from .models import Demand, NetworkNode, ReorderPolicy
+from . import replan
+
+BATCH_SIZE = 1000
+
+# Demand rows stamped this close to now may belong to a transaction that has not committed yet
+WATERMARK_LAG = timedelta(seconds=2)
+
+STAT_FIELDS = [
+    'observations', 'demand_sum', 'demand_sum_sq', 'demand_through', 'demand_mean', 'demand_std',
+    'safety_stock', 'reorder_point', 'order_up_to', 'updated_at',
+]
+
+_policies = None
+_version = None
+
+
+def thresholds(mean, std, lead_time):
+    """(safety stock, reorder point, order-up-to) integer arrays for the configured service level"""
+    z = NormalDist().inv_cdf(settings.REORDER_SERVICE_LEVEL)
+    safety = np.maximum(z * std * np.sqrt(lead_time), 0)
+    reorder_point = mean * lead_time + safety
+    order_up_to = reorder_point + mean * settings.REORDER_REVIEW_PERIODS
+    return tuple(np.ceil(a).astype(np.int64) for a in (safety, reorder_point, order_up_to))
+
+
+def apply_thresholds(policy):
+    """Recompute one policy's thresholds from its stored statistics (e.g. after a lead time edit)"""
+    lead_time = policy.lead_time_periods or settings.REORDER_LEAD_TIME_PERIODS
+    safety, reorder_point, order_up_to = thresholds(
+        np.array([policy.demand_mean]), np.array([policy.demand_std]), np.array([lead_time])
+    )
+    policy.safety_stock = int(safety[0])
+    policy.reorder_point = int(reorder_point[0])
+    policy.order_up_to = int(order_up_to[0])
+
+
+def refresh_policies(full=False):
+    """Fold Demand rows since the last refresh into the policies; returns the number of nodes updated"""
+    upto = timezone.now() - WATERMARK_LAG
+    since = None if full else ReorderPolicy.objects.aggregate(through=Max('demand_through'))['through']
+    if since is None:
+        parts = [Demand.objects.filter(timestamp__lte=upto)]
+    else:
+        # Disjoint: every node's new rows, and the earlier history of nodes seen for the first time
+        parts = [
+            Demand.objects.filter(timestamp__gt=since, timestamp__lte=upto),
+            Demand.objects.filter(node__in=NetworkNode.objects.filter(reorder_policy__isnull=True),
+                                  timestamp__lte=since),
+        ]
+    rows = []
+    for part in parts:
+        rows.extend(part
+                    .order_by()
+                    .values_list('node_id')
+                    .annotate(count=Count('*'), total=Sum('quantity'),
+                              total_sq=Sum(F('quantity') * F('quantity'))))
+    if not rows:
+        return 0
+
+    node_ids, inverse = np.unique(np.array([row[0] for row in rows], dtype=object), return_inverse=True)
+    node_ids = node_ids.tolist()
+    count, total, total_sq = (
+        np.bincount(inverse, weights=[row[k] for row in rows], minlength=len(node_ids))
+        for k in (1, 2, 3)
+    )
+    lead_time = np.full(len(node_ids), settings.REORDER_LEAD_TIME_PERIODS, dtype=np.float64)
+
+    with transaction.atomic():
+        position = {node_id: i for i, node_id in enumerate(node_ids)}
+        for start in range(0, len(node_ids), BATCH_SIZE):
+            stored = ReorderPolicy.objects.filter(pk__in=node_ids[start:start + BATCH_SIZE]).values_list(
+                'node_id', 'observations', 'demand_sum', 'demand_sum_sq', 'lead_time_periods'
+            )
+            for node_id, observations, demand_sum, demand_sum_sq, lead in stored:
+                i = position[node_id]
+                if not full:
+                    count[i] += observations
+                    total[i] += demand_sum
+                    total_sq[i] += demand_sum_sq
+                if lead:
+                    lead_time[i] = lead
+
+        mean = total / count
+        variance = np.where(count > 1, (total_sq - total * mean) / np.maximum(count - 1, 1), 0.0)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        safety, reorder_point, order_up_to = thresholds(mean, std, lead_time)
+
+        node_field = ReorderPolicy._meta.get_field('node')
+        through = ReorderPolicy._meta.get_field('demand_through').get_db_prep_value(upto, connection)
+        now = ReorderPolicy._meta.get_field('updated_at').get_db_prep_value(timezone.now(), connection)
+        _upsert([
+            (node_field.get_db_prep_value(node_id, connection), int(count[i]), float(total[i]),
+             float(total_sq[i]), through, float(mean[i]), float(std[i]), int(safety[i]),
+             int(reorder_point[i]), int(order_up_to[i]), now)
+            for i, node_id in enumerate(node_ids)
+        ])
+
+    return len(node_ids)
+
+
+def _upsert(rows):
+    """
+    Insert or update policy rows (node_id followed by STAT_FIELDS) with one
+    executemany; bulk_create's per-field preparation took most of a
+    20k-node refresh
+    """
+    quote = connection.ops.quote_name
+    columns = ['node_id'] + STAT_FIELDS
+    sql = (
+        f"INSERT INTO {quote(ReorderPolicy._meta.db_table)} ({', '.join(map(quote, columns))}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({quote('node_id')}) DO UPDATE SET "
+        + ', '.join(f'{quote(c)} = excluded.{quote(c)}' for c in STAT_FIELDS)
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def policies_version():
+    stats = ReorderPolicy.objects.aggregate(count=Count('node'), updated=Max('updated_at'))
+    return stats['count'], stats['updated']
+
+
+def current_policies():
+    """{node id: thresholds} for nodes with enough history, reloaded only when policies change"""
+    global _policies, _version
+    version = policies_version()
+    if version == _version:
+        return _policies
+
+    rows = (ReorderPolicy.objects
+            .filter(observations__gte=settings.REORDER_POLICY_MIN_PERIODS)
+            .values_list('node_id', 'safety_stock', 'reorder_point', 'order_up_to',
+                         'demand_mean', 'demand_std'))
+    policies = {
+        str(node_id): {
+            'safety_stock': safety,
+            'reorder_point': reorder_point,
+            'order_up_to': order_up_to,
+            'demand_mean': demand_mean,
+            'demand_std': demand_std,
+        }
+        for node_id, safety, reorder_point, order_up_to, demand_mean, demand_std
+        in rows.iterator(chunk_size=BATCH_SIZE)
+    }
+
+    # Cached evaluations were made against the old thresholds
+    if _version is not None:
+        replan.invalidate()
+    _policies, _version = policies, version
+    return _policies
@@ -0,0 +1,68 @@
+"""
+Incremental re-planning state.
+
+The coordinator's per-node evaluations from the last cycle are kept in
+process (``PlanCache``) together with the node rows they were computed from.
+The next cycle reloads only nodes whose ``updated_at`` moved past the
+cache's watermark, plus nodes it was told about explicitly, and asks the
+coordinator to re-plan just those.
+
+Every inventory and capacity writer already bumps ``NetworkNode.updated_at``
+(``save()``, the ledger's bulk updates, the topology upsert), so the column
+is the dirty set. Demand changes are known to the cycle that generates them,
+and nodes a deadline cut off are carried over in ``PlanCache.pending``.
+
+The cache belongs to the cycle that built it: it is only used when the
+latest successful ``CycleRun`` is the one that stored it, so a cycle run by
+another worker simply causes a full re-plan.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import NetworkNode, CycleRun
+
+_cache = None
+
+
+class PlanCache:
+    """Node rows, demand and coordinator evaluations as of one cycle"""
+
+    def __init__(self, run_id, as_of, nodes, demands, evaluations, pending=()):
+        self.run_id = run_id
+        self.as_of = as_of
+        self.nodes = nodes              # {node id: agent node dict}
+        self.demands = demands          # {node id: quantity}
+        self.evaluations = evaluations  # CoordinatorAgent results['evaluations']
+        self.pending = set(pending)     # nodes the last cycle did not finish
+
+
+def get_cache():
+    """The cache if it still describes the latest completed cycle, else None"""
+    if _cache is None:
+        return None
+
+    latest = (CycleRun.objects
+              .filter(status='SUCCEEDED')
+              .order_by('-started_at')
+              .values_list('id', flat=True)
+              .first())
+    return _cache if latest == _cache.run_id else None
+
+
+def store_cache(cache):
+    global _cache
+    _cache = cache
+
+
+def invalidate():
+    store_cache(None)
+
+
+def changed_nodes(cache):
+    """Node rows touched since the cache's watermark, including now-inactive ones"""
+    # Writers stamp updated_at before they commit, so look back a little
+    # to catch transactions that were still open when the watermark was taken
+    since = cache.as_of - timedelta(seconds=getattr(settings, 'REPLAN_WATERMARK_OVERLAP', 2))
+    return NetworkNode.objects.filter(Q(updated_at__gte=since) | Q(pk__in=list(cache.pending)))
@@ -0,0 +1 @@
+websocket_urlpatterns = []
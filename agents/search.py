@@ -0,0 +1,187 @@
+"""
+Decision full-text search.
+
+On SQLite the ``agent_decision_search`` FTS5 table (migration 0009) indexes
+each decision's reason, agent name and node codes, and triggers keep it in
+step with every insert, update and delete. Queries go through the index when
+it exists and fall back to ``icontains`` (``LIKE '%...%'``) otherwise.
+
+The triggers only read the table they are defined on and the search tables:
+node codes are mirrored in ``agent_decision_search_nodes`` and each doc row
+carries its decision's node ids (migration 0017). So SQLite can rebuild
+``agent_decisions`` or ``network_nodes`` for an ALTER; the rebuild drops that
+table's triggers, and ``restore_triggers`` (post_migrate) reinstalls any
+that are missing and re-indexes.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'agent_decision_search'
+DOCS_TABLE = 'agent_decision_search_docs'
+NODES_TABLE = 'agent_decision_search_nodes'
+
+# Current trigger definitions (migration 0017), reinstalled by restore_triggers
+TRIGGERS = {
+    'agent_decision_search_insert': """
+        CREATE TRIGGER agent_decision_search_insert AFTER INSERT ON agent_decisions BEGIN
+            INSERT INTO agent_decision_search_docs (decision_id, source_node_id, destination_node_id)
+            VALUES (new.id, new.source_node_id, new.destination_node_id);
+            INSERT INTO agent_decision_search (rowid, reason, agent_name, source_code, destination_code)
+            VALUES (
+                (SELECT doc FROM agent_decision_search_docs WHERE decision_id = new.id),
+                new.reason,
+                new.agent_name,
+                (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.source_node_id),
+                (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.destination_node_id)
+            );
+        END
+    """,
+    'agent_decision_search_update': """
+        CREATE TRIGGER agent_decision_search_update
+        AFTER UPDATE OF reason, agent_name, source_node_id, destination_node_id ON agent_decisions BEGIN
+            UPDATE agent_decision_search_docs SET
+                source_node_id = new.source_node_id,
+                destination_node_id = new.destination_node_id
+            WHERE decision_id = old.id;
+            UPDATE agent_decision_search SET
+                reason = new.reason,
+                agent_name = new.agent_name,
+                source_code = (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.source_node_id),
+                destination_code = (SELECT code FROM agent_decision_search_nodes WHERE node_id = new.destination_node_id)
+            WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+        END
+    """,
+    'agent_decision_search_delete': """
+        CREATE TRIGGER agent_decision_search_delete AFTER DELETE ON agent_decisions BEGIN
+            DELETE FROM agent_decision_search
+            WHERE rowid = (SELECT doc FROM agent_decision_search_docs WHERE decision_id = old.id);
+            DELETE FROM agent_decision_search_docs WHERE decision_id = old.id;
+        END
+    """,
+    'agent_decision_search_node_insert': """
+        CREATE TRIGGER agent_decision_search_node_insert AFTER INSERT ON network_nodes BEGIN
+            INSERT OR REPLACE INTO agent_decision_search_nodes (node_id, code) VALUES (new.id, new.code);
+        END
+    """,
+    'agent_decision_search_node_code': """
+        CREATE TRIGGER agent_decision_search_node_code AFTER UPDATE OF code ON network_nodes BEGIN
+            UPDATE agent_decision_search_nodes SET code = new.code WHERE node_id = new.id;
+            UPDATE agent_decision_search SET source_code = new.code
+            WHERE rowid IN (SELECT doc FROM agent_decision_search_docs WHERE source_node_id = new.id);
+            UPDATE agent_decision_search SET destination_code = new.code
+            WHERE rowid IN (SELECT doc FROM agent_decision_search_docs WHERE destination_node_id = new.id);
+        END
+    """,
+    'agent_decision_search_node_delete': """
+        CREATE TRIGGER agent_decision_search_node_delete AFTER DELETE ON network_nodes BEGIN
+            DELETE FROM agent_decision_search_nodes WHERE node_id = old.id;
+        END
+    """,
+}
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+_index_available = None
+
+# Fields the LIKE fallback scans, mirroring what the index covers
+LIKE_FIELDS = ['reason', 'agent_name', 'source_node__code', 'destination_node__code']
+
+
+def terms(query):
+    """Words of a free-text query; punctuation separates terms as in the index"""
+    return TERM_RE.findall(query or '')
+
+
+def match_expression(query):
+    """FTS5 MATCH string: every term, as a quoted prefix, must appear"""
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def index_available():
+    """True when the FTS5 index exists on the default database (checked once per process)"""
+    global _index_available
+    if _index_available is None:
+        _index_available = (
+            connection.vendor == 'sqlite' and
+            SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _index_available
+
+
+def like_filter(queryset, query):
+    """LIKE fallback: every term must appear in one of LIKE_FIELDS"""
+    for term in terms(query):
+        condition = Q()
+        for field in LIKE_FIELDS:
+            condition |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def search_decisions(queryset, query, use_index=None):
+    """Filter a decision queryset to those matching a free-text query"""
+    if not terms(query):
+        return queryset
+    if use_index is None:
+        use_index = index_available()
+    if not use_index:
+        return like_filter(queryset, query)
+
+    matches = RawSQL(
+        f'SELECT docs.decision_id FROM {SEARCH_TABLE} '
+        f'JOIN {DOCS_TABLE} docs ON docs.doc = {SEARCH_TABLE}.rowid '
+        f'WHERE {SEARCH_TABLE} MATCH %s',
+        [match_expression(query)]
+    )
+    return queryset.filter(id__in=matches)
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Re-index every decision, e.g. after restoring rows with triggers disabled"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(f'DELETE FROM {DOCS_TABLE}')
+        cursor.execute(f'DELETE FROM {NODES_TABLE}')
+        cursor.execute(f'INSERT INTO {NODES_TABLE} (node_id, code) SELECT id, code FROM network_nodes')
+        cursor.execute(
+            f'INSERT INTO {DOCS_TABLE} (decision_id, source_node_id, destination_node_id) '
+            f'SELECT id, source_node_id, destination_node_id FROM agent_decisions'
+        )
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, reason, agent_name, source_code, destination_code) '
+            f'SELECT s.doc, d.reason, d.agent_name, src.code, dst.code '
+            f'FROM {DOCS_TABLE} s '
+            f'JOIN agent_decisions d ON d.id = s.decision_id '
+            f'LEFT JOIN {NODES_TABLE} src ON src.node_id = s.source_node_id '
+            f'LEFT JOIN {NODES_TABLE} dst ON dst.node_id = s.destination_node_id'
+        )
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+def restore_triggers(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate: reinstall search triggers dropped by table rebuilds, then re-index"""
+    global _index_available
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    # Migrations may have created or dropped the index in this process
+    if using == DEFAULT_DB_ALIAS:
+        _index_available = None
+    # Before migration 0017 the triggers are 0009's, which this cannot restore
+    if NODES_TABLE not in db.introspection.table_names():
+        return
+
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [SEARCH_TABLE + '_%']
+        )
+        missing = set(TRIGGERS) - {name for name, in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(TRIGGERS[name])
+    if missing:
+        # Writes made while the triggers were gone were not indexed
+        rebuild(using)
@@ -1,12 +1,14 @@
 from rest_framework import serializers
 from .models import NetworkNode, Demand, AgentDecision
+from .fieldsets import SparseFieldsMixin
 
-class NetworkNodeSerializer(serializers.ModelSerializer):
+class NetworkNodeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     inventory_ratio = serializers.SerializerMethodField()
     
     class Meta:
         model = NetworkNode
         fields = '__all__'
+        sparse_sources = {'inventory_ratio': ['current_inventory', 'inventory_capacity']}
     
     def get_inventory_ratio(self, obj):
         if obj.inventory_capacity > 0:
@@ -14,13 +16,13 @@ class NetworkNodeSerializer(serializers.ModelSerializer):
         return 0
 
 
-class DemandSerializer(serializers.ModelSerializer):
+class DemandSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Demand
         fields = '__all__'
 
 
-class AgentDecisionSerializer(serializers.ModelSerializer):
+class AgentDecisionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     source_node_name = serializers.CharField(source='source_node.name', read_only=True)
     destination_node_name = serializers.CharField(source='destination_node.name', read_only=True)
     source_node_code = serializers.CharField(source='source_node.code', read_only=True)
@@ -0,0 +1,129 @@
+"""
+Node x SKU inventory matrix.
+
+Each node keeps its per-SKU on-hand and capacity as one packed int32 vector
+(``NodeSkuInventory``) indexed by ``Sku.position``, so loading the whole
+network is one row per node instead of one row per node and SKU.
+``load_state`` reads it back as the arrays
+``CoordinatorAgent.plan_sku_matrix`` plans over.
+"""
+import numpy as np
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import NetworkNode, NodeSkuInventory, Sku
+
+VECTOR_DTYPE = np.dtype('<i4')
+BATCH_SIZE = 500
+
+
+def pack(vector):
+    """Serialize a SKU vector for storage"""
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack(data, n_skus):
+    """Deserialize a stored vector, zero-padding SKUs added since it was written"""
+    vector = np.zeros(n_skus, dtype=np.int32)
+    stored = np.frombuffer(bytes(data or b''), dtype=VECTOR_DTYPE)[:n_skus]
+    vector[:stored.size] = stored
+    return vector
+
+
+def next_position():
+    """First unused matrix column"""
+    last = Sku.objects.aggregate(last=Max('position'))['last']
+    return 0 if last is None else last + 1
+
+
+@transaction.atomic
+def register_skus(codes):
+    """Create missing SKUs at the next free positions; returns {code: position}"""
+    positions = dict(Sku.objects.filter(code__in=codes).values_list('code', 'position'))
+    position = next_position()
+
+    new = []
+    for code in codes:
+        if code not in positions:
+            positions[code] = position
+            new.append(Sku(code=code, position=position))
+            position += 1
+
+    Sku.objects.bulk_create(new, batch_size=BATCH_SIZE)
+    return positions
+
+
+def load_matrix(node_ids=None):
+    """Load (node_ids, sku_codes, on_hand, capacity) for the given or all nodes"""
+    sku_codes = list(Sku.objects.order_by('position').values_list('code', flat=True))
+    if node_ids is None:
+        node_ids = list(NetworkNode.objects.order_by('id').values_list('id', flat=True))
+    node_ids = list(node_ids)
+
+    n_skus = len(sku_codes)
+    row = {node_id: i for i, node_id in enumerate(node_ids)}
+    on_hand = np.zeros((len(node_ids), n_skus), dtype=np.int32)
+    capacity = np.zeros((len(node_ids), n_skus), dtype=np.int32)
+
+    rows = NodeSkuInventory.objects.filter(node_id__in=node_ids).values_list(
+        'node_id', 'on_hand', 'capacity'
+    )
+    for node_id, node_on_hand, node_capacity in rows.iterator(chunk_size=BATCH_SIZE):
+        on_hand[row[node_id]] = unpack(node_on_hand, n_skus)
+        capacity[row[node_id]] = unpack(node_capacity, n_skus)
+
+    return node_ids, sku_codes, on_hand, capacity
+
+
+def load_state(node_ids=None):
+    """
+    load_matrix plus the node columns CoordinatorAgent.plan_sku_matrix
+    reads; returns (node_ids, sku_codes, state), state lacking only history
+    """
+    node_ids, sku_codes, on_hand, capacity = load_matrix(node_ids)
+
+    row = {node_id: i for i, node_id in enumerate(node_ids)}
+    latitude = np.zeros(len(node_ids))
+    longitude = np.zeros(len(node_ids))
+    active = np.zeros(len(node_ids), dtype=bool)
+    node_types = [None] * len(node_ids)
+    nodes = NetworkNode.objects.filter(pk__in=node_ids).values_list(
+        'pk', 'latitude', 'longitude', 'is_active', 'node_type'
+    )
+    for pk, lat, lon, is_active, node_type in nodes.iterator(chunk_size=BATCH_SIZE):
+        i = row[pk]
+        latitude[i], longitude[i], active[i], node_types[i] = lat, lon, is_active, node_type
+
+    return node_ids, sku_codes, {
+        'on_hand': on_hand,
+        'capacity': capacity,
+        'latitude': latitude,
+        'longitude': longitude,
+        'active': active,
+        'node_types': node_types,
+    }
+
+
+@transaction.atomic
+def save_matrix(node_ids, on_hand, capacity=None):
+    """Write per-node SKU vectors, creating rows for nodes that have none"""
+    node_ids = list(node_ids)
+    existing = set(
+        NodeSkuInventory.objects.filter(node_id__in=node_ids).values_list('node_id', flat=True)
+    )
+
+    now = timezone.now()
+    new, changed = [], []
+    for i, node_id in enumerate(node_ids):
+        item = NodeSkuInventory(node_id=node_id, on_hand=pack(on_hand[i]), updated_at=now)
+        if capacity is not None:
+            item.capacity = pack(capacity[i])
+        (changed if node_id in existing else new).append(item)
+
+    # bulk_update skips auto_now, so updated_at is set explicitly above
+    fields = ['on_hand', 'capacity', 'updated_at'] if capacity is not None else ['on_hand', 'updated_at']
+    NodeSkuInventory.objects.bulk_create(new, batch_size=BATCH_SIZE)
+    NodeSkuInventory.objects.bulk_update(changed, fields, batch_size=BATCH_SIZE)
+    return len(new), len(changed)
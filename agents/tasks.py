@@ -0,0 +1,47 @@
+import logging
+
+from celery import shared_task
+
+from . import cycle, ledger, reorder_policies
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_agent_cycle():
+    """Scheduled agent cycle; skips the tick if the previous one is still running"""
+    try:
+        outcome = cycle.run_cycle()
+    except cycle.CycleBusy:
+        logger.info("Skipping scheduled agent cycle: previous cycle still running")
+        return {'status': 'skipped', 'reason': 'busy'}
+    except cycle.NoActiveNodes:
+        return {'status': 'skipped', 'reason': 'no active nodes'}
+
+    results = outcome['results']
+    return {
+        'status': 'success',
+        'inventory_decisions': len(results.get('inventory_decisions', [])),
+        'transport_decisions': len(results.get('transport_decisions', [])),
+        'service_alerts': len(results.get('service_alerts', [])),
+        'saved_decisions': len(outcome['saved_decisions']),
+        'deadline_exceeded': results.get('deadline_exceeded', False),
+    }
+
+
+@shared_task
+def purge_idempotency_keys():
+    """Periodic removal of expired run_agent_cycle idempotency keys"""
+    return cycle.purge_idempotency_keys()
+
+
+@shared_task
+def snapshot_inventory(min_tail=1):
+    """Periodic per-node inventory snapshots"""
+    return ledger.take_snapshots(min_tail=min_tail)
+
+
+@shared_task
+def refresh_reorder_policies():
+    """Periodic incremental refresh of the statistical reorder policies"""
+    return reorder_policies.refresh_policies()
@@ -1,3 +1,1657 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from importlib import import_module
+from unittest import mock, skipUnless
+from uuid import UUID
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+
+from . import (
+    cycle, decision_stats, engines, exports, geocells, lanes, ledger, reorder_policies, replan, search,
+    sku_matrix, topology
+)
+from .agents import agent_logging, consolidation
+from .agents.base_agent import BaseAgent
+from .agents.coordinator_agent import CoordinatorAgent
+from .agents.history_store import RingBufferStore
+from .agents.inventory_agent import InventoryAgent
+from .agents.stockout_risk import stockout_risk
+from .agents.lane_graph import LaneGraph
+from .agents.transportation_agent import URGENCY_PRIORITY
+from .management.commands.bench_sku_matrix import _scalar_sku
+from .middleware import QueryStatsMiddleware
+from .models import (
+    AgentDecision, CycleLock, CycleRun, DecisionStats, Demand, IdempotencyKey, InventoryMovement,
+    InventorySnapshot, Lane, NetworkNode, ReorderPolicy, ShadowRun
+)
+
+
+@override_settings(FORECAST_HISTORY_PATH=None, PLANNING_SHADOW_ENGINE='')
+class NetworkTestCase(TestCase):
+    """A test case with the sample network imported and no re-planning cache"""
+
+    def setUp(self):
+        replan.invalidate()
+        self.addCleanup(replan.invalidate)
+        topology.import_nodes(topology.SAMPLE_NODES)
+        self.client = APIClient()
+
+    def assertLedgerMatchesBalances(self):
+        """Every node's movements sum to its cached balance"""
+        totals = dict(InventoryMovement.objects.values('node').annotate(total=Sum('quantity'))
+                      .values_list('node', 'total'))
+        self.assertEqual(totals, dict(NetworkNode.objects.values_list('pk', 'current_inventory')))
+
+
+def failing_plan(engine, state, **kwargs):
+    """engines.plan stand-in for a planning engine that reports an error"""
+    return {'error': 'planner exploded'}
+
+
+class LedgerTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.node = NetworkNode.objects.get(code='DC1')
+
+    def move(self, quantity, days_ago, movement_type='DEMAND'):
+        """Apply one movement to DC1 and backdate it"""
+        (applied,) = ledger.apply_movements([ledger.movement(self.node.pk, movement_type, quantity)])
+        InventoryMovement.objects.filter(pk=applied.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return applied
+
+    def test_apply_movements_appends_and_increments(self):
+        applied = ledger.apply_movements([
+            ledger.movement(self.node.pk, 'DEMAND', -40),
+            ledger.movement(self.node.pk, 'TRANSPORT_IN', 15),
+            ledger.movement(self.node.pk, 'DEMAND', 0),
+        ])
+
+        self.assertEqual(len(applied), 2)
+        self.node.refresh_from_db()
+        self.assertEqual(self.node.current_inventory, 5000 - 25)
+        self.assertLedgerMatchesBalances()
+
+    def test_import_opens_the_ledger(self):
+        self.assertLedgerMatchesBalances()
+        self.assertEqual(set(InventoryMovement.objects.values_list('movement_type', flat=True)), {'ADJUSTMENT'})
+
+    def test_adjust_balances_lands_on_target_after_other_movements(self):
+        self.move(-300, days_ago=0)
+
+        applied = ledger.adjust_balances({self.node.pk: 4200}, note='count')
+
+        self.assertEqual([m.quantity for m in applied], [4200 - 4700])
+        self.node.refresh_from_db()
+        self.assertEqual(self.node.current_inventory, 4200)
+        self.assertLedgerMatchesBalances()
+
+    def test_adjust_balances_to_current_balance_records_nothing(self):
+        before = InventoryMovement.objects.count()
+
+        self.assertEqual(ledger.adjust_balances({self.node.pk: 5000}), [])
+        self.assertEqual(InventoryMovement.objects.count(), before)
+
+    def test_take_snapshots_folds_tails(self):
+        self.assertEqual(ledger.take_snapshots(), NetworkNode.objects.count())
+        self.assertEqual(ledger.take_snapshots(), 0)
+
+        self.move(-10, days_ago=0)
+        self.assertEqual(ledger.take_snapshots(min_tail=2), 0)
+        self.assertEqual(ledger.take_snapshots(), 1)
+
+        latest = InventorySnapshot.objects.filter(node=self.node).order_by('-last_movement_id').first()
+        self.assertEqual(latest.balance, 4990)
+        self.assertEqual(latest.last_movement_id, InventoryMovement.objects.latest('id').id)
+
+    def series_opening(self, days_ago):
+        start = timezone.now() - timedelta(days=days_ago)
+        return ledger.inventory_series(self.node.pk, start=start)['opening_balance']
+
+    def test_series_opening_from_snapshot_before_window(self):
+        InventoryMovement.objects.filter(node=self.node).update(created_at=timezone.now() - timedelta(days=10))
+        self.move(-100, days_ago=5)
+        ledger.take_snapshots([self.node.pk])
+        InventorySnapshot.objects.update(taken_at=timezone.now() - timedelta(days=4))
+        self.move(-50, days_ago=2)
+
+        self.assertEqual(self.series_opening(days_ago=3), 4900)
+        self.assertEqual(self.series_opening(days_ago=1), 4850)
+
+    def test_series_opening_from_snapshot_after_window(self):
+        InventoryMovement.objects.filter(node=self.node).update(created_at=timezone.now() - timedelta(days=10))
+        self.move(-100, days_ago=5)
+        ledger.take_snapshots([self.node.pk])
+        self.move(-50, days_ago=0)
+
+        self.assertEqual(self.series_opening(days_ago=7), 5000)
+        self.assertEqual(self.series_opening(days_ago=20), 0)
+
+    def test_series_opening_without_snapshots(self):
+        InventoryMovement.objects.filter(node=self.node).update(created_at=timezone.now() - timedelta(days=10))
+        self.move(-100, days_ago=5)
+
+        self.assertEqual(self.series_opening(days_ago=7), 5000)
+        self.assertEqual(self.series_opening(days_ago=3), 4900)
+
+    def test_migrated_opening_snapshot_is_backdated(self):
+        # 0003 folded pre-ledger balances into position-0 snapshots
+        InventoryMovement.objects.all().delete()
+        InventorySnapshot.objects.create(node=self.node, balance=5000, last_movement_id=0)
+        self.move(-100, days_ago=0)
+
+        backdate = import_module('agents.migrations.0018_backdate_opening_snapshots').backdate_opening_snapshots
+        backdate(apps, None)
+
+        self.assertEqual(InventorySnapshot.objects.get().taken_at, self.node.created_at)
+        self.assertEqual(self.series_opening(days_ago=1), 5000)
+
+
+class TopologyImportTests(NetworkTestCase):
+
+    def test_openings_are_booked_as_adjustments(self):
+        openings = InventoryMovement.objects.filter(node__code='DC1')
+
+        self.assertEqual(list(openings.values_list('movement_type', 'quantity', 'note')),
+                         [('ADJUSTMENT', 5000, 'opening balance')])
+        self.assertLedgerMatchesBalances()
+
+    def test_reimport_is_idempotent(self):
+        pks = dict(NetworkNode.objects.values_list('code', 'pk'))
+        movements = InventoryMovement.objects.count()
+
+        report = topology.import_nodes(topology.SAMPLE_NODES)
+
+        self.assertEqual((report['created'], report['updated'], report['failed']), (0, 7, 0))
+        self.assertEqual(dict(NetworkNode.objects.values_list('code', 'pk')), pks)
+        self.assertEqual(InventoryMovement.objects.count(), movements)
+        self.assertLedgerMatchesBalances()
+
+    def test_reimport_updates_fields_by_code(self):
+        rows = [dict(row) for row in topology.SAMPLE_NODES]
+        rows[0].update(name='Distribution Center East', inventory_capacity=12000, current_inventory=6500,
+                       latitude=40.0, longitude=-75.0)
+        del rows[1]['current_inventory']
+        rows.append({'code': 'STORE4', 'name': 'Store 4', 'node_type': 'store', 'latitude': 39.7392,
+                     'longitude': -104.9903, 'inventory_capacity': 2000, 'current_inventory': 300})
+
+        report = topology.import_nodes(rows)
+
+        self.assertEqual((report['created'], report['updated']), (1, 7))
+        self.assertEqual(NetworkNode.objects.count(), 8)
+        dc1 = NetworkNode.objects.get(code='DC1')
+        self.assertEqual((dc1.name, dc1.inventory_capacity, dc1.current_inventory),
+                         ('Distribution Center East', 12000, 6500))
+        self.assertEqual(dc1.geo_cell, geocells.cell_for(40.0, -75.0))
+        self.assertEqual(NetworkNode.objects.get(code='DC2').current_inventory, 4500)
+        self.assertEqual(list(InventoryMovement.objects.filter(node=dc1, note='topology import')
+                              .values_list('movement_type', 'quantity')), [('ADJUSTMENT', 1500)])
+        self.assertEqual(list(InventoryMovement.objects.filter(node__code='STORE4')
+                              .values_list('movement_type', 'quantity', 'note')),
+                         [('ADJUSTMENT', 300, 'opening balance')])
+        self.assertLedgerMatchesBalances()
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        report = topology.import_nodes([
+            {'code': 'BAD1', 'name': 'Bad', 'node_type': 'PORT', 'latitude': 0, 'longitude': 0,
+             'inventory_capacity': 10},
+            {'code': 'BAD2', 'name': 'Bad', 'node_type': 'DC', 'latitude': 0, 'longitude': 0,
+             'inventory_capacity': 10, 'current_inventory': 20},
+        ])
+
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual([e['code'] for e in report['errors']], ['BAD1', 'BAD2'])
+        self.assertFalse(NetworkNode.objects.filter(code__startswith='BAD').exists())
+
+    def test_csv_upload_dry_run_writes_nothing(self):
+        upload = SimpleUploadedFile('nodes.csv', (
+            b'code,name,node_type,latitude,longitude,inventory_capacity,current_inventory\n'
+            b'DC1,Renamed,DC,40.7128,-74.0060,10000,100\n'
+            b'STORE9,Store 9,STORE,39.0,-94.5,2000,50\n'
+        ))
+        movements = InventoryMovement.objects.count()
+
+        response = self.client.post('/api/nodes/import_nodes/?dry_run=1', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(NetworkNode.objects.get(code='DC1').name, 'Distribution Center 1')
+        self.assertFalse(NetworkNode.objects.filter(code='STORE9').exists())
+        self.assertEqual(InventoryMovement.objects.count(), movements)
+
+
+class MapClusterTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(8)
+        nodes = []
+        for i in range(1500):
+            # A third of the nodes either side of the antimeridian
+            if i % 3:
+                latitude, longitude = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            else:
+                latitude, longitude = rng.uniform(-50, 0), rng.choice([-1, 1]) * rng.uniform(165, 180)
+            nodes.append(NetworkNode(
+                name=f'Node {i}', code=f'N{i}', node_type='STORE', latitude=latitude, longitude=longitude,
+                geo_cell=geocells.cell_for(latitude, longitude), inventory_capacity=1000,
+                current_inventory=rng.randint(0, 1000), is_active=i % 10 != 0,
+            ))
+        self.nodes = NetworkNode.objects.bulk_create(nodes)
+
+    BOXES = [
+        ((-180, -90, 180, 90), 2),
+        ((-125, 24, -66, 49), 5),
+        ((-100, -60, -99, 70), 6),
+        ((-1, -60, 1, 70), 8),
+        ((170, -50, -170, -30), 6),
+        ((179.5, -45, -179.5, -10), 9),
+    ]
+
+    @staticmethod
+    def in_box(node, bbox):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        in_lon = (min_lon <= node.longitude <= max_lon if min_lon <= max_lon
+                  else node.longitude >= min_lon or node.longitude <= max_lon)
+        return in_lon and min_lat <= node.latitude <= max_lat
+
+    def test_cluster_counts_match_brute_force(self):
+        for bbox, zoom in self.BOXES:
+            with self.subTest(bbox=bbox):
+                result = geocells.clusters(NetworkNode.objects.filter(is_active=True), bbox, zoom)
+
+                shift = 2 * (geocells.MAX_LEVEL - result['level'])
+                expected = Counter(node.geo_cell >> shift for node in self.nodes
+                                   if node.is_active and self.in_box(node, bbox))
+                self.assertTrue(expected)
+                self.assertEqual({c['cell']: c['count'] for c in result['cells']}, expected)
+
+    def test_ranges_cover_the_box_and_little_else(self):
+        for bbox, zoom in self.BOXES[1:4] + [((170, -50, 180, -30), 6)]:
+            with self.subTest(bbox=bbox):
+                ranges = geocells.cell_ranges(bbox, geocells.level_for_zoom(zoom))
+
+                self.assertLessEqual(len(ranges), geocells.MAX_RANGES)
+                for node in self.nodes:
+                    if self.in_box(node, bbox):
+                        self.assertTrue(any(low <= node.geo_cell <= high for low, high in ranges))
+                # A third or less of the index between the box's corner codes
+                covered = sum(high - low + 1 for low, high in ranges)
+                corners = geocells.cell_for(bbox[3], bbox[2]) - geocells.cell_for(bbox[1], bbox[0]) + 1
+                self.assertLess(covered * 3, corners)
+
+    def test_antimeridian_bbox_over_api(self):
+        client = APIClient()
+
+        response = client.get('/api/nodes/map_clusters/', {'bbox': '170,-50,-170,-30', 'zoom': 6})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(c['count'] for c in response.data['cells']),
+                         sum(node.is_active and self.in_box(node, (170, -50, -170, -30)) for node in self.nodes))
+        self.assertEqual(client.get('/api/nodes/map_clusters/', {'bbox': '0,10,5,0'}).status_code, 400)
+
+
+class DemandSeriesTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(2)
+        self.nodes = list(NetworkNode.objects.filter(code__in=['STORE1', 'STORE2']).order_by('code'))
+        first = date(2026, 8, 3)
+        demands = []
+        for node in self.nodes:
+            for day in range(60):
+                demands.append(Demand(node=node, period=first + timedelta(days=day),
+                                      quantity=rng.randint(0, 200), forecast_quantity=rng.randint(0, 200)))
+        self.demands = Demand.objects.bulk_create(demands)
+
+    def expected(self, bucket_of, start=None, end=None, node=None):
+        """{code: [(bucket, total, samples, minimum, maximum, forecast_total)]} computed row by row"""
+        buckets = defaultdict(list)
+        for d in self.demands:
+            if (start and d.period < start) or (end and d.period > end) or (node and d.node_id != node.pk):
+                continue
+            buckets[(d.node.code, bucket_of(d.period))].append(d)
+        series = defaultdict(list)
+        for (code, bucket), rows in sorted(buckets.items()):
+            quantities = [d.quantity for d in rows]
+            series[code].append((bucket.isoformat(), sum(quantities), len(rows), min(quantities),
+                                 max(quantities), sum(d.forecast_quantity for d in rows)))
+        return dict(series)
+
+    def get(self, **params):
+        response = self.client.get('/api/demands/series/', params)
+        self.assertEqual(response.status_code, 200)
+        return {code: [(str(p['period'])[:10], p['total'], p['samples'], p['minimum'], p['maximum'],
+                        p.get('forecast_total')) for p in s['points']]
+                for code, s in response.json()['series'].items()}
+
+    def test_weekly_buckets_match_row_by_row_totals(self):
+        self.assertEqual(self.get(bucket='week', forecast=1),
+                         self.expected(lambda day: day - timedelta(days=day.weekday())))
+
+    def test_monthly_buckets_within_range_for_one_node(self):
+        start, end = date(2026, 8, 20), date(2026, 9, 10)
+        self.assertEqual(
+            self.get(bucket='month', forecast=1, start=start, end=end, node=self.nodes[0].pk),
+            self.expected(lambda day: day.replace(day=1), start, end, self.nodes[0])
+        )
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/demands/series/', {'bucket': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/demands/series/', {'start': '2026-13-01'}).status_code, 400)
+
+
+class ExportTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with override_settings(AGENT_CYCLE_INCREMENTAL=False):
+            cycle.run_cycle()
+        store = NetworkNode.objects.get(code='STORE1')
+        Demand.objects.bulk_create([Demand(node=store, period=date(2026, 9, day), quantity=day * 10)
+                                    for day in range(1, 11)])
+        for day in range(1, 11):
+            Demand.objects.filter(period=date(2026, 9, day)).update(
+                timestamp=timezone.make_aware(datetime(2026, 9, day, 12))
+            )
+
+    def export(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_decisions_csv_has_every_decision(self):
+        response, body = self.export('/api/decisions/export/')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="decisions-\d{8}-\d{6}\.csv"')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(list(rows[0]), [column for column, _ in exports.DECISION_EXPORT_FIELDS])
+        self.assertEqual(Counter(row['id'] for row in rows),
+                         Counter(str(pk) for pk in AgentDecision.objects.values_list('id', flat=True)))
+        decision = AgentDecision.objects.select_related('destination_node').get(id=rows[0]['id'])
+        self.assertEqual(rows[0]['destination_node_code'], decision.destination_node.code)
+        self.assertEqual(rows[0]['reason'], decision.reason)
+
+    def test_decisions_ndjson_has_one_object_per_line(self):
+        response, body = self.export('/api/decisions/export/', output='ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(lines), AgentDecision.objects.count())
+        self.assertEqual({line['id'] for line in lines},
+                         {str(pk) for pk in AgentDecision.objects.values_list('id', flat=True)})
+
+    def test_demand_export_bounds(self):
+        _, body = self.export('/api/demands/export/', output='ndjson', start='2026-09-03', end='2026-09-05')
+
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(line['quantity'] for line in lines), [30, 40, 50])
+        self.assertEqual({line['node_code'] for line in lines}, {'STORE1'})
+
+    def test_invalid_output_and_bounds_are_rejected(self):
+        self.assertEqual(self.client.get('/api/decisions/export/', {'output': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/demands/export/', {'start': 'yesterday'}).status_code, 400)
+
+
+class SkuMatrixTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(4)
+        self.node_ids = list(NetworkNode.objects.order_by('id').values_list('id', flat=True))
+        sku_matrix.register_skus([f'SKU{k}' for k in range(12)])
+        self.capacity = rng.integers(200, 2000, size=(len(self.node_ids), 12), dtype=np.int32)
+        self.on_hand = (self.capacity * rng.uniform(0, 1, size=self.capacity.shape)).astype(np.int32)
+        self.history = rng.poisson(60, size=(5, len(self.node_ids), 12)).astype(np.float32)
+        sku_matrix.save_matrix(self.node_ids, self.on_hand, self.capacity)
+
+    def test_stored_matrix_round_trips(self):
+        node_ids, sku_codes, state = sku_matrix.load_state()
+
+        self.assertEqual(node_ids, self.node_ids)
+        self.assertEqual(sku_codes, [f'SKU{k}' for k in range(12)])
+        np.testing.assert_array_equal(state['on_hand'], self.on_hand)
+        np.testing.assert_array_equal(state['capacity'], self.capacity)
+
+        sku_matrix.register_skus(['SKU12'])
+        _, _, state = sku_matrix.load_state()
+        self.assertEqual(state['on_hand'].shape, (len(self.node_ids), 13))
+        self.assertFalse(state['on_hand'][:, 12].any())
+
+    def test_matrix_plan_matches_per_node_loop(self):
+        _, _, state = sku_matrix.load_state()
+        state['history'] = self.history
+        coordinator = CoordinatorAgent()
+
+        plan = coordinator.plan_sku_matrix(state)
+
+        self.assertGreater(plan['summary']['routed'], 0)
+        for sku in range(12):
+            with self.subTest(sku=sku):
+                decisions = _scalar_sku(coordinator, state, sku)
+                routed = plan['transport']['source'][:, sku]
+                self.assertEqual({int(i): int(routed[i]) for i in np.flatnonzero(routed >= 0)},
+                                 {d['to_node_id']: d['from_node_id'] for d in decisions})
+
+
+class DecisionUpsertTests(NetworkTestCase):
+
+    @override_settings(AGENT_CYCLE_INCREMENTAL=False)
+    def test_repeated_cycles_keep_one_open_decision_per_key(self):
+        for _ in range(3):
+            cycle.run_cycle()
+
+        open_keys = Counter(AgentDecision.objects
+                            .filter(status=AgentDecision.STATUS_OPEN)
+                            .values_list('decision_key', flat=True))
+        self.assertTrue(open_keys)
+        self.assertEqual(max(open_keys.values()), 1)
+
+    @override_settings(AGENT_CYCLE_INCREMENTAL=False)
+    def test_decision_not_reemitted_is_superseded(self):
+        cycle.run_cycle()
+        stale = AgentDecision.objects.create(
+            agent_name='ReorderAgent', decision_type='REORDER', urgency='LOW',
+            destination_node=NetworkNode.objects.first(), decision_key='stale-key',
+        )
+
+        cycle.run_cycle()
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, AgentDecision.STATUS_SUPERSEDED)
+
+
+class IncrementalCycleTests(NetworkTestCase):
+
+    def sampled(self, fraction):
+        """Nodes given new demand on the cycle after a full one"""
+        cycle.run_cycle()
+        with override_settings(SIMULATED_DEMAND_FRACTION=fraction), \
+                mock.patch.object(cycle, 'generate_demands', wraps=cycle.generate_demands) as generate:
+            cycle.run_cycle()
+        (nodes,), _ = generate.call_args
+        return len(nodes)
+
+    def test_only_sampled_nodes_get_new_demand(self):
+        self.assertEqual(self.sampled(0.0), 0)
+        self.assertEqual(self.sampled(1.0), NetworkNode.objects.count())
+
+
+class CycleLockTests(NetworkTestCase):
+
+    def test_lock_is_exclusive_until_released(self):
+        token = cycle.acquire_lock()
+        self.assertIsNotNone(token)
+        self.assertIsNone(cycle.acquire_lock())
+
+        cycle.release_lock(token)
+        self.assertIsNotNone(cycle.acquire_lock())
+
+    def test_expired_lease_is_taken_over(self):
+        token = cycle.acquire_lock(ttl=60)
+        CycleLock.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        taken = cycle.acquire_lock()
+
+        self.assertIsNotNone(taken)
+        self.assertNotEqual(taken, token)
+        self.assertEqual(CycleLock.objects.get().holder, taken)
+
+    def test_cycle_refused_while_lock_held(self):
+        cycle.acquire_lock()
+
+        with self.assertRaises(cycle.CycleBusy):
+            cycle.run_cycle()
+        self.assertFalse(CycleRun.objects.exists())
+
+        response = self.client.post('/api/decisions/run_agent_cycle/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], 'busy')
+
+    def test_lock_released_after_success_and_failure(self):
+        outcome = cycle.run_cycle()
+        self.assertEqual(outcome['run'].status, 'SUCCEEDED')
+        self.assertFalse(CycleLock.objects.exists())
+
+        with mock.patch.object(engines, 'plan', failing_plan):
+            with self.assertRaises(cycle.PlanningFailed):
+                cycle.run_cycle()
+        self.assertFalse(CycleLock.objects.exists())
+        self.assertEqual(CycleRun.objects.filter(status='FAILED').count(), 1)
+
+    def test_lock_released_when_run_cannot_be_recorded(self):
+        with mock.patch.object(CycleRun.objects, 'create', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                cycle.run_cycle()
+        self.assertFalse(CycleLock.objects.exists())
+
+
+class IdempotencyTests(NetworkTestCase):
+
+    def run_cycle(self, key, **kwargs):
+        return self.client.post('/api/decisions/run_agent_cycle/?decisions=none',
+                                HTTP_IDEMPOTENCY_KEY=key, **kwargs)
+
+    def test_key_replays_first_result(self):
+        first = self.run_cycle('order-1')
+        second = self.run_cycle('order-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['cycle_id'], first.json()['cycle_id'])
+        self.assertTrue(second.json()['replayed'])
+        self.assertEqual(second.json()['results'], first.json()['results'])
+        self.assertEqual(CycleRun.objects.count(), 1)
+
+    def test_retry_after_failed_run_runs_new_cycle(self):
+        with mock.patch.object(engines, 'plan', failing_plan):
+            failed = self.run_cycle('order-2')
+        self.assertEqual(failed.status_code, 500)
+        self.assertIn('planner exploded', failed.json()['message'])
+
+        retried = self.run_cycle('order-2')
+
+        self.assertEqual(retried.status_code, 200)
+        self.assertNotEqual(retried.json()['cycle_id'], str(CycleRun.objects.get(status='FAILED').id))
+        self.assertEqual(IdempotencyKey.objects.get(key='order-2').run.status, 'SUCCEEDED')
+
+    def test_waiter_on_failed_run_gets_its_error(self):
+        run = CycleRun.objects.create(status='FAILED', error='planner exploded', finished_at=timezone.now())
+        IdempotencyKey.objects.create(key='order-3', run=run)
+
+        self.assertEqual(cycle.wait_for_idempotency_key('order-3', timeout=1), run)
+
+    def test_key_released_without_run_lets_waiter_claim(self):
+        claimed, _ = cycle.claim_idempotency_key('order-4')
+        self.assertTrue(claimed)
+        self.assertFalse(cycle.claim_idempotency_key('order-4')[0])
+
+        cycle.release_idempotency_key('order-4')
+
+        with self.assertRaises(cycle.IdempotencyKeyReleased):
+            cycle.wait_for_idempotency_key('order-4', timeout=1)
+        self.assertTrue(cycle.claim_idempotency_key('order-4')[0])
+
+    def test_busy_request_releases_its_key(self):
+        cycle.acquire_lock()
+
+        response = self.run_cycle('order-5')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(IdempotencyKey.objects.filter(key='order-5').exists())
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_purge_deletes_expired_keys(self):
+        IdempotencyKey.objects.create(key='old')
+        IdempotencyKey.objects.create(key='new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(cycle.purge_idempotency_keys(), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class DecisionSearchTests(NetworkTestCase):
+
+    def setUp(self):
+        if not search.index_available():
+            self.skipTest('SQLite FTS5 search index not installed')
+        super().setUp()
+        with override_settings(AGENT_CYCLE_INCREMENTAL=False):
+            for _ in range(2):
+                cycle.run_cycle()
+        self.decisions = AgentDecision.objects.all()
+
+    def queries(self):
+        """Whole words and word prefixes, where the index and LIKE agree"""
+        codes = list(NetworkNode.objects.values_list('code', flat=True))
+        agents = set(self.decisions.values_list('agent_name', flat=True))
+        return codes + [code.lower()[:3] for code in codes] + sorted(agents) + [
+            'inventory', 'Optimal route', 'days supply', f'route {codes[0]}', 'nothing-matches-this',
+        ]
+
+    def assertParity(self, queries=None):
+        for query in queries or self.queries():
+            with self.subTest(query=query):
+                indexed = set(search.search_decisions(self.decisions, query, use_index=True).values_list('id', flat=True))
+                scanned = set(search.like_filter(self.decisions, query).values_list('id', flat=True))
+                self.assertEqual(indexed, scanned)
+
+    def test_index_matches_like_search(self):
+        self.assertTrue(AgentDecision.objects.filter(decision_type='TRANSPORT').exists())
+        self.assertParity()
+
+    def test_index_follows_decision_and_node_writes(self):
+        decision = self.decisions.filter(decision_type='TRANSPORT').first()
+        decision.reason = 'Rerouted around flooding'
+        decision.save()
+        self.decisions.filter(decision_type='REORDER').first().delete()
+        node = decision.source_node
+        node.code = 'RENAMED1'
+        node.save()
+
+        self.assertEqual(list(search.search_decisions(self.decisions, 'flooding', use_index=True)), [decision])
+        self.assertParity(self.queries() + ['RENAMED1', 'flooding'])
+
+    def test_rebuild_matches_like_search(self):
+        search.rebuild()
+        self.assertParity()
+
+    def test_restore_triggers_reinstalls_and_reindexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER agent_decision_search_insert')
+            cursor.execute('DROP TRIGGER agent_decision_search_node_code')
+        cycle.run_cycle()
+        NetworkNode.objects.filter(code='WH1').update(code='RENAMED2')
+
+        search.restore_triggers(sender=None)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'agent_decision_search_%'")
+            self.assertEqual({name for name, in cursor.fetchall()}, set(search.TRIGGERS))
+        self.assertParity(self.queries() + ['RENAMED2'])
+
+
+class DecisionStatsTests(NetworkTestCase):
+
+    def counters(self):
+        """Stored counter rows with anything counted, floats rounded"""
+        rows = set()
+        for row in DecisionStats.objects.values_list(*decision_stats.KEY_FIELDS, *decision_stats.COUNTERS):
+            key, counts = row[:4], row[4:]
+            if any(counts):
+                rows.add((str(key[0]), *key[1:], *(round(c, 6) for c in counts)))
+        return rows
+
+    def test_rebuild_matches_incremental_counters(self):
+        with override_settings(AGENT_CYCLE_INCREMENTAL=False):
+            cycle.run_cycle()
+        for _ in range(3):
+            cycle.run_cycle()
+
+        # Decision and node writes through the API
+        transport = AgentDecision.objects.filter(decision_type='TRANSPORT').first()
+        reorder = AgentDecision.objects.filter(decision_type='REORDER', status=AgentDecision.STATUS_OPEN).first()
+        responses = [
+            self.client.patch(f'/api/decisions/{transport.pk}/',
+                              {'urgency': 'CRITICAL', 'estimated_cost': 1234.5}, format='json'),
+            self.client.patch(f'/api/decisions/{reorder.pk}/', {'is_executed': True}, format='json'),
+            self.client.delete(f'/api/decisions/{AgentDecision.objects.exclude(pk=reorder.pk).last().pk}/'),
+            self.client.delete(f'/api/nodes/{transport.source_node_id}/'),
+        ]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 204, 204])
+
+        incremental = self.counters()
+        kpis = decision_stats.network_kpis()
+        self.assertTrue(incremental)
+
+        decision_stats.rebuild()
+
+        self.assertEqual(self.counters(), incremental)
+        self.assertEqual(decision_stats.network_kpis(), kpis)
+        for node_id in NetworkNode.objects.values_list('pk', flat=True)[:3]:
+            with self.subTest(node=node_id):
+                self.assertEqual(decision_stats.node_kpis(node_id)['open'],
+                                 AgentDecision.objects.filter(destination_node_id=node_id,
+                                                              status=AgentDecision.STATUS_OPEN).count())
+
+    def test_node_kpis_read_open_rows_and_the_day(self):
+        node = NetworkNode.objects.get(code='STORE1')
+        today = timezone.localdate()
+        old = today - timedelta(days=30)
+        DecisionStats.objects.bulk_create([
+            DecisionStats(node=node, day=old, decision_type='REORDER', urgency='HIGH', open_count=2),
+            DecisionStats(node=node, day=old, decision_type='TRANSPORT', urgency='LOW',
+                          executed_count=9, superseded_count=4, executed_transport_cost=900),
+            DecisionStats(node=node, day=today, decision_type='REORDER', urgency='HIGH', open_count=1,
+                          executed_count=3),
+            DecisionStats(node=node, day=today, decision_type='TRANSPORT', urgency='LOW', open_count=1,
+                          open_transport_cost=50, executed_count=1, executed_transport_cost=120.5),
+            DecisionStats(node=NetworkNode.objects.get(code='STORE2'), day=today, decision_type='REORDER',
+                          urgency='HIGH', open_count=5, executed_count=5),
+        ])
+
+        with self.assertNumQueries(2):
+            kpis = decision_stats.node_kpis(node.pk)
+
+        self.assertEqual((kpis['open'], kpis['open_by_urgency']['HIGH'], kpis['open_by_type']['REORDER']), (4, 3, 3))
+        self.assertEqual(kpis['open_transport_cost'], 50.0)
+        self.assertEqual((kpis['day'], kpis['executed'], kpis['superseded'], kpis['executed_transport_cost']),
+                         (today.isoformat(), 4, 0, 120.5))
+        self.assertEqual(decision_stats.node_kpis(node.pk, day=old)['executed'], 9)
+
+
+class ReplanTests(SimpleTestCase):
+    """CoordinatorAgent.replan against a full make_decision on the same state"""
+
+    NODE_TYPES = ['STORE', 'DC', 'WAREHOUSE']
+
+    def setUp(self):
+        self.rng = random.Random(5)
+        self.nodes = [{
+            'id': f'n{i}', 'code': f'N{i}', 'name': f'Node {i}',
+            'node_type': self.rng.choice(self.NODE_TYPES),
+            'current_inventory': self.rng.randint(0, 1000), 'inventory_capacity': 1000,
+            'latitude': self.rng.uniform(25, 48), 'longitude': self.rng.uniform(-123, -70),
+            'is_active': True,
+        } for i in range(200)]
+        self.demands = {n['id']: self.rng.randint(10, 200) for n in self.nodes}
+
+    def state(self):
+        # A large consolidation budget so neither plan is cut short
+        return {'nodes': [dict(n) for n in self.nodes], 'demands': dict(self.demands),
+                'consolidation_budget_ms': 10 ** 6}
+
+    @staticmethod
+    def decisions_by_node(results):
+        """Each destination node's decisions, comparable across plans"""
+        by_node = defaultdict(list)
+        for d in results['inventory_decisions']:
+            by_node[d['node_id']].append(('inventory', d['type'], d['quantity']))
+        for t in results['transport_decisions']:
+            by_node[t['to_node_id']].append(('transport', t['from_node_id'], round(t['estimated_cost'], 4),
+                                             t['reason']))
+        for a in results['service_alerts']:
+            by_node[a['node_id']].append(('alert', a['urgency'], a['reason']))
+        return {node_id: sorted(decisions) for node_id, decisions in by_node.items()}
+
+    @staticmethod
+    def routes(results):
+        return sorted((r['source_code'], tuple(r['stops']), round(r['cost'], 4)) for r in results['routes'])
+
+    def test_replan_matches_full_plan(self):
+        previous = CoordinatorAgent().make_decision(self.state())
+        evaluations = previous['evaluations']
+
+        for step in range(8):
+            with self.subTest(step=step):
+                dirty = set(self.rng.sample([n['id'] for n in self.nodes], 15))
+                for node in self.nodes:
+                    if node['id'] in dirty:
+                        node['current_inventory'] = self.rng.randint(0, 1000)
+                        self.demands[node['id']] = self.rng.randint(10, 200)
+                if step == 4:
+                    removed = self.nodes.pop()
+                    del self.demands[removed['id']]
+                    dirty.add(removed['id'])
+
+                full = CoordinatorAgent().make_decision(self.state())
+                incremental = CoordinatorAgent().replan(self.state(), evaluations, dirty)
+
+                self.assertNotIn('error', incremental)
+                self.assertEqual(self.decisions_by_node(incremental), self.decisions_by_node(full))
+                self.assertEqual(self.routes(incremental), self.routes(full))
+                route_ids = [r['route_id'] for r in incremental['routes']]
+                self.assertEqual(len(set(route_ids)), len(route_ids))
+
+                # Nodes left out of the changes kept the previous plan's decisions
+                before, after = self.decisions_by_node(previous), self.decisions_by_node(full)
+                unchanged = {n['id'] for n in self.nodes} - set(incremental['changes']['nodes'])
+                for node_id in unchanged:
+                    self.assertEqual(after.get(node_id), before.get(node_id), node_id)
+
+                previous, evaluations = full, incremental['evaluations']
+
+
+class FakeClock:
+    """time.perf_counter stand-in that moves on a millisecond per call"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 0.001
+        return self.now
+
+
+class DeadlinePlanTests(SimpleTestCase):
+    """The coordinator's anytime plan under deadline_ms"""
+
+    def setUp(self):
+        rng = random.Random(9)
+        self.nodes = [{
+            'id': f'n{i}', 'code': f'N{i}', 'name': f'Node {i}', 'node_type': rng.choice(['STORE', 'DC']),
+            'current_inventory': rng.randint(0, 1000), 'inventory_capacity': 1000,
+            'latitude': rng.uniform(25, 48), 'longitude': rng.uniform(-123, -70), 'is_active': True,
+        } for i in range(200)]
+        self.demands = {n['id']: rng.randint(10, 300) for n in self.nodes}
+
+    def plan(self, deadline_ms=None):
+        state = {'nodes': [dict(n) for n in self.nodes], 'demands': dict(self.demands),
+                 'consolidation_budget_ms': 10 ** 6}
+        with mock.patch('time.perf_counter', FakeClock()):
+            return CoordinatorAgent().make_decision(state, deadline_ms=deadline_ms)
+
+    def test_without_deadline_every_node_is_planned(self):
+        results = self.plan()
+
+        self.assertEqual(results['unprocessed_nodes'], {})
+        self.assertFalse(results['deadline_exceeded'])
+        self.assertEqual(set(results['forecasts']), {n['id'] for n in self.nodes})
+
+    def test_deadline_returns_most_urgent_work_first(self):
+        coordinator = CoordinatorAgent()
+        forecaster = coordinator.agents['demand_forecast'].name
+        transporter = coordinator.agents['transportation'].name
+
+        # Enough fake milliseconds to forecast and route about half the nodes
+        results = self.plan(deadline_ms=300)
+
+        self.assertNotIn('error', results)
+        self.assertTrue(results['deadline_exceeded'])
+        skipped = results['unprocessed_nodes']
+        self.assertTrue(skipped[forecaster])
+        self.assertEqual(set(results['forecasts']) | set(skipped[forecaster]), {n['id'] for n in self.nodes})
+        self.assertFalse(set(results['forecasts']) & set(skipped[forecaster]))
+
+        cover = {n['id']: n['current_inventory'] / self.demands[n['id']] for n in self.nodes}
+        self.assertLessEqual(max(cover[i] for i in results['forecasts']),
+                             min(cover[i] for i in skipped[forecaster]))
+
+        urgency = {d['node_id']: URGENCY_PRIORITY[d['urgency']] for d in results['inventory_decisions']
+                   if d['type'] == 'REORDER'}
+        routed = {t['to_node_id'] for t in results['transport_decisions']}
+        self.assertTrue(routed)
+        self.assertTrue(skipped[transporter])
+        self.assertLessEqual(max(urgency[i] for i in routed), min(urgency[i] for i in skipped[transporter]))
+
+    def test_spent_deadline_still_returns_a_plan(self):
+        results = self.plan(deadline_ms=0.001)
+
+        self.assertNotIn('error', results)
+        self.assertTrue(results['deadline_exceeded'])
+        self.assertEqual(results['forecasts'], {})
+        self.assertEqual(len(results['unprocessed_nodes'][CoordinatorAgent().agents['demand_forecast'].name]),
+                         len(self.nodes))
+
+
+class DeadlineCycleTests(NetworkTestCase):
+
+    def test_invalid_deadline_is_rejected(self):
+        for value in ('0', '-5', 'soon'):
+            with self.subTest(deadline_ms=value):
+                response = self.client.post(f'/api/decisions/run_agent_cycle/?deadline_ms={value}')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(CycleRun.objects.exists())
+
+    def test_cycle_reports_deadline_outcome(self):
+        response = self.client.post('/api/decisions/run_agent_cycle/?deadline_ms=60000&decisions=none')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['results']['deadline_exceeded'])
+        self.assertEqual(response.data['results']['unprocessed_nodes'], {})
+
+
+class SparseFieldsTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with override_settings(AGENT_CYCLE_INCREMENTAL=False):
+            cycle.run_cycle()
+
+    def get(self, path, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [q['sql'] for q in queries.captured_queries]
+
+    @staticmethod
+    def selected_columns(sql):
+        return sql.split(' FROM ')[0]
+
+    def test_decision_fields_reach_the_query(self):
+        data, queries = self.get('/api/decisions/', fields='id,urgency,destination_node_code,bogus')
+
+        self.assertEqual(len(queries), 2)  # count and page
+        self.assertTrue(data['results'])
+        for row in data['results']:
+            self.assertEqual(set(row), {'id', 'urgency', 'destination_node_code'})
+        columns = self.selected_columns(queries[1])
+        self.assertIn('"agent_decisions"."urgency"', columns)
+        self.assertIn('"network_nodes"."code"', columns)
+        self.assertNotIn('"agent_decisions"."reason"', columns)
+        self.assertNotIn('"network_nodes"."name"', columns)
+
+        codes = dict(AgentDecision.objects.values_list('id', 'destination_node__code'))
+        for row in data['results']:
+            self.assertEqual(row['destination_node_code'], codes[UUID(row['id'])])
+
+    def test_omit_drops_fields(self):
+        full, full_queries = self.get('/api/decisions/')
+        data, queries = self.get('/api/decisions/', omit='reason,agent_name')
+
+        self.assertEqual(len(full_queries), len(queries))
+        self.assertEqual(set(full['results'][0]) - set(data['results'][0]), {'reason', 'agent_name'})
+        self.assertNotIn('"agent_decisions"."reason"', self.selected_columns(queries[1]))
+
+    def test_node_method_field_loads_its_sources(self):
+        data, queries = self.get('/api/nodes/', fields='code,inventory_ratio')
+
+        columns = self.selected_columns(queries[-1])
+        self.assertIn('"network_nodes"."current_inventory"', columns)
+        self.assertNotIn('"network_nodes"."name"', columns)
+        nodes = {n.code: n for n in NetworkNode.objects.all()}
+        for row in data['results']:
+            node = nodes[row['code']]
+            self.assertEqual(set(row), {'code', 'inventory_ratio'})
+            self.assertEqual(row['inventory_ratio'], node.current_inventory / node.inventory_capacity)
+
+
+class QueryStatsTests(NetworkTestCase):
+
+    def test_headers_count_the_request_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/nodes/')
+
+        self.assertEqual(int(response['X-DB-Queries']), len(queries))
+        self.assertEqual(int(response['X-DB-Duplicates']), 0)
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="%d queries", app;dur=[\d.]+$' % len(queries))
+
+    async def test_async_views_are_counted(self):
+        response = await AsyncClient().get('/api/async/nodes/')
+
+        self.assertEqual(response.status_code, 200)
+        # A count and a page
+        self.assertEqual(response['X-DB-Queries'], '2')
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    def middleware(self, view):
+        return QueryStatsMiddleware(view)(RequestFactory().get('/api/nodes/'))
+
+    @staticmethod
+    def repeated_lookups(times):
+        def view(request):
+            for node in NetworkNode.objects.all()[:1]:
+                for _ in range(times):
+                    NetworkNode.objects.filter(pk=node.pk).exists()
+            return HttpResponse('ok')
+        return view
+
+    def test_repeated_statement_is_logged(self):
+        with self.assertLogs('agents.requests', 'WARNING') as logs:
+            response = self.middleware(self.repeated_lookups(25))
+
+        self.assertEqual(response['X-DB-Queries'], '26')
+        self.assertEqual(response['X-DB-Duplicates'], '24')
+        self.assertIn('most repeated x25', logs.output[0])
+
+    def test_few_repeats_are_not_logged(self):
+        with self.assertNoLogs('agents.requests', 'WARNING'):
+            response = self.middleware(self.repeated_lookups(3))
+        self.assertEqual(response['X-DB-Duplicates'], '2')
+
+    @override_settings(QUERY_STATS_ENABLED=False)
+    def test_disabled_adds_no_headers(self):
+        response = self.middleware(self.repeated_lookups(25))
+
+        self.assertFalse(response.has_header('X-DB-Queries'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class AsyncReadTests(NetworkTestCase):
+    """The /api/async/ read endpoints return the REST endpoints' bytes"""
+
+    def setUp(self):
+        super().setUp()
+        # Small pages, so a few cycles' decisions span several
+        patcher = mock.patch.object(PageNumberPagination, 'page_size', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for _ in range(3):
+            cycle.run_cycle()
+        self.client = Client()
+
+    def assertSameResponse(self, path):
+        rest = self.client.get('/api/' + path, HTTP_ACCEPT='application/json')
+        asynchronous = self.client.get('/api/async/' + path, HTTP_ACCEPT='application/json')
+        self.assertEqual(asynchronous.status_code, rest.status_code)
+        # Page links point back at the endpoint that served them
+        self.assertEqual(asynchronous.content.replace(b'/api/async/', b'/api/'), rest.content)
+        return rest
+
+    def test_async_endpoints_match_rest(self):
+        node = NetworkNode.objects.order_by('code').first()
+        paths = [
+            'nodes/', 'nodes/?page=2', 'nodes/?page=last', 'nodes/?page=99', 'nodes/?page=x',
+            'nodes/?fields=code,current_inventory', 'nodes/?omit=latitude,longitude',
+            'nodes/network_summary/',
+            'decisions/', 'decisions/?page=2', 'decisions/?status=open', 'decisions/?type=TRANSPORT',
+            'decisions/?urgency=HIGH&agent=ReorderAgent', f'decisions/?q={node.code}',
+            'decisions/?q=inventory&fields=id,reason',
+            'demands/series/', 'demands/series/?bucket=week&forecast=1', f'demands/series/?node={node.pk}',
+            'demands/series/?bucket=year', 'demands/series/?start=not-a-date',
+        ]
+        statuses = set()
+        for path in paths:
+            with self.subTest(path=path):
+                statuses.add(self.assertSameResponse(path).status_code)
+        self.assertEqual(statuses, {200, 400, 404})
+        self.assertGreater(self.client.get('/api/decisions/').json()['count'], 5)
+
+
+class ConsolidationTests(SimpleTestCase):
+    """Consolidating one source's transports to many drops"""
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.source = {'id': 'src', 'code': 'SRC', 'latitude': 39.0, 'longitude': -95.0}
+        self.drops = [{'id': f'd{i}', 'code': f'D{i}', 'latitude': rng.uniform(25, 48),
+                       'longitude': rng.uniform(-123, -70)} for i in range(3000)]
+        self.quantities = [rng.randint(100, 4000) for _ in self.drops]
+
+    def decisions(self, count):
+        return [{
+            'type': 'TRANSPORT', 'urgency': 'LOW', 'from_node_id': 'src',
+            'to_node_id': drop['id'], 'to_node_code': drop['code'], 'quantity': quantity,
+            'estimated_cost': 800.0, 'metadata': {'cost_breakdown': {'handling': 50.0}},
+        } for drop, quantity in zip(self.drops[:count], self.quantities)]
+
+    def consolidate(self, decisions, budget_ms):
+        return consolidation.consolidate(decisions, [self.source] + self.drops, 2.5, budget_ms,
+                                         vehicle_capacity=10000, max_stops=5)
+
+    def test_big_group_returns_within_budget(self):
+        started = time.perf_counter()
+        result = self.consolidate(self.decisions(3000), budget_ms=50)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.assertFalse(result['complete'])
+        self.assertLess(elapsed_ms, 250)
+
+    def test_no_budget_ships_direct(self):
+        decisions = self.decisions(3000)
+
+        result = self.consolidate(decisions, budget_ms=0)
+
+        self.assertEqual(result['routes'], [])
+        self.assertFalse(any('route' in d['metadata'] for d in decisions))
+        self.assertEqual({d['estimated_cost'] for d in decisions}, {800.0})
+
+    def test_routes_respect_capacity_and_stops(self):
+        decisions = self.decisions(600)
+
+        result = self.consolidate(decisions, budget_ms=10 ** 6)
+
+        self.assertTrue(result['complete'])
+        self.assertTrue(result['routes'])
+        on_route = defaultdict(list)
+        for d in decisions:
+            if 'route' in d['metadata']:
+                on_route[d['metadata']['route']['route_id']].append(d)
+        self.assertEqual(set(on_route), {r['route_id'] for r in result['routes']})
+        for route in result['routes']:
+            stops = on_route[route['route_id']]
+            self.assertLessEqual(sum(d['quantity'] for d in stops), 10000)
+            self.assertLessEqual(len(stops), 5)
+            self.assertLess(route['cost'], route['direct_cost'])
+            self.assertEqual([d['to_node_code'] for d in sorted(stops, key=lambda d: d['metadata']['route']['stop'])],
+                             route['stops'])
+
+    def test_sweep_chunks_partition_the_group(self):
+        chunks = consolidation.sweep_chunks(self.source, self.drops, size=200)
+
+        self.assertEqual(len(chunks), 15)
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+        self.assertEqual(sorted(k for chunk in chunks for k in chunk), list(range(len(self.drops))))
+
+
+class LaneGraphTests(SimpleTestCase):
+
+    def setUp(self):
+        self.graph = LaneGraph(['a', 'b', 'c', 'd'], [
+            ('a', 'b', 1.0, 10.0, 1.0),
+            ('b', 'c', 1.0, 10.0, 2.0),
+            ('a', 'c', 5.0, 12.0, 1.0),
+            ('c', 'c', 0.0, 0.0, 0.0),
+            ('a', 'x', 1.0, 1.0, 1.0),
+        ])
+
+    def test_self_and_unknown_lanes_are_dropped(self):
+        self.assertEqual(len(self.graph), 3)
+
+    def test_route_follows_cheapest_path(self):
+        self.assertEqual(self.graph.route('a', 'c'), (2.0, 20.0, 3.0))
+        self.assertEqual(self.graph.route('b', 'c'), (1.0, 10.0, 2.0))
+        self.assertEqual(self.graph.route('c', 'c'), (0.0, 0.0, 0.0))
+
+    def test_unreachable_pairs_are_infinite(self):
+        self.assertEqual(self.graph.route('c', 'a'), (np.inf, np.inf, np.inf))
+        self.assertEqual(self.graph.route('d', 'c'), (np.inf, np.inf, np.inf))
+        self.assertEqual(self.graph.route('x', 'c'), (np.inf, np.inf, np.inf))
+        cost, _, _ = self.graph.to_target('x')
+        self.assertTrue(np.isinf(cost).all())
+
+    def test_trees_are_computed_once_per_target(self):
+        cost, miles, hours = self.graph.to_target('c')
+
+        np.testing.assert_array_equal(cost, [2.0, 1.0, 0.0, np.inf])
+        np.testing.assert_array_equal(hours, [3.0, 2.0, 0.0, np.inf])
+        self.assertIs(self.graph.to_target('c')[0], cost)
+
+
+class LaneCacheTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        lanes._graph = lanes._version = None
+        self.addCleanup(setattr, lanes, '_graph', None)
+        self.addCleanup(setattr, lanes, '_version', None)
+        self.nodes = {node.code: node for node in NetworkNode.objects.all()}
+        for src, dst, cost in [('DC1', 'STORE1', 100.0), ('DC1', 'WH1', 40.0), ('WH1', 'STORE1', 30.0)]:
+            Lane.objects.create(source=self.nodes[src], destination=self.nodes[dst],
+                                distance_miles=cost, cost=cost, transit_hours=cost / 10)
+
+    def route(self, graph, src, dst):
+        return graph.route(str(self.nodes[src].id), str(self.nodes[dst].id))
+
+    def test_no_lanes_means_no_graph(self):
+        Lane.objects.all().delete()
+
+        self.assertIsNone(lanes.get_graph())
+
+    def test_graph_is_reused_until_lanes_change(self):
+        graph = lanes.get_graph()
+        self.assertEqual(self.route(graph, 'DC1', 'STORE1')[0], 70.0)
+
+        with self.assertNumQueries(1):
+            self.assertIs(lanes.get_graph(), graph)
+
+    def test_bulk_deactivation_rebuilds_graph_and_drops_plan_cache(self):
+        graph = lanes.get_graph()
+        replan.store_cache(replan.PlanCache(None, None, {}, {}, []))
+
+        Lane.objects.filter(source=self.nodes['WH1']).update(is_active=False)
+        rebuilt = lanes.get_graph()
+
+        self.assertIsNot(rebuilt, graph)
+        self.assertEqual(self.route(rebuilt, 'DC1', 'STORE1')[0], 100.0)
+        self.assertIsNone(replan._cache)
+
+    def test_bulk_update_and_node_delete_rebuild_graph(self):
+        graph = lanes.get_graph()
+        lane = Lane.objects.get(source=self.nodes['DC1'], destination=self.nodes['STORE1'])
+        lane.cost = 10.0
+        Lane.objects.bulk_update([lane], ['cost'])
+        rebuilt = lanes.get_graph()
+        self.assertIsNot(rebuilt, graph)
+        self.assertEqual(self.route(rebuilt, 'DC1', 'STORE1')[0], 10.0)
+
+        self.nodes['WH1'].delete()
+        self.assertEqual(len(lanes.get_graph()), 1)
+
+
+@override_settings(REORDER_SERVICE_LEVEL=0.95, REORDER_LEAD_TIME_PERIODS=4, REORDER_REVIEW_PERIODS=7,
+                   REORDER_POLICY_MIN_PERIODS=10)
+class ReorderPolicyTests(NetworkTestCase):
+    STORE1 = [10, 14, 6, 12, 8, 10, 16, 4, 10, 10, 12, 8]
+
+    def setUp(self):
+        super().setUp()
+        reorder_policies._policies = reorder_policies._version = None
+        self.addCleanup(setattr, reorder_policies, '_policies', None)
+        self.addCleanup(setattr, reorder_policies, '_version', None)
+        self.nodes = {node.code: node for node in NetworkNode.objects.all()}
+        self.add_demand('STORE1', self.STORE1, hours_ago=3)
+
+    def add_demand(self, code, quantities, hours_ago):
+        rows = Demand.objects.bulk_create(Demand(node=self.nodes[code], quantity=q, period=date(2024, 1, 1))
+                                          for q in quantities)
+        # Past the refresh watermark
+        Demand.objects.filter(pk__in=[row.pk for row in rows]).update(
+            timestamp=timezone.now() - timedelta(hours=hours_ago))
+
+    def policy(self, code):
+        return ReorderPolicy.objects.get(node=self.nodes[code])
+
+    def test_thresholds_follow_service_level(self):
+        safety, reorder_point, order_up_to = reorder_policies.thresholds(
+            np.array([10.0, 10.0]), np.array([4.0, 0.0]), np.array([4.0, 4.0]))
+
+        # z(0.95) * 4 * sqrt(4) = 13.16
+        self.assertEqual(safety.tolist(), [14, 0])
+        self.assertEqual(reorder_point.tolist(), [54, 40])
+        self.assertEqual(order_up_to.tolist(), [124, 110])
+
+    def test_refresh_stores_sample_statistics(self):
+        self.assertEqual(reorder_policies.refresh_policies(), 1)
+
+        policy = self.policy('STORE1')
+        self.assertEqual(policy.observations, 12)
+        self.assertAlmostEqual(policy.demand_mean, statistics.mean(self.STORE1))
+        self.assertAlmostEqual(policy.demand_std, statistics.stdev(self.STORE1))
+        self.assertEqual((policy.safety_stock, policy.reorder_point, policy.order_up_to), (11, 51, 121))
+
+    def test_incremental_refresh_matches_full(self):
+        reorder_policies.refresh_policies()
+        # New rows for a known node, and the first (older) history of another
+        ReorderPolicy.objects.update(demand_through=timezone.now() - timedelta(hours=2))
+        self.add_demand('STORE1', [30, 2], hours_ago=1)
+        self.add_demand('STORE2', [5, 7, 9], hours_ago=4)
+
+        self.assertEqual(reorder_policies.refresh_policies(), 2)
+        incremental = {p.node_id: p for p in ReorderPolicy.objects.all()}
+        reorder_policies.refresh_policies(full=True)
+
+        for policy in ReorderPolicy.objects.all():
+            stored = incremental[policy.node_id]
+            self.assertEqual(stored.observations, policy.observations)
+            self.assertAlmostEqual(stored.demand_std, policy.demand_std)
+            self.assertEqual(stored.order_up_to, policy.order_up_to)
+        self.assertAlmostEqual(self.policy('STORE1').demand_std, statistics.stdev(self.STORE1 + [30, 2]))
+
+    def test_current_policies_need_min_periods_and_reload_on_change(self):
+        self.add_demand('STORE2', [5, 7, 9], hours_ago=3)
+        reorder_policies.refresh_policies()
+
+        policies = reorder_policies.current_policies()
+        self.assertEqual(set(policies), {str(self.nodes['STORE1'].pk)})
+        self.assertEqual(policies[str(self.nodes['STORE1'].pk)]['reorder_point'], 51)
+        with self.assertNumQueries(1):
+            self.assertIs(reorder_policies.current_policies(), policies)
+
+        replan.store_cache(replan.PlanCache(None, None, {}, {}, []))
+        self.add_demand('STORE2', [6] * 7, hours_ago=1)
+        reorder_policies.refresh_policies(full=True)
+
+        self.assertEqual(len(reorder_policies.current_policies()), 2)
+        self.assertIsNone(replan._cache)
+
+    def test_inventory_agent_orders_up_to_policy(self):
+        policy = {'safety_stock': 11, 'reorder_point': 51, 'order_up_to': 121,
+                  'demand_mean': 10.0, 'demand_std': 3.3}
+        nodes = [
+            {'id': code, 'code': code, 'current_inventory': inventory, 'inventory_capacity': capacity}
+            for code, inventory, capacity in [('AT', 51, 500), ('ABOVE', 52, 500), ('SMALL', 8, 20)]
+        ]
+
+        decisions = InventoryAgent().make_decision({
+            'nodes': nodes, 'demands': {node['id']: 1 for node in nodes},
+            'reorder_policies': {node['id']: policy for node in nodes},
+        })
+
+        orders = {d['node_code']: d for d in decisions if d['type'] == 'REORDER'}
+        self.assertEqual(set(orders), {'AT', 'SMALL'})
+        self.assertEqual(orders['AT']['quantity'], 70)
+        self.assertEqual(orders['AT']['metadata']['reorder_point'], 51)
+        # Capacity caps the targets; 40% full with 8 days of supply would be LOW, but it is below safety stock
+        self.assertEqual(orders['SMALL']['quantity'], 12)
+        self.assertEqual(orders['SMALL']['urgency'], 'HIGH')
+
+
+class StockoutRiskTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.on_hand = rng.uniform(0, 400, 50)
+        self.mean = rng.uniform(50, 150, 50)
+        self.std = self.mean * 0.3
+
+    def risk(self, **kwargs):
+        kwargs = {'horizon': 2, 'paths': 500, 'rng': 7, **kwargs}
+        return stockout_risk(kwargs.pop('on_hand', self.on_hand), kwargs.pop('mean', self.mean),
+                             kwargs.pop('std', self.std), **kwargs)
+
+    def assertRiskEqual(self, first, second):
+        for key in first:
+            np.testing.assert_array_equal(first[key], second[key])
+
+    def test_same_seed_same_result(self):
+        for common_paths in (False, True):
+            self.assertRiskEqual(self.risk(common_paths=common_paths), self.risk(common_paths=common_paths))
+
+        self.assertFalse(np.array_equal(self.risk()['expected_shortfall'], self.risk(rng=8)['expected_shortfall']))
+
+    def test_chunking_does_not_change_draws(self):
+        for common_paths in (False, True):
+            self.assertRiskEqual(self.risk(common_paths=common_paths),
+                                 self.risk(common_paths=common_paths, max_bytes=1))
+
+    def test_common_paths_make_nodes_independent(self):
+        full = self.risk(common_paths=True)
+        alone = self.risk(common_paths=True, on_hand=self.on_hand[10:11], mean=self.mean[10:11], std=self.std[10:11])
+
+        for key in full:
+            np.testing.assert_array_equal(full[key][10:11], alone[key])
+
+    def test_zero_spread_is_deterministic(self):
+        risk = self.risk(on_hand=[150, 250, 200], mean=[100] * 3, std=[0] * 3, rng=None)
+
+        self.assertEqual(risk['probability'].tolist(), [1.0, 0.0, 0.0])
+        self.assertEqual(risk['expected_shortfall'].tolist(), [50.0, 0.0, 0.0])
+        self.assertEqual(risk['shortfall_quantiles'][0].tolist(), [50.0] * 3)
+
+    def test_probability_matches_normal_tail(self):
+        risk = self.risk(on_hand=[110], mean=[100], std=[10], horizon=1, paths=40000)
+
+        # P(N(100, 10) > 110) = 1 - Phi(1)
+        self.assertAlmostEqual(risk['probability'][0], 0.1587, delta=0.006)
+
+    def test_coordinator_alerts_repeat_for_a_seed(self):
+        nodes = [{
+            'id': f'n{i}', 'code': f'N{i}', 'name': f'Node {i}', 'node_type': 'STORE',
+            'current_inventory': int(on_hand), 'inventory_capacity': 1000,
+            'latitude': 40.0, 'longitude': -90.0 + i, 'is_active': True,
+        } for i, on_hand in enumerate(self.on_hand)]
+        state = {'nodes': nodes, 'demands': {n['id']: int(m) for n, m in zip(nodes, self.mean)}, 'risk_seed': 11}
+
+        def alerts():
+            results = engines.create('greedy').make_decision(state)
+            return [(a['node_id'], a['metadata']) for a in results['service_alerts'] if a['type'] == 'FORECAST_ALERT']
+
+        first = alerts()
+        self.assertTrue(first)
+        self.assertEqual(alerts(), first)
+
+
+class InlineExecutor:
+    """Runs shadow plans on submit, in the test's thread and transaction"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class StaticEngine:
+    """Planning engine that returns fixed results"""
+
+    def __init__(self, results):
+        self.results = results
+
+    def make_decision(self, state, deadline_ms=None):
+        return dict(self.results)
+
+
+class EngineTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        executor = mock.patch.object(engines, '_executor', InlineExecutor())
+        executor.start()
+        self.addCleanup(executor.stop)
+
+    def register(self, name, results):
+        engines.register(name)(lambda history_store: StaticEngine(results))
+        self.addCleanup(engines._engines.pop, name, None)
+
+    def test_registry_names_and_unknown_engines(self):
+        self.assertTrue({'multi_agent', 'greedy'} <= set(engines.names()))
+        self.assertEqual(type(engines.create('greedy')).__module__, 'agents.coordinator_agent')
+        self.assertEqual(type(engines.create('multi_agent')).__module__, 'agents.agents.coordinator_agent')
+
+        with self.assertRaisesMessage(engines.UnknownEngine, "Unknown planning engine 'bogus'"):
+            engines.check('bogus')
+        response = self.client.post('/api/decisions/run_agent_cycle/?shadow=bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CycleRun.objects.exists())
+
+    def test_registered_engine_plans_the_cycle(self):
+        self.register('idle', {'inventory_decisions': [], 'transport_decisions': [], 'service_alerts': []})
+
+        outcome = cycle.run_cycle(engine='idle')
+
+        self.assertEqual(outcome['run'].summary['engine'], 'idle')
+        self.assertIsNone(outcome['shadow'])
+        self.assertFalse(AgentDecision.objects.exists())
+
+    def test_shadow_run_records_metrics_without_saving(self):
+        outcome = cycle.run_cycle(engine='multi_agent', shadow_engine='greedy')
+        decisions = AgentDecision.objects.count()
+
+        shadow = ShadowRun.objects.get()
+        self.assertEqual(outcome['run'].summary['shadow_run_id'], str(shadow.id))
+        self.assertEqual((shadow.status, shadow.primary_engine, shadow.candidate_engine),
+                         ('SUCCEEDED', 'multi_agent', 'greedy'))
+        self.assertEqual(shadow.primary_metrics, engines.plan_metrics(outcome['results']))
+        self.assertEqual((shadow.primary_mode, shadow.candidate_mode), ('full', 'full'))
+        self.assertIn('runtime_ms', shadow.deltas)
+        self.assertEqual(shadow.deltas['reorders'],
+                         shadow.candidate_metrics['reorders'] - shadow.primary_metrics['reorders'])
+        self.assertEqual(decisions, len(outcome['saved_decisions']))
+        self.assertIsNotNone(shadow.finished_at)
+
+    def test_failed_shadow_is_recorded_and_frees_the_slot(self):
+        self.register('broken', {'error': 'no plan'})
+
+        with self.assertLogs('agents.engines', 'ERROR'):
+            outcome = cycle.run_cycle(shadow_engine='broken')
+
+        self.assertEqual(outcome['run'].status, 'SUCCEEDED')
+        shadow = ShadowRun.objects.get()
+        self.assertEqual((shadow.status, shadow.error), ('FAILED', 'no plan'))
+        self.assertIsNone(shadow.candidate_metrics)
+        self.assertTrue(engines._shadow_slot.acquire(blocking=False))
+        engines._shadow_slot.release()
+
+    def test_busy_slot_skips_the_shadow(self):
+        engines._shadow_slot.acquire()
+        self.addCleanup(engines._shadow_slot.release)
+
+        outcome = cycle.run_cycle(shadow_engine='greedy')
+
+        self.assertIsNone(outcome['shadow'])
+        self.assertIsNone(outcome['run'].summary['shadow_run_id'])
+        self.assertFalse(ShadowRun.objects.exists())
+
+    def test_frozen_state_is_isolated(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = RingBufferStore(directory.name, window=3)
+        store.append({'a': 1.0})
+        state = {'nodes': [{'id': 'a', 'current_inventory': 10}], 'demands': {'a': 5}, 'as_of': 'now'}
+
+        frozen, history, previous, dirty = engines.freeze_state(state, store)
+        frozen['nodes'][0]['current_inventory'] = 0
+        frozen['demands']['a'] = 0
+        history.append({'a': 2.0})
+
+        self.assertEqual(state['nodes'][0]['current_inventory'], 10)
+        self.assertEqual(state['demands']['a'], 5)
+        self.assertEqual(store.get('a').tolist(), [1.0])
+        self.assertEqual(history.get('a'), [1.0, 2.0])
+        self.assertEqual((previous, dirty), (None, None))
+
+
+class HistoryStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def test_window_wraps_oldest_first(self):
+        store = RingBufferStore(self.path, window=4, capacity=8)
+
+        for value in range(1, 4):
+            store.append({'a': value})
+        self.assertEqual(store.get('a').tolist(), [1, 2, 3])
+
+        for value in range(4, 11):
+            store.append({'a': value, 'b': value * 10})
+        self.assertEqual(store.get('a').tolist(), [7, 8, 9, 10])
+        self.assertEqual(store.get('b').tolist(), [70, 80, 90, 100])
+        self.assertEqual(store.get('missing').tolist(), [])
+
+    def test_load_keeps_latest_window(self):
+        store = RingBufferStore(self.path, window=4)
+
+        store.load({'a': [1, 2, 3, 4, 5, 6], 'b': [9]})
+        store.append({'a': 7})
+
+        self.assertEqual(store.get('a').tolist(), [4, 5, 6, 7])
+        self.assertEqual(store.get('b').tolist(), [9])
+
+    def test_other_handles_read_back_through_the_map(self):
+        writer = RingBufferStore(self.path, window=3, capacity=2)
+        reader = RingBufferStore(self.path)
+        self.assertTrue(writer.created)
+        self.assertFalse(reader.created)
+        self.assertEqual(reader.window, 3)
+
+        writer.append({'a': 1.5})
+        self.assertEqual(reader.get('a').tolist(), [1.5])
+
+        # Outgrowing the capacity swaps in a bigger file the reader remaps
+        writer.append({f'n{i}': i for i in range(5)})
+        writer.append({'a': 2.5, 'n4': 40})
+        self.assertEqual(reader.get('a').tolist(), [1.5, 2.5])
+        self.assertGreaterEqual(reader.capacity, 6)
+        self.assertEqual(reader.get('n4').tolist(), [4, 40])
+
+        del writer, reader
+        self.assertEqual(RingBufferStore(self.path).get('n4').tolist(), [4, 40])
+
+    def test_foreign_file_is_rejected(self):
+        with open(os.path.join(self.path, 'history.f32'), 'wb') as f:
+            f.write(bytes(64))
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            f.write('{}')
+
+        with self.assertRaises(ValueError):
+            RingBufferStore(self.path)
+
+
+class QuietAgent(BaseAgent):
+
+    def make_decision(self, state):
+        return []
+
+
+class CapturingHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class AgentLoggingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.agent = QuietAgent('LoggingTestAgent')
+        self.other = QuietAgent('OtherTestAgent')
+        for agent in (self.agent, self.other):
+            self.addCleanup(agent.logger.setLevel, logging.NOTSET)
+        self.addCleanup(agent_logging.configure, settings.AGENT_LOG_LEVELS, settings.AGENT_LOG_SAMPLE_RATES)
+        agent_logging.configure(levels={'LoggingTestAgent': 'INFO', 'OtherTestAgent': 'INFO'})
+
+        # Agent records go to self.handler rather than stderr
+        agent_logging.stop_async_logging()
+        self.addCleanup(self.restore_async_logging)
+        self.handler = CapturingHandler()
+        self.queue_handler = agent_logging.start_async_logging([self.handler])
+
+    def restore_async_logging(self):
+        agent_logging.stop_async_logging()
+        if settings.AGENT_LOG_ASYNC:
+            agent_logging.start_async_logging()
+
+    def test_per_agent_level_skips_decision_logs(self):
+        agent_logging.configure(levels={'LoggingTestAgent': 'warning'})
+
+        self.assertIsNone(self.agent.log_decision('REORDER', 'reorder %d units', args=(5,)))
+        self.assertEqual(self.other.log_decision('REORDER', 'x')['message'], 'x')
+
+        agent_logging.configure(levels={'LoggingTestAgent': 'INFO'})
+        self.assertEqual(self.agent.log_decision('REORDER', 'reorder %d units', args=(5,))['message'],
+                         'reorder 5 units')
+
+    def test_sample_rate_keeps_that_fraction(self):
+        agent_logging.configure(sample_rates={'LoggingTestAgent': 0.25})
+        random.seed(7)
+
+        kept = sum(self.agent.log_decision('REORDER', 'x') is not None for _ in range(4000))
+
+        self.assertAlmostEqual(kept / 4000, 0.25, delta=0.03)
+
+        agent_logging.configure(sample_rates={'LoggingTestAgent': 0.0})
+        self.assertIsNone(self.agent.log_decision('REORDER', 'x'))
+
+    def test_summary_formats_only_in_verbose_mode(self):
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError('formatted a counted-only event')
+
+        quiet = agent_logging.LogSummary()
+        quiet.add('inventory', 'node %s', Unformattable())
+        quiet.add('inventory', 'node %s', Unformattable())
+        quiet.add('transportation', 'routes')
+
+        self.assertEqual(quiet.summary(), {'total': 3, 'counts': {'inventory': 2, 'transportation': 1}})
+        self.assertEqual(quiet.events(), [])
+
+        verbose = agent_logging.LogSummary(verbose=True)
+        verbose.add('inventory', 'node %s short by %d', 'STORE1', 40)
+        self.assertEqual(verbose.events(), [('inventory', 'node STORE1 short by 40')])
+
+    def test_plan_flushes_counted_summary(self):
+        rng = random.Random(3)
+        nodes = [{
+            'id': f'n{i}', 'code': f'N{i}', 'name': f'Node {i}', 'node_type': rng.choice(['STORE', 'DC']),
+            'current_inventory': rng.randint(0, 1000), 'inventory_capacity': 1000,
+            'latitude': rng.uniform(25, 48), 'longitude': rng.uniform(-123, -70), 'is_active': True,
+        } for i in range(20)]
+        demands = {n['id']: rng.randint(50, 300) for n in nodes}
+
+        quiet = CoordinatorAgent().make_decision({'nodes': nodes, 'demands': demands})
+        verbose = CoordinatorAgent().make_decision({'nodes': nodes, 'demands': demands, 'verbose_logs': True})
+
+        self.assertNotIn('logs', quiet)
+        self.assertGreater(quiet['log_summary']['total'], 0)
+        self.assertEqual(quiet['log_summary']['total'], sum(quiet['log_summary']['counts'].values()))
+        self.assertEqual(verbose['log_summary'], quiet['log_summary'])
+        self.assertEqual(Counter(entry['agent'] for entry in verbose['logs']), verbose['log_summary']['counts'])
+
+    def test_async_records_reach_handlers_on_stop(self):
+        self.assertIsNone(self.queue_handler.listener)
+
+        self.agent.log_decision('REORDER', 'reorder %d units', args=(5,))
+        agent_logging.stop_async_logging()
+
+        self.assertEqual([r.getMessage() for r in self.handler.records], ['LoggingTestAgent: reorder 5 units'])
+
+    @skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_forked_child_starts_its_own_listener(self):
+        self.agent.log_decision('REORDER', 'parent')
+        parent_listener = self.queue_handler.listener
+
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                self.agent.log_decision('REORDER', 'child')
+                child_listener = self.queue_handler.listener
+                agent_logging.stop_async_logging()
+                messages = [r.getMessage() for r in self.handler.records]
+                if child_listener is not parent_listener and 'LoggingTestAgent: child' in messages:
+                    status = 0
+            finally:
+                os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
 
-# Create your tests here.
@@ -0,0 +1,214 @@
+"""
+Bulk network topology import.
+
+Rows are validated in Python (no query per row) and upserted by ``code``
+with ``bulk_create(update_conflicts=True)`` in chunks. Inventory changes go
+through the ledger like every other writer.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .models import NetworkNode
+from . import geocells, ledger
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# current_inventory changes only through ledger movements
+UPSERT_FIELDS = [
+    'name', 'node_type', 'latitude', 'longitude', 'geo_cell',
+    'inventory_capacity', 'is_active', 'updated_at',
+]
+
+SAMPLE_NODES = [
+    {'name': 'Distribution Center 1', 'code': 'DC1', 'node_type': 'DC',
+     'latitude': 40.7128, 'longitude': -74.0060, 'inventory_capacity': 10000, 'current_inventory': 5000},
+    {'name': 'Distribution Center 2', 'code': 'DC2', 'node_type': 'DC',
+     'latitude': 34.0522, 'longitude': -118.2437, 'inventory_capacity': 10000, 'current_inventory': 4500},
+    {'name': 'Warehouse 1', 'code': 'WH1', 'node_type': 'WH',
+     'latitude': 41.8781, 'longitude': -87.6298, 'inventory_capacity': 15000, 'current_inventory': 8000},
+    {'name': 'Warehouse 2', 'code': 'WH2', 'node_type': 'WH',
+     'latitude': 29.7604, 'longitude': -95.3698, 'inventory_capacity': 15000, 'current_inventory': 7500},
+    {'name': 'Store 1', 'code': 'STORE1', 'node_type': 'STORE',
+     'latitude': 41.4993, 'longitude': -81.6944, 'inventory_capacity': 2000, 'current_inventory': 500},
+    {'name': 'Store 2', 'code': 'STORE2', 'node_type': 'STORE',
+     'latitude': 33.4484, 'longitude': -112.0740, 'inventory_capacity': 2000, 'current_inventory': 600},
+    {'name': 'Store 3', 'code': 'STORE3', 'node_type': 'STORE',
+     'latitude': 47.6062, 'longitude': -122.3321, 'inventory_capacity': 2000, 'current_inventory': 450},
+]
+
+_NODE_TYPES = {code for code, _ in NetworkNode.NODE_TYPES}
+_TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+_FALSE_VALUES = {'0', 'false', 'no', 'n', 'f'}
+
+
+def parse_rows(content, input_format=None):
+    """Parse CSV or JSON text into a list of row dicts"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    if input_format is None:
+        input_format = 'json' if content.lstrip()[:1] in ('[', '{') else 'csv'
+
+    if input_format == 'json':
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get('nodes', [])
+        if not isinstance(data, list):
+            raise ValueError("JSON import must be a list of nodes or {'nodes': [...]}")
+        return data
+
+    if input_format == 'csv':
+        return list(csv.DictReader(io.StringIO(content)))
+
+    raise ValueError(f"Unsupported import format: {input_format}")
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _validate_row(row):
+    """Return (cleaned, errors) for one row"""
+    cleaned = {}
+    errors = {}
+
+    if not isinstance(row, dict):
+        return None, {'row': 'Expected an object'}
+
+    for field, max_length in (('code', 50), ('name', 200)):
+        value = row.get(field)
+        if _blank(value):
+            errors[field] = 'This field is required.'
+        elif len(str(value).strip()) > max_length:
+            errors[field] = f'Ensure this field has no more than {max_length} characters.'
+        else:
+            cleaned[field] = str(value).strip()
+
+    node_type = str(row.get('node_type') or '').strip().upper()
+    if node_type not in _NODE_TYPES:
+        errors['node_type'] = f"Must be one of {', '.join(sorted(_NODE_TYPES))}."
+    else:
+        cleaned['node_type'] = node_type
+
+    for field, low, high in (('latitude', -90, 90), ('longitude', -180, 180)):
+        try:
+            value = float(row.get(field))
+            if not low <= value <= high:
+                raise ValueError
+            cleaned[field] = value
+        except (TypeError, ValueError):
+            errors[field] = f'A number between {low} and {high} is required.'
+
+    try:
+        cleaned['inventory_capacity'] = int(float(row.get('inventory_capacity')))
+        if cleaned['inventory_capacity'] < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        errors['inventory_capacity'] = 'A non-negative integer is required.'
+
+    # Optional: omitted inventory keeps an existing node's balance
+    if not _blank(row.get('current_inventory')):
+        try:
+            cleaned['current_inventory'] = int(float(row.get('current_inventory')))
+            if cleaned['current_inventory'] < 0:
+                raise ValueError
+            if cleaned['current_inventory'] > cleaned.get('inventory_capacity', float('inf')):
+                errors['current_inventory'] = 'Cannot exceed inventory_capacity.'
+        except (TypeError, ValueError):
+            errors['current_inventory'] = 'A non-negative integer is required.'
+
+    is_active = row.get('is_active')
+    if _blank(is_active):
+        cleaned['is_active'] = True
+    elif isinstance(is_active, bool):
+        cleaned['is_active'] = is_active
+    elif str(is_active).strip().lower() in _TRUE_VALUES:
+        cleaned['is_active'] = True
+    elif str(is_active).strip().lower() in _FALSE_VALUES:
+        cleaned['is_active'] = False
+    else:
+        errors['is_active'] = 'Must be a boolean.'
+
+    return cleaned, errors
+
+
+def validate_rows(rows):
+    """Validate every row; returns (valid rows, error report)"""
+    valid = []
+    errors = []
+    seen_codes = set()
+
+    for index, row in enumerate(rows, start=1):
+        cleaned, row_errors = _validate_row(row)
+
+        code = cleaned.get('code') if cleaned else None
+        if code and code in seen_codes:
+            row_errors['code'] = 'Duplicate code in import.'
+
+        if row_errors:
+            errors.append({'row': index, 'code': code, 'errors': row_errors})
+            continue
+
+        seen_codes.add(code)
+        valid.append(cleaned)
+
+    return valid, errors
+
+
+def import_nodes(rows, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Validate and upsert nodes by code; returns a summary report"""
+    valid, errors = validate_rows(rows)
+    created = 0
+    updated = 0
+
+    with transaction.atomic():
+        for i in range(0, len(valid), chunk_size):
+            chunk = valid[i:i + chunk_size]
+
+            existing = dict(NetworkNode.objects.filter(
+                code__in=[row['code'] for row in chunk]
+            ).values_list('code', 'pk'))
+
+            nodes = []
+            opening = {}
+            adjusted = {}
+            for row in chunk:
+                node = NetworkNode(**row)
+                # bulk_create skips save(), which normally sets the cell
+                node.geo_cell = geocells.cell_for(node.latitude, node.longitude)
+                if row['code'] in existing:
+                    node.pk = existing[row['code']]
+                    if 'current_inventory' in row:
+                        adjusted[node.pk] = row['current_inventory']
+                    updated += 1
+                else:
+                    # Inserted empty; the ledger books the opening balance
+                    node.current_inventory = 0
+                    opening[node.pk] = row.get('current_inventory', 0)
+                    created += 1
+                nodes.append(node)
+
+            if dry_run:
+                continue
+
+            NetworkNode.objects.bulk_create(
+                nodes,
+                update_conflicts=True,
+                unique_fields=['code'],
+                update_fields=UPSERT_FIELDS
+            )
+            ledger.adjust_balances(opening, 'opening balance')
+            ledger.adjust_balances(adjusted, 'topology import')
+
+    return {
+        'total_rows': len(rows),
+        'created': created,
+        'updated': updated,
+        'failed': len(errors),
+        'dry_run': dry_run,
+        'errors': errors[:MAX_REPORTED_ERRORS],
+    }
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'nodes', views.NetworkNodeViewSet, basename='networknode')
@@ -11,6 +11,12 @@ urlpatterns = [
     # The root path (/) now explicitly points to live_demo.html
     path('', views.live_demo_view, name='live_demo'),
     
+    # Async read endpoints for dashboard polling under ASGI (agents/async_views.py)
+    path('api/async/nodes/', async_views.node_list, name='async_node_list'),
+    path('api/async/nodes/network_summary/', async_views.network_summary, name='async_network_summary'),
+    path('api/async/decisions/', async_views.decision_list, name='async_decision_list'),
+    path('api/async/demands/series/', async_views.demand_series, name='async_demand_series'),
+
     # API endpoints
     path('api/', include(router.urls)), 
     
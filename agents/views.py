@@ -2,77 +2,107 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from django.db.models import Sum
+from django.db import transaction
 from django.utils import timezone
-from .models import NetworkNode, Demand, AgentDecision
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import NetworkNode, Demand, AgentDecision, CycleRun
 from .serializers import NetworkNodeSerializer, DemandSerializer, AgentDecisionSerializer
-from .agents.coordinator_agent import CoordinatorAgent
+from . import cycle, decision_stats, engines, exports, geocells, ledger, queries, topology
+from .fieldsets import SparseFieldsViewMixin
 import random
+from collections import Counter
+from django.conf import settings
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import traceback
+from datetime import datetime, time, timedelta
 
-class NetworkNodeViewSet(viewsets.ModelViewSet):
+
+def _parse_bound(value, end=False):
+    """Parse a date or datetime query param into an aware datetime
+
+    A bare date used as an upper bound covers that whole day.
+    """
+    if not value:
+        return None
+
+    # parse_datetime also accepts a bare date (as midnight), so try dates first
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    elif moment is None:
+        raise ValueError(f"Invalid date: {value}")
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+class NetworkNodeViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = NetworkNode.objects.all()
     serializer_class = NetworkNodeSerializer
 
+    def get_queryset(self):
+        # ?fields=code,current_inventory / ?omit=... load only those columns
+        return self.sparse_queryset(super().get_queryset())
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        # Inserted empty; the ledger books the opening balance
+        target = serializer.validated_data.pop('current_inventory', 0)
+        node = serializer.save(current_inventory=0)
+        ledger.adjust_balances({node.pk: target}, 'opening balance')
+        node.refresh_from_db(fields=['current_inventory'])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        # save() writes every field back, so it must carry the committed
+        # balance; a new quantity becomes an ADJUSTMENT against it
+        node = serializer.instance
+        node.current_inventory = (NetworkNode.objects.select_for_update()
+                                  .values_list('current_inventory', flat=True).get(pk=node.pk))
+        target = serializer.validated_data.pop('current_inventory', None)
+        node = serializer.save()
+        if target is not None:
+            ledger.adjust_balances({node.pk: target}, 'manual update')
+            node.refresh_from_db(fields=['current_inventory'])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # The node's own stats rows cascade; transports it sourced count at other nodes
+        stats = decision_stats.Deltas()
+        stats.move(AgentDecision.objects.filter(source_node=instance).exclude(destination_node=instance))
+        decision_stats.apply(stats)
+        instance.delete()
+
     @csrf_exempt
     @action(detail=False, methods=['post'])
     def initialize_network(self, request):
         """Initialize network with sample nodes"""
-        nodes_data = [
-            {'name': 'Distribution Center 1', 'code': 'DC1', 'node_type': 'DC',
-             'latitude': 40.7128, 'longitude': -74.0060, 'inventory_capacity': 10000, 'current_inventory': 5000},
-            {'name': 'Distribution Center 2', 'code': 'DC2', 'node_type': 'DC',
-             'latitude': 34.0522, 'longitude': -118.2437, 'inventory_capacity': 10000, 'current_inventory': 4500},
-            {'name': 'Warehouse 1', 'code': 'WH1', 'node_type': 'WH',
-             'latitude': 41.8781, 'longitude': -87.6298, 'inventory_capacity': 15000, 'current_inventory': 8000},
-            {'name': 'Warehouse 2', 'code': 'WH2', 'node_type': 'WH',
-             'latitude': 29.7604, 'longitude': -95.3698, 'inventory_capacity': 15000, 'current_inventory': 7500},
-            {'name': 'Store 1', 'code': 'STORE1', 'node_type': 'STORE',
-             'latitude': 41.4993, 'longitude': -81.6944, 'inventory_capacity': 2000, 'current_inventory': 500},
-            {'name': 'Store 2', 'code': 'STORE2', 'node_type': 'STORE',
-             'latitude': 33.4484, 'longitude': -112.0740, 'inventory_capacity': 2000, 'current_inventory': 600},
-            {'name': 'Store 3', 'code': 'STORE3', 'node_type': 'STORE',
-             'latitude': 47.6062, 'longitude': -122.3321, 'inventory_capacity': 2000, 'current_inventory': 450},
-        ]
-
-        created_nodes = []
-        updated_nodes = []
-
         try:
-            for node_data in nodes_data:
-                node, created = NetworkNode.objects.get_or_create(
-                    code=node_data['code'],
-                    defaults=node_data
-                )
-
-                if not created:
-                    # Node exists, update it instead
-                    for key, value in node_data.items():
-                        if key != 'code':  # Don't update the unique code
-                            setattr(node, key, value)
-                    node.save()
-                    updated_nodes.append(node)
-                else:
-                    created_nodes.append(node)
+            report = topology.import_nodes(topology.SAMPLE_NODES)
 
-            all_nodes = created_nodes + updated_nodes
+            all_nodes = NetworkNode.objects.filter(
+                code__in=[node['code'] for node in topology.SAMPLE_NODES]
+            )
             serializer = self.get_serializer(all_nodes, many=True)
 
             message = f'Network ready! '
-            if created_nodes:
-                message += f'Created {len(created_nodes)} new nodes. '
-            if updated_nodes:
-                message += f'Updated {len(updated_nodes)} existing nodes.'
+            if report['created']:
+                message += f"Created {report['created']} new nodes. "
+            if report['updated']:
+                message += f"Updated {report['updated']} existing nodes."
 
             return Response({
                 'status': 'success',
                 'message': message,
-                'created': len(created_nodes),
-                'updated': len(updated_nodes),
-                'total': len(all_nodes),
+                'created': report['created'],
+                'updated': report['updated'],
+                'total': report['created'] + report['updated'],
                 'nodes': serializer.data
             }, status=status.HTTP_201_CREATED)
 
@@ -83,33 +113,115 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @csrf_exempt
+    @action(detail=False, methods=['post'])
+    def import_nodes(self, request):
+        """Bulk upsert nodes by code from an uploaded CSV/JSON file or a JSON body"""
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+        try:
+            upload = request.FILES.get('file')
+            if upload is not None:
+                input_format = None
+                if upload.name.lower().endswith('.csv'):
+                    input_format = 'csv'
+                elif upload.name.lower().endswith('.json'):
+                    input_format = 'json'
+                rows = topology.parse_rows(upload.read(), input_format)
+            elif isinstance(request.data, list):
+                rows = request.data
+            else:
+                rows = request.data.get('nodes', [])
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': f'Could not parse import: {e}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = topology.import_nodes(rows, dry_run=dry_run)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        report['status'] = 'success' if not report['failed'] else 'partial'
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def map_clusters(self, request):
+        """Active nodes aggregated per grid cell for a map viewport
+
+        ?bbox=min_lon,min_lat,max_lon,max_lat (default: whole world; min_lon >
+        max_lon crosses the antimeridian) and ?zoom= (web-map zoom, default
+        3). Each cell reports its node count, total inventory and capacity,
+        worst inventory ratio and centroid.
+        """
+        try:
+            zoom = int(request.query_params.get('zoom', 3))
+            bbox = [float(v) for v in request.query_params.get('bbox', '-180,-90,180,90').split(',')]
+            if len(bbox) != 4 or not 0 <= zoom <= 24:
+                raise ValueError
+        except ValueError:
+            return Response({
+                'status': 'error',
+                'message': 'bbox must be min_lon,min_lat,max_lon,max_lat and zoom an integer from 0 to 24'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if min_lat > max_lat:
+            return Response({
+                'status': 'error',
+                'message': 'bbox min_lat must not exceed max_lat'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(geocells.clusters(NetworkNode.objects.filter(is_active=True), bbox, zoom))
+
     @action(detail=False, methods=['get'])
     def network_summary(self, request):
         """Get network summary statistics"""
-        nodes = NetworkNode.objects.filter(is_active=True)
-
-        summary = {
-            'total_nodes': nodes.count(),
-            'total_capacity': nodes.aggregate(Sum('inventory_capacity'))['inventory_capacity__sum'] or 0,
-            'total_inventory': nodes.aggregate(Sum('current_inventory'))['current_inventory__sum'] or 0,
-            'by_type': {}
-        }
+        nodes, aggregates = queries.network_summary_aggregates()
+        return Response(queries.network_summary(
+            nodes.aggregate(**aggregates), decision_stats.network_kpis()
+        ))
+
+    @action(detail=True, methods=['get'])
+    def decision_stats(self, request, pk=None):
+        """Open decisions at this node, and the outcome of those created on ?day= (default today)"""
+        node = self.get_object()
+
+        day = request.query_params.get('day')
+        if day:
+            day = parse_date(day)
+            if day is None:
+                return Response({
+                    'status': 'error',
+                    'message': f"Invalid date: {request.query_params['day']}"
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-        for node_type, _ in NetworkNode.NODE_TYPES:
-            type_nodes = nodes.filter(node_type=node_type)
-            summary['by_type'][node_type] = {
-                'count': type_nodes.count(),
-                'total_inventory': type_nodes.aggregate(Sum('current_inventory'))['current_inventory__sum'] or 0,
-                'total_capacity': type_nodes.aggregate(Sum('inventory_capacity'))['inventory_capacity__sum'] or 0
-            }
+        kpis = decision_stats.node_kpis(node.pk, day=day)
+        kpis['node'] = node.code
+        return Response(kpis)
 
-        summary['utilization_rate'] = (summary['total_inventory'] / summary['total_capacity'] * 100) if summary['total_capacity'] > 0 else 0
+    @action(detail=True, methods=['get'])
+    def inventory_history(self, request, pk=None):
+        """Inventory balance over time from the ledger"""
+        node = self.get_object()
 
-        # Optionally include cost summary if you compute & store them server-side
-        # summary['total_transport_cost'] = ...
-        # summary['total_service_level_cost'] = ...
+        try:
+            start = _parse_bound(request.query_params.get('start'))
+            end = _parse_bound(request.query_params.get('end'), end=True)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(summary)
+        history = ledger.inventory_series(node.pk, start=start, end=end)
+        history['node'] = node.code
+        return Response(history)
 
     @action(detail=False, methods=['post'])
     def reset_network(self, request):
@@ -129,222 +241,328 @@ class NetworkNodeViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class AgentDecisionViewSet(viewsets.ModelViewSet):
+class AgentDecisionViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = AgentDecision.objects.all()
     serializer_class = AgentDecisionSerializer
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+    # run_agent_cycle ?decisions= values
+    DECISION_PAYLOADS = ('none', 'summary', 'full')
 
-        agent_name = self.request.query_params.get('agent', None)
-        if agent_name:
-            queryset = queryset.filter(agent_name=agent_name)
-
-        decision_type = self.request.query_params.get('type', None)
-        if decision_type:
-            queryset = queryset.filter(decision_type=decision_type)
-
-        urgency = self.request.query_params.get('urgency', None)
-        if urgency:
-            queryset = queryset.filter(urgency=urgency)
+    def get_queryset(self):
+        queryset = queries.filter_decisions(super().get_queryset(), self.request.query_params)
+        return self.sparse_queryset(queryset).order_by('-created_at')
+
+    # Edits keep DecisionStats in step, in the same transaction
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        stats = decision_stats.Deltas()
+        stats.decision(serializer.save())
+        decision_stats.apply(stats)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        stats = decision_stats.Deltas()
+        stats.decision(serializer.instance, -1)  # not yet changed by save()
+        stats.decision(serializer.save())
+        decision_stats.apply(stats)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        stats = decision_stats.Deltas()
+        stats.decision(instance, -1)
+        decision_stats.apply(stats)
+        instance.delete()
 
-        return queryset.order_by('-created_at')
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream filtered decisions as CSV or NDJSON"""
+        return _export_response(
+            request, self.get_queryset(), 'created_at',
+            exports.DECISION_EXPORT_FIELDS, 'decisions'
+        )
 
     @csrf_exempt
     @action(detail=False, methods=['post'])
     def run_agent_cycle(self, request):
-        """Execute one cycle of agent decision-making"""
-        try:
-            nodes = NetworkNode.objects.filter(is_active=True)
-
-            if nodes.count() == 0:
+        """Execute one cycle of agent decision-making
+
+        With single-flight enabled (AGENT_CYCLE_SINGLE_FLIGHT or ?single_flight=1)
+        a request that arrives while a cycle is running (one that started within
+        AGENT_CYCLE_SINGLE_FLIGHT_WINDOW seconds, or that holds the lock) waits
+        for that cycle and returns its result, or its error. An Idempotency-Key
+        header replays the result of the first request that used the key;
+        requests waiting on a failed attempt get its error, and later retries
+        run a new cycle.
+
+        ?deadline_ms= (or "deadline_ms" in the body) bounds planning time;
+        the response then flags the nodes the planner did not get to.
+
+        Agent log events come back counted in "log_summary"; ?verbose=1
+        adds every message under "logs".
+
+        ?decisions=none|summary|full (default full) picks how saved decisions
+        are returned: not at all, as counts by type and urgency, or serialized
+        (?fields=/?omit= apply).
+
+        ?engine= picks the planning engine and ?shadow= a candidate engine to
+        compare against it in the background (see agents/engines.py);
+        PLANNING_ENGINE / PLANNING_SHADOW_ENGINE are the defaults.
+        """
+        deadline_ms = request.query_params.get('deadline_ms') or request.data.get('deadline_ms')
+        if deadline_ms not in (None, ''):
+            try:
+                deadline_ms = float(deadline_ms)
+                if deadline_ms <= 0:
+                    raise ValueError
+            except (TypeError, ValueError):
                 return Response({
                     'status': 'error',
-                    'message': 'No nodes found. Please initialize network first.'
+                    'message': 'deadline_ms must be a positive number of milliseconds'
                 }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            deadline_ms = None
 
-            # Generate demands
-            demands = self._generate_demands(nodes)
-
-            # Prepare state for agents
-            state = {
-                'nodes': [
-                    {
-                        'id': str(node.id),
-                        'code': node.code,
-                        'name': node.name,
-                        'node_type': node.node_type,
-                        'current_inventory': node.current_inventory,
-                        'inventory_capacity': node.inventory_capacity,
-                        'latitude': node.latitude,
-                        'longitude': node.longitude,
-                        'is_active': node.is_active
-                    } for node in nodes
-                ],
-                'demands': demands
-            }
-
-            # Run coordinator agent
-            coordinator = CoordinatorAgent()
-            results = coordinator.make_decision(state)
-
-            # --- Compute totals here so frontend gets them ---
-            # Total transport cost: sum estimated_cost fields on transport_decisions
-            total_transport_cost = 0
-            for td in results.get('transport_decisions', []):
-                # estimated_cost could be number or string; coerce safely
-                try:
-                    total_transport_cost += float(td.get('estimated_cost', 0) or 0)
-                except Exception:
-                    total_transport_cost += 0
-
-            # Service level cost: a simple heuristic based on alert urgency (customize as needed)
-            URGENCY_COST = {
-                'CRITICAL': 500.0,
-                'HIGH': 200.0,
-                'MEDIUM': 50.0,
-                'LOW': 10.0
-            }
-            total_service_level_cost = 0
-            for alert in results.get('service_alerts', []):
-                urgency = alert.get('urgency', 'MEDIUM')
-                total_service_level_cost += URGENCY_COST.get(urgency.upper(), 50.0)
-
-            # Save decisions in DB
-            saved_decisions = self._save_decisions(results)
-
-            # Execute transport decisions (update inventories)
-            self._execute_transport_decisions(results.get('transport_decisions', []))
-
+        verbose = request.query_params.get('verbose', '').lower() in ('1', 'true', 'yes')
+        decisions = request.query_params.get('decisions', 'full').lower()
+        if decisions not in self.DECISION_PAYLOADS:
             return Response({
-                'status': 'success',
-                'results': {
-                    'inventory_decisions': len(results.get('inventory_decisions', [])),
-                    'transport_decisions': len(results.get('transport_decisions', [])),
-                    'service_alerts': len(results.get('service_alerts', [])),
-                    'total_transport_cost': round(total_transport_cost, 2),
-                    'total_service_level_cost': round(total_service_level_cost, 2),
-                    'logs': results.get('logs', []),
-                },
-                'saved_decisions': len(saved_decisions),
-                'decisions': AgentDecisionSerializer(saved_decisions, many=True).data
-            }, status=status.HTTP_200_OK)
+                'status': 'error',
+                'message': f"decisions must be one of {', '.join(self.DECISION_PAYLOADS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            traceback.print_exc()
+        engine = request.query_params.get('engine') or None
+        shadow_engine = request.query_params.get('shadow')
+        try:
+            for name in (engine, shadow_engine):
+                if name:
+                    engines.check(name)
+        except engines.UnknownEngine as e:
             return Response({
                 'status': 'error',
                 'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def _generate_demands(self, nodes):
-        """Generate random demands for nodes"""
-        demands = {}
-        today = timezone.now().date()
-
-        for node in nodes:
-            if node.node_type == 'STORE':
-                demand_qty = random.randint(100, 300)
-            elif node.node_type == 'DC':
-                demand_qty = random.randint(50, 200)
-            else:
-                demand_qty = random.randint(30, 150)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-            demands[str(node.id)] = demand_qty
+        idempotency_key = request.headers.get('Idempotency-Key')
+        single_flight = (
+            getattr(settings, 'AGENT_CYCLE_SINGLE_FLIGHT', False) or
+            request.query_params.get('single_flight', '').lower() in ('1', 'true', 'yes')
+        )
 
-            # Save to database
-            Demand.objects.create(
-                node=node,
-                quantity=demand_qty,
-                period=today
-            )
-
-        return demands
+        if idempotency_key:
+            claimed, _ = cycle.claim_idempotency_key(idempotency_key)
+            while not claimed:
+                try:
+                    run = cycle.wait_for_idempotency_key(idempotency_key)
+                except cycle.IdempotencyKeyReleased:
+                    # The owner never got a cycle to run; this request tries in its place
+                    claimed, _ = cycle.claim_idempotency_key(idempotency_key)
+                else:
+                    return self._attached_cycle_response(run, replayed=True, verbose=verbose,
+                                                         decisions=decisions)
 
-    def _save_decisions(self, results):
-        """Save agent decisions to database"""
-        saved_decisions = []
+        run = None
+        try:
+            if single_flight:
+                run = cycle.recent_run(getattr(settings, 'AGENT_CYCLE_SINGLE_FLIGHT_WINDOW', 2))
 
-        # Save inventory decisions
-        for decision in results.get('inventory_decisions', []):
-            node = NetworkNode.objects.get(id=decision['node_id'])
+            if run is None:
+                try:
+                    outcome = cycle.run_cycle(deadline_ms=deadline_ms, verbose_logs=verbose,
+                                              engine=engine, shadow_engine=shadow_engine,
+                                              idempotency_key=idempotency_key)
+                except cycle.CycleBusy as e:
+                    in_flight = cycle.current_run_id() if single_flight else None
+                    if in_flight is None:
+                        return Response({
+                            'status': 'busy',
+                            'message': str(e)
+                        }, status=status.HTTP_409_CONFLICT)
+                    run = cycle.wait_for_run(in_flight)
+                else:
+                    run = outcome['run']
+                    return self._cycle_response(outcome, decisions=decisions)
+            else:
+                run = cycle.wait_for_run(run.id)
 
-            agent_decision = AgentDecision.objects.create(
-                agent_name=decision.get('agent', 'ReorderAgent'),
-                decision_type=decision.get('type', 'REORDER'),
-                urgency=decision.get('urgency', 'MEDIUM'),
-                destination_node=node,
-                quantity=decision.get('quantity'),
-                reason=decision.get('reason', '')
-            )
-            saved_decisions.append(agent_decision)
-
-        # Save transport decisions
-        for decision in results.get('transport_decisions', []):
-            from_node = NetworkNode.objects.get(id=decision['from_node_id'])
-            to_node = NetworkNode.objects.get(id=decision['to_node_id'])
-
-            agent_decision = AgentDecision.objects.create(
-                agent_name=decision.get('agent', 'TransportPlanner'),
-                decision_type=decision.get('type', 'TRANSPORT'),
-                urgency=decision.get('urgency', 'MEDIUM'),
-                source_node=from_node,
-                destination_node=to_node,
-                quantity=decision.get('quantity'),
-                estimated_cost=decision.get('estimated_cost'),
-                reason=decision.get('reason', '')
-            )
-            saved_decisions.append(agent_decision)
-
-        # Save service alerts
-        for alert in results.get('service_alerts', []):
-            node = NetworkNode.objects.get(id=alert['node_id'])
-
-            agent_decision = AgentDecision.objects.create(
-                agent_name=alert.get('agent', 'MonitorAgent'),
-                decision_type=alert.get('type', 'SERVICE_ALERT'),
-                urgency=alert.get('urgency', 'MEDIUM'),
-                destination_node=node,
-                reason=alert.get('reason', '')
-            )
-            saved_decisions.append(agent_decision)
+            return self._attached_cycle_response(run, verbose=verbose, decisions=decisions)
 
-        return saved_decisions
+        except cycle.NoActiveNodes as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            if idempotency_key:
+                # A cycle this request ran is bound already; one it attached to is bound here,
+                # failed or not, so waiters on the key get its outcome
+                if run is not None:
+                    cycle.bind_idempotency_key(idempotency_key, run)
+                else:
+                    cycle.release_idempotency_key(idempotency_key)
 
-    def _execute_transport_decisions(self, transport_decisions):
-        """Execute transportation decisions and update inventory"""
-        for decision in transport_decisions:
-            try:
-                from_node = NetworkNode.objects.get(id=decision['from_node_id'])
-                to_node = NetworkNode.objects.get(id=decision['to_node_id'])
-                quantity = int(decision.get('quantity', 0))
+    @action(detail=False, methods=['get'])
+    def latest_cycle(self, request):
+        """The last agent cycle that succeeded, as run_agent_cycle returned it
+
+        Dashboards poll this for the cycles celery beat runs instead of
+        starting their own; ?verbose= and ?decisions= work as for
+        run_agent_cycle.
+        """
+        verbose = request.query_params.get('verbose', '').lower() in ('1', 'true', 'yes')
+        decisions = request.query_params.get('decisions', 'full').lower()
+        if decisions not in self.DECISION_PAYLOADS:
+            return Response({
+                'status': 'error',
+                'message': f"decisions must be one of {', '.join(self.DECISION_PAYLOADS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-                if from_node.current_inventory >= quantity:
-                    from_node.current_inventory -= quantity
-                    to_node.current_inventory = min(
-                        to_node.current_inventory + quantity,
-                        to_node.inventory_capacity
-                    )
+        run = CycleRun.objects.filter(status='SUCCEEDED').order_by('-started_at').first()
+        if run is None:
+            return Response({
+                'status': 'error',
+                'message': 'No agent cycle has completed yet'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return self._attached_cycle_response(run, verbose=verbose, decisions=decisions, coalesced=False)
+
+    def _cycle_response(self, outcome, decisions='full'):
+        """Response for the caller that ran the cycle"""
+        saved_decisions = outcome['saved_decisions']
+
+        # The run's summary, as callers that attach to or replay this cycle get it
+        summary = dict(outcome['run'].summary)
+        summary.pop('decision_ids', None)
+
+        payload = {
+            'status': 'success',
+            'cycle_id': str(outcome['run'].id),
+            'coalesced': False,
+            'results': summary,
+            'saved_decisions': len(saved_decisions),
+        }
+        payload.update(self._decisions_payload(
+            decisions, saved_decisions, ((d.decision_type, d.urgency) for d in saved_decisions)
+        ))
+        return Response(payload, status=status.HTTP_200_OK)
+
+    def _attached_cycle_response(self, run, replayed=False, verbose=False, decisions='full', coalesced=True):
+        """Response for a caller that joined (or replays, or reads) another request's cycle"""
+        if run is None:
+            return Response({
+                'status': 'busy',
+                'message': 'Timed out waiting for the in-flight agent cycle'
+            }, status=status.HTTP_409_CONFLICT)
 
-                    from_node.save()
-                    to_node.save()
+        if run.status != 'SUCCEEDED':
+            return Response({
+                'status': 'error',
+                'cycle_id': str(run.id),
+                'message': run.error or 'Agent cycle failed'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            except Exception as e:
-                # log and continue
-                print(f"Error executing transport decision: {str(e)}")
-                continue
+        summary = dict(run.summary)
+        decision_ids = summary.pop('decision_ids', [])
+        if not verbose:
+            summary.pop('logs', None)
+        saved = AgentDecision.objects.filter(id__in=decision_ids)
+
+        payload = {
+            'status': 'success',
+            'cycle_id': str(run.id),
+            'coalesced': coalesced,
+            'replayed': replayed,
+            'results': summary,
+            'saved_decisions': len(decision_ids),
+        }
+        payload.update(self._decisions_payload(
+            decisions,
+            saved.select_related('source_node', 'destination_node').order_by('created_at'),
+            saved.values_list('decision_type', 'urgency').iterator()
+        ))
+        return Response(payload, status=status.HTTP_200_OK)
+
+    def _decisions_payload(self, decisions, saved_decisions, type_urgency):
+        """Response entries for ?decisions=; type_urgency is only read for 'summary'"""
+        if decisions == 'none':
+            return {}
+        if decisions == 'summary':
+            by_type, by_urgency = Counter(), Counter()
+            for decision_type, urgency in type_urgency:
+                by_type[decision_type] += 1
+                by_urgency[urgency] += 1
+            return {'decision_summary': {'by_type': dict(by_type), 'by_urgency': dict(by_urgency)}}
+        return {
+            'decisions': AgentDecisionSerializer(
+                saved_decisions, many=True, context=self.get_serializer_context()
+            ).data
+        }
 
 
-class DemandViewSet(viewsets.ModelViewSet):
+class DemandViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Demand.objects.all()
     serializer_class = DemandSerializer
 
+    SERIES_BUCKETS = queries.SERIES_BUCKETS
+
     def get_queryset(self):
         queryset = super().get_queryset()
         node_id = self.request.query_params.get('node', None)
         if node_id:
             queryset = queryset.filter(node_id=node_id)
-        return queryset.order_by('-timestamp')
+        return self.sparse_queryset(queryset).order_by('-timestamp')
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream filtered demands as CSV or NDJSON"""
+        return _export_response(
+            request, self.get_queryset(), 'timestamp',
+            exports.DEMAND_EXPORT_FIELDS, 'demands'
+        )
+
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        """Demand aggregated per node and time bucket in a single query"""
+        try:
+            bucket, start, end, rows = queries.demand_series_rows(request.query_params)
+        except ValueError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(queries.demand_series(bucket, start, end, list(rows)))
+
+
+def _export_response(request, queryset, time_field, fields, name):
+    """Apply ?start=&end= and ?output=csv|ndjson to an export queryset"""
+    output = request.query_params.get('output', 'csv').lower()
+    if output not in exports.EXPORT_FORMATS:
+        return Response({
+            'status': 'error',
+            'message': f"output must be one of {', '.join(exports.EXPORT_FORMATS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start = _parse_bound(request.query_params.get('start'))
+        end = _parse_bound(request.query_params.get('end'), end=True)
+    except ValueError as e:
+        return Response({
+            'status': 'error',
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if start:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+
+    return exports.stream_export(queryset, fields, output, name)
 
 
 def dashboard_view(request):
@@ -362,10 +580,13 @@ def live_demo_view(request):
 
 @api_view(['POST'])
 def simulate_auto_changes(request):
-    nodes = NetworkNode.objects.all()
-    for node in nodes:
+    movements = []
+    for node in NetworkNode.objects.only('id', 'current_inventory', 'inventory_capacity'):
         # Randomly adjust current inventory (+/- 10% or fixed -500..+500)
         change = random.randint(-500, 500)
-        node.current_inventory = max(0, min(node.inventory_capacity, node.current_inventory + change))
-        node.save()
+        new_inventory = max(0, min(node.inventory_capacity, node.current_inventory + change))
+        movements.append(ledger.movement(
+            node.pk, 'ADJUSTMENT', new_inventory - node.current_inventory, 'auto simulation'
+        ))
+    ledger.apply_movements(movements)
     return Response({"status": "auto simulation complete"})
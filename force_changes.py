@@ -6,16 +6,20 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supply_chain_project.settings')
 django.setup()
 
 from agents.models import NetworkNode
+from agents import ledger
 
 print("Forcing inventory changes...")
 
+movements = []
 nodes = NetworkNode.objects.all()
 for node in nodes:
     old_inventory = node.current_inventory
     # Randomly change inventory by -500 to +500
     change = random.randint(-500, 500)
-    node.current_inventory = max(0, min(node.current_inventory + change, node.inventory_capacity))
-    node.save()
-    print(f"{node.code}: {old_inventory} → {node.current_inventory} (change: {change:+d})")
+    new_inventory = max(0, min(node.current_inventory + change, node.inventory_capacity))
+    movements.append(ledger.movement(node.pk, 'ADJUSTMENT', new_inventory - old_inventory, 'force_changes'))
+    print(f"{node.code}: {old_inventory} → {new_inventory} (change: {change:+d})")
+
+ledger.apply_movements(movements)
 
 print("\n✓ Changes applied! Refresh your dashboard to see the updates.")
\ No newline at end of file
@@ -1,3 +1,11 @@
-from .celery import app as celery_app
+# Celery is only needed by the worker/beat (which import
+# supply_chain_project.celery directly) and by code that sends tasks, so load
+# it on first access instead of on every web worker and management command.
+def __getattr__(name):
+    if name == 'celery_app':
+        from .celery import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ('celery_app',)
\ No newline at end of file
+
+__all__ = ('celery_app',)
@@ -9,19 +9,38 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from agents.routing import websocket_urlpatterns
-
 
+from . import preload
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supply_chain_project.settings')
 
-application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
-        URLRouter(
-            websocket_urlpatterns
+django_asgi_app = get_asgi_application()
+
+if preload.enabled():
+    preload.warm()
+
+_websocket_app = None
+
+
+async def websocket_application(scope, receive, send):
+    """Build the Channels websocket stack on the first websocket connection"""
+    global _websocket_app
+
+    if _websocket_app is None:
+        from channels.auth import AuthMiddlewareStack
+        from channels.routing import URLRouter
+        from agents.routing import websocket_urlpatterns
+
+        _websocket_app = AuthMiddlewareStack(
+            URLRouter(
+                websocket_urlpatterns
+            )
         )
-    ),
-})
+
+    return await _websocket_app(scope, receive, send)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_asgi_app(scope, receive, send)
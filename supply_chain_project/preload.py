@@ -0,0 +1,25 @@
+"""
+Optional preload hook.
+
+Web workers defer the agent package and NumPy until the first agent cycle.
+Under ``gunicorn --preload`` set ``PRELOAD_AGENTS=1`` and wsgi/asgi call
+``warm()`` in the master, so forked workers inherit the imported modules
+and respawns stay fast.
+"""
+import importlib
+import os
+
+PRELOAD_MODULES = [
+    'numpy',
+    'agents.agents.coordinator_agent',
+    'agents.agents.history_store',
+]
+
+
+def enabled():
+    return os.environ.get('PRELOAD_AGENTS', '').lower() in ('1', 'true', 'yes')
+
+
+def warm():
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so Server-Timing covers the other middleware too
+    'agents.middleware.QueryStatsMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add this
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -79,6 +81,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -112,6 +115,87 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Server-side agent cycles (replaces browser setInterval polling).
+# Ticks expire after one interval, so a slow cycle never builds a backlog.
+AGENT_CYCLE_INTERVAL = float(os.environ.get('AGENT_CYCLE_INTERVAL', 30))
+AGENT_CYCLE_LOCK_TTL = int(os.environ.get('AGENT_CYCLE_LOCK_TTL', 600))
+# Planning budget per cycle in ms (unset = run to completion)
+AGENT_CYCLE_DEADLINE_MS = float(os.environ['AGENT_CYCLE_DEADLINE_MS']) if os.environ.get('AGENT_CYCLE_DEADLINE_MS') else None
+# Re-plan only nodes changed since the previous cycle (see agents/replan.py)
+AGENT_CYCLE_INCREMENTAL = os.environ.get('AGENT_CYCLE_INCREMENTAL', 'True').lower() in ('1', 'true', 'yes')
+# Share of nodes that receive new simulated demand on an incremental cycle; at 1.0 every
+# node changes every cycle and incremental re-planning never skips any
+SIMULATED_DEMAND_FRACTION = float(os.environ.get('SIMULATED_DEMAND_FRACTION', 0.1))
+INVENTORY_SNAPSHOT_INTERVAL = float(os.environ.get('INVENTORY_SNAPSHOT_INTERVAL', 600))
+
+# Opt-in: concurrent run_agent_cycle requests share the in-flight cycle
+AGENT_CYCLE_SINGLE_FLIGHT = os.environ.get('AGENT_CYCLE_SINGLE_FLIGHT', 'False').lower() in ('1', 'true', 'yes')
+AGENT_CYCLE_SINGLE_FLIGHT_WINDOW = float(os.environ.get('AGENT_CYCLE_SINGLE_FLIGHT_WINDOW', 2))
+# Idempotency-Key replays are kept this many seconds, purged every IDEMPOTENCY_KEY_PURGE_INTERVAL
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 86400))
+IDEMPOTENCY_KEY_PURGE_INTERVAL = float(os.environ.get('IDEMPOTENCY_KEY_PURGE_INTERVAL', 3600))
+
+# Planning engine for agent cycles (agents/engines.py; ?engine= overrides per request).
+# A shadow engine also plans every cycle in the background, unsaved, for comparison.
+PLANNING_ENGINE = os.environ.get('PLANNING_ENGINE', 'multi_agent')
+PLANNING_SHADOW_ENGINE = os.environ.get('PLANNING_SHADOW_ENGINE', '')
+
+# Memory-mapped demand history shared by every worker on the host
+FORECAST_HISTORY_PATH = os.environ.get('FORECAST_HISTORY_PATH', os.path.join(BASE_DIR, 'var', 'forecast_history'))
+FORECAST_HISTORY_WINDOW = 30
+
+# Statistical reorder policies (agents/reorder_policies.py), refreshed in the
+# background from Demand history. Periods are demand observations (one per cycle).
+REORDER_SERVICE_LEVEL = float(os.environ.get('REORDER_SERVICE_LEVEL', 0.95))
+REORDER_LEAD_TIME_PERIODS = float(os.environ.get('REORDER_LEAD_TIME_PERIODS', 7))
+REORDER_REVIEW_PERIODS = float(os.environ.get('REORDER_REVIEW_PERIODS', 7))
+# Nodes with fewer observations keep the fixed capacity ratios
+REORDER_POLICY_MIN_PERIODS = int(os.environ.get('REORDER_POLICY_MIN_PERIODS', 10))
+REORDER_POLICY_REFRESH_INTERVAL = float(os.environ.get('REORDER_POLICY_REFRESH_INTERVAL', 600))
+
+# Time budget for merging transports into multi-drop routes each cycle (0 disables)
+TRANSPORT_CONSOLIDATION_BUDGET_MS = float(os.environ.get('TRANSPORT_CONSOLIDATION_BUDGET_MS', 50))
+
+# Per-request query counts and timings (agents/middleware.py): headers on every
+# response; requests over SLOW_REQUEST_MS or repeating one statement
+# N_PLUS_ONE_THRESHOLD times are logged to agents.requests
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 1000))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 20))
+
+# Agent logging (agents/agents/agent_logging.py): records go through a queue to a
+# listener thread; levels and sample rates are per agent, e.g.
+# AGENT_LOG_LEVELS="InventoryManager:WARNING" AGENT_LOG_SAMPLE_RATES="InventoryManager:0.01"
+AGENT_LOG_ASYNC = os.environ.get('AGENT_LOG_ASYNC', 'True').lower() in ('1', 'true', 'yes')
+AGENT_LOG_LEVELS = dict(
+    item.split(':', 1) for item in os.environ.get('AGENT_LOG_LEVELS', '').split(',') if ':' in item
+)
+AGENT_LOG_SAMPLE_RATES = {
+    name: float(rate) for name, rate in (
+        item.split(':', 1) for item in os.environ.get('AGENT_LOG_SAMPLE_RATES', '').split(',') if ':' in item
+    )
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'run-agent-cycle': {
+        'task': 'agents.tasks.run_agent_cycle',
+        'schedule': AGENT_CYCLE_INTERVAL,
+        'options': {'expires': AGENT_CYCLE_INTERVAL},
+    },
+    'snapshot-inventory': {
+        'task': 'agents.tasks.snapshot_inventory',
+        'schedule': INVENTORY_SNAPSHOT_INTERVAL,
+    },
+    'refresh-reorder-policies': {
+        'task': 'agents.tasks.refresh_reorder_policies',
+        'schedule': REORDER_POLICY_REFRESH_INTERVAL,
+    },
+    'purge-idempotency-keys': {
+        'task': 'agents.tasks.purge_idempotency_keys',
+        'schedule': IDEMPOTENCY_KEY_PURGE_INTERVAL,
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
@@ -148,7 +232,8 @@ WSGI_APPLICATION = 'supply_chain_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # SQLITE_PATH lets tools such as the load test run against a scratch database
+        'NAME': os.environ.get('SQLITE_PATH') or BASE_DIR / 'db.sqlite3',
     }
 }
 
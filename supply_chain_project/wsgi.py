@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from . import preload
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supply_chain_project.settings')
 
 application = get_wsgi_application()
+
+if preload.enabled():
+    preload.warm()